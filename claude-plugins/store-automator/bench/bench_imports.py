@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Startup (import-time) benchmark for the store scripts, with per-script budgets.
+
+Imports every entry-point script in a fresh interpreter under
+`python -X importtime` and reads the cumulative import time of the script
+module itself, so interpreter startup and site hooks are not counted. The
+median of --rounds runs is compared with the script's budget in BUDGETS_MS.
+The run also fails when a script imports one of HEAVY_MODULES at startup:
+those are loaded on first use (see templates/scripts/deps.py).
+
+  python3 bench/bench_imports.py [--rounds 5] [--scale 1.0] [--json]
+
+--scale multiplies every budget, e.g. --scale 2 on a slow machine. Exits 1
+when any script is over budget or loads a heavy module.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "templates", "scripts"))
+
+# Startup budget per script, in milliseconds of import time (roughly twice the
+# median measured when the budget was set, to absorb machine noise)
+BUDGETS_MS = {
+    "asc_app_setup": 120,
+    "asc_webhook": 40,
+    "batch_sync": 300,
+    "check_google_play": 80,
+    "create_app_record": 120,
+    "manage_version_ios": 120,
+    "store_worker": 60,
+    "submit_for_review_ios": 150,
+    "sync_iap_android": 120,
+    "sync_iap_ios": 250,
+    "update_data_safety": 30,
+}
+
+# Must not be imported until a script actually needs them
+HEAVY_MODULES = ("requests", "urllib3", "jwt", "cryptography", "httpx", "googleapiclient")
+
+
+def measure(module: str) -> tuple[float, set]:
+    """Import `module` once in a fresh interpreter. Returns (milliseconds, modules imported)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    total_us = None
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        imported.add(name.strip())
+        if name == f" {module}":
+            total_us = int(cumulative)
+    if total_us is None:
+        raise RuntimeError(f"no import time reported for {module}")
+    return total_us / 1000, imported
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for module, budget in BUDGETS_MS.items():
+        timings, heavy = [], set()
+        for _ in range(max(1, args.rounds)):
+            ms, imported = measure(module)
+            timings.append(ms)
+            heavy |= {name for name in imported if name.split(".")[0] in HEAVY_MODULES}
+        median = statistics.median(timings)
+        limit = budget * args.scale
+        results.append({
+            "script": module,
+            "median_ms": round(median, 1),
+            "budget_ms": round(limit, 1),
+            "heavy": sorted({name.split(".")[0] for name in heavy}),
+            "ok": median <= limit and not heavy,
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'script':<24}{'median':>10}{'budget':>10}  heavy imports")
+        for r in results:
+            flag = "" if r["ok"] else "  FAIL"
+            print(
+                f"{r['script']:<24}{r['median_ms']:>8.1f}ms{r['budget_ms']:>8.0f}ms"
+                f"  {', '.join(r['heavy']) or '-'}{flag}"
+            )
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark response compression and JSON decoding of the store API layer.
+
+Serves a synthetic App Store Connect equalizations page (175 territories
+with include=territory, shaped like the real response) from a local HTTP
+server that honours Accept-Encoding, then fetches it through StoreSession:
+
+  before  Accept-Encoding: identity, stdlib json
+  after   the session defaults (gzip/deflate[/br], orjson when installed)
+
+It also reports the size of the 175-territory availability request body
+with and without gzip.
+
+  python3 bench/bench_payloads.py [--rounds 50]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "templates", "scripts"))
+
+import store_http  # noqa: E402
+
+TERRITORIES = 175
+BASE = "https://api.appstoreconnect.apple.com/v1"
+
+
+def equalizations_page() -> bytes:
+    """A full (non-sparse) equalizations page with included territories."""
+    data, included = [], []
+    for i in range(TERRITORIES):
+        territory = f"T{i:03d}"
+        point_id = f"eyJzIjoiNjQ0NTQ2MTc3NSIsInQiOiJ{territory}IiwicCI6IjEwMDM4In0"
+        data.append({
+            "type": "subscriptionPricePoints",
+            "id": point_id,
+            "attributes": {"customerPrice": f"{9.99 + i / 100:.2f}", "proceeds": "6.99", "proceedsYear2": "8.49"},
+            "relationships": {
+                "territory": {
+                    "data": {"type": "territories", "id": territory},
+                    "links": {"self": f"{BASE}/subscriptionPricePoints/{point_id}/relationships/territory",
+                              "related": f"{BASE}/subscriptionPricePoints/{point_id}/territory"},
+                },
+                "equalizations": {"links": {"related": f"{BASE}/subscriptionPricePoints/{point_id}/equalizations"}},
+            },
+            "links": {"self": f"{BASE}/subscriptionPricePoints/{point_id}"},
+        })
+        included.append({
+            "type": "territories", "id": territory, "attributes": {"currency": "USD"},
+            "links": {"self": f"{BASE}/territories/{territory}"},
+        })
+    page = {"data": data, "included": included, "links": {"self": f"{BASE}/subscriptionPricePoints/x/equalizations"},
+            "meta": {"paging": {"total": TERRITORIES, "limit": 200}}}
+    return json.dumps(page).encode("utf-8")
+
+
+def serve(body: bytes) -> ThreadingHTTPServer:
+    compressed = gzip.compress(body, compresslevel=6)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+            payload = compressed if use_gzip else body
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            if use_gzip:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            self.server.bytes_sent += len(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.bytes_sent = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(server, label: str, rounds: int, accept_encoding: str | None, codec: str) -> None:
+    os.environ["STORE_JSON"] = codec
+    session = store_http.StoreSession()
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+    url = f"http://127.0.0.1:{server.server_address[1]}/equalizations"
+    session.get(url, headers=headers).json()  # warm up the connection
+    server.bytes_sent = 0
+    fetch = decode = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        resp = session.get(url, headers=headers)
+        content = resp.content
+        mid = time.perf_counter()
+        resp.json()
+        fetch += mid - start
+        decode += time.perf_counter() - mid
+    print(
+        f"{label:<8} {server.bytes_sent / rounds / 1024:>9.1f} KB/resp {len(content) / 1024:>9.1f} KB decoded "
+        f"{fetch / rounds * 1000:>8.2f} ms fetch {decode / rounds * 1000:>8.2f} ms decode ({store_http.json_codec()})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    body = equalizations_page()
+    server = serve(body)
+    print(f"Equalizations page: {len(body) / 1024:.1f} KB, {TERRITORIES} territories, {args.rounds} rounds")
+    print(f"Accept-Encoding default: {store_http.ACCEPT_ENCODING}")
+    run(server, "before", args.rounds, "identity", "stdlib")
+    run(server, "after", args.rounds, None, "")
+    server.shutdown()
+
+    availability = store_http.dumps({"data": {
+        "type": "subscriptionAvailabilities",
+        "attributes": {"availableInNewTerritories": True},
+        "relationships": {
+            "subscription": {"data": {"type": "subscriptions", "id": "6445461775"}},
+            "availableTerritories": {"data": [{"type": "territories", "id": f"T{i:03d}"} for i in range(TERRITORIES)]},
+        },
+    }})
+    print(
+        f"Availability request body: {len(availability) / 1024:.1f} KB plain, "
+        f"{len(gzip.compress(availability, compresslevel=6)) / 1024:.1f} KB gzip"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Phased polling with backoff, jitter and a learned completion estimate.
+
+A poll loop moves through named phases (e.g. "waiting" for a resource to
+appear, "processing", "near" the expected finish). Each phase has its own
+initial interval, backoff factor and maximum interval; the interval resets
+when the phase changes and every delay gets +/-JITTER random spread so
+parallel pipelines do not poll in lockstep.
+
+Phase intervals can be overridden per phase with
+<ENV_PREFIX>_<PHASE>=<initial>[,<max>[,<factor>]] (seconds), e.g.
+BUILD_POLL_NEAR=5,15,1.2.
+
+DurationHistory keeps the last few observed durations in .ci-state so the
+caller can tell how long the operation usually takes.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+import ci_state
+
+JITTER = 0.2
+HISTORY_SIZE = 10
+
+
+class PollPhase:
+    """Backoff schedule of one poll phase."""
+
+    def __init__(self, initial: float, maximum: float, factor: float = 1.5):
+        self.initial = initial
+        self.maximum = max(initial, maximum)
+        self.factor = max(1.0, factor)
+
+    def delay(self, attempt: int) -> float:
+        """Delay before the given (0-based) poll of the phase, without jitter."""
+        return min(self.maximum, self.initial * self.factor ** attempt)
+
+
+def phase_from_env(env_prefix: str, name: str, default: PollPhase) -> PollPhase:
+    """Return the phase schedule, honouring <ENV_PREFIX>_<NAME>=initial[,max[,factor]]."""
+    value = os.environ.get(f"{env_prefix}_{name.upper()}")
+    if not value:
+        return default
+    try:
+        parts = [float(p) for p in value.split(",")]
+    except ValueError:
+        print(f"WARNING: Ignoring invalid {env_prefix}_{name.upper()}={value!r}", file=sys.stderr)
+        return default
+    initial = parts[0]
+    maximum = parts[1] if len(parts) > 1 else default.maximum
+    factor = parts[2] if len(parts) > 2 else default.factor
+    return PollPhase(initial, maximum, factor)
+
+
+class PhasedPoller:
+    """Sleeps between polls according to the current phase and records timing stats.
+
+    `sleep` can be replaced by any callable taking seconds (e.g. one that
+    returns early when a notification arrives).
+    """
+
+    def __init__(self, phases: dict[str, PollPhase], timeout: float, sleep=time.sleep):
+        self.phases = phases
+        self.timeout = timeout
+        self._sleep = sleep
+        self._start = time.monotonic()
+        self._phase: str | None = None
+        self._attempt = 0
+        self.polls: dict[str, int] = {name: 0 for name in phases}
+        self.slept = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the poller was created."""
+        return time.monotonic() - self._start
+
+    def expired(self) -> bool:
+        """Whether the overall timeout has passed."""
+        return self.elapsed >= self.timeout
+
+    def wait(self, phase: str, cap: float | None = None) -> float:
+        """Sleep before the next poll of `phase`. Returns the seconds slept.
+
+        `cap` bounds the delay (before jitter is applied on the way down),
+        e.g. to wake up in time for an expected completion.
+        """
+        if phase != self._phase:
+            self._phase, self._attempt = phase, 0
+        delay = self.phases[phase].delay(self._attempt)
+        self._attempt += 1
+        self.polls[phase] += 1
+        if cap is not None:
+            delay = min(delay, max(1.0, cap))
+        delay *= random.uniform(1 - JITTER, 1 + JITTER)
+        delay = max(0.0, min(delay, self.timeout - self.elapsed))
+        self._sleep(delay)
+        self.slept += delay
+        return delay
+
+    def summary(self) -> str:
+        """One-line description of the polls made and the time spent."""
+        per_phase = ", ".join(f"{name} {count}" for name, count in self.polls.items() if count)
+        return (
+            f"{sum(self.polls.values())} wait(s) ({per_phase or 'none'}), "
+            f"{self.slept:.0f}s asleep, {self.elapsed:.0f}s total"
+        )
+
+
+class DurationHistory:
+    """Recent durations of an operation (per scope), persisted in .ci-state."""
+
+    def __init__(self, name: str, scope: str, size: int = HISTORY_SIZE):
+        self._name = name
+        self._scope = scope
+        self._size = size
+        self._data = ci_state.load_json(name, {}) or {}
+        self.samples: list = list(self._data.get(scope, []))
+
+    def estimate(self) -> float | None:
+        """Median of the recorded durations, or None without history."""
+        return statistics.median(self.samples) if self.samples else None
+
+    def record(self, seconds: float) -> None:
+        """Add a duration and persist the most recent ones."""
+        self.samples = (self.samples + [round(seconds, 1)])[-self._size:]
+        self._data[self._scope] = self.samples
+        ci_state.save_json(self._name, self._data)
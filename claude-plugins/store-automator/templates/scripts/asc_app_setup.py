@@ -21,68 +21,30 @@ Exit codes:
 """
 import os
 import sys
-import time
-
-try:
-    import jwt
-    import requests
-except ImportError:
-    import subprocess
-    subprocess.check_call(
-        [sys.executable, "-m", "pip", "install", "--break-system-packages", "PyJWT", "cryptography", "requests"],
-        stdout=subprocess.DEVNULL,
-    )
-    import jwt
-    import requests
-
-BASE_URL = "https://api.appstoreconnect.apple.com/v1"
-TIMEOUT = (10, 30)
-
-
-def get_jwt_token(key_id: str, issuer_id: str, private_key: str) -> str:
-    """Generate a signed JWT for App Store Connect API authentication."""
-    now = int(time.time())
-    payload = {
-        "iss": issuer_id,
-        "iat": now,
-        "exp": now + 1200,
-        "aud": "appstoreconnect-v1",
-    }
-    return jwt.encode(payload, private_key, algorithm="ES256", headers={"kid": key_id})
-
-
-def get_app_id(headers: dict, bundle_id: str) -> str:
-    """Look up the App Store Connect app ID for the given bundle identifier."""
-    resp = requests.get(
-        f"{BASE_URL}/apps",
-        params={"filter[bundleId]": bundle_id},
-        headers=headers,
-        timeout=TIMEOUT,
-    )
-    resp.raise_for_status()
-    data = resp.json().get("data", [])
-    if not data:
-        print(f"ERROR: No app found for bundle ID '{bundle_id}'", file=sys.stderr)
-        sys.exit(1)
-    return data[0]["id"]
-
 
-def print_api_errors(resp, action: str) -> None:
-    """Print human-readable API error messages."""
-    try:
-        errors = resp.json().get("errors", [])
-        for err in errors:
-            detail = err.get("detail", err.get("title", "Unknown error"))
-            print(f"ERROR ({action}): {detail}", file=sys.stderr)
-    except (ValueError, KeyError):
-        print(f"ERROR ({action}): HTTP {resp.status_code} - {resp.text[:200]}", file=sys.stderr)
+from asc_client import (
+    BASE_URL,
+    PAGE_LIMIT,
+    TIMEOUT,
+    auth_headers,
+    get_app_id,
+    get_session,
+    paginate,
+    print_api_errors,
+    sparse_fields,
+)
 
 
 def set_content_rights(headers: dict, app_id: str, uses_third_party: bool) -> None:
     """Set the content rights declaration on the app."""
     desired = "USES_THIRD_PARTY_CONTENT" if uses_third_party else "DOES_NOT_USE_THIRD_PARTY_CONTENT"
 
-    resp = requests.get(f"{BASE_URL}/apps/{app_id}", headers=headers, timeout=TIMEOUT)
+    resp = get_session().get(
+        f"{BASE_URL}/apps/{app_id}",
+        params=sparse_fields({"apps": ["contentRightsDeclaration"]}),
+        headers=headers,
+        timeout=TIMEOUT,
+    )
     resp.raise_for_status()
     current = resp.json()["data"]["attributes"].get("contentRightsDeclaration")
 
@@ -90,7 +52,7 @@ def set_content_rights(headers: dict, app_id: str, uses_third_party: bool) -> No
         print(f"  Content rights already set to '{desired}', skipping.")
         return
 
-    patch_resp = requests.patch(
+    patch_resp = get_session().patch(
         f"{BASE_URL}/apps/{app_id}",
         json={
             "data": {
@@ -110,19 +72,12 @@ def set_content_rights(headers: dict, app_id: str, uses_third_party: bool) -> No
 
 def get_app_price_points(headers: dict, app_id: str, territory: str = "USA") -> list:
     """Fetch all price points for the app in the given territory, with pagination."""
-    url = f"{BASE_URL}/apps/{app_id}/appPricePoints"
-    params = {"filter[territory]": territory, "limit": 200}
-    all_points = []
-
-    while url:
-        resp = requests.get(url, params=params, headers=headers, timeout=TIMEOUT)
-        resp.raise_for_status()
-        body = resp.json()
-        all_points.extend(body.get("data", []))
-        url = body.get("links", {}).get("next")
-        params = None
-
-    return all_points
+    return paginate(
+        headers,
+        f"{BASE_URL}/apps/{app_id}/appPricePoints",
+        {"filter[territory]": territory, "limit": PAGE_LIMIT},
+        raise_errors=True,
+    ).all()
 
 
 def find_price_point_for_tier(price_points: list, tier: int = 0) -> str:
@@ -148,7 +103,7 @@ def find_price_point_for_tier(price_points: list, tier: int = 0) -> str:
 
 def _is_pricing_set(headers: dict, app_id: str, price_tier: int) -> bool:
     """Check if the app already has pricing set for the given tier."""
-    schedule_resp = requests.get(
+    schedule_resp = get_session().get(
         f"{BASE_URL}/apps/{app_id}/appPriceSchedule",
         params={"include": "manualPrices,baseTerritory"},
         headers=headers,
@@ -166,10 +121,10 @@ def _is_pricing_set(headers: dict, app_id: str, price_tier: int) -> bool:
     return False
 
 
-def _create_price_schedule(headers: dict, app_id: str, price_point_id: str) -> requests.Response:
+def _create_price_schedule(headers: dict, app_id: str, price_point_id: str):
     """POST a new app price schedule and return the response."""
     price_ref_id = "${price-usa}"
-    return requests.post(
+    return get_session().post(
         f"{BASE_URL}/appPriceSchedules",
         json={
             "data": {
@@ -195,6 +150,7 @@ def _create_price_schedule(headers: dict, app_id: str, price_point_id: str) -> r
         },
         headers=headers,
         timeout=TIMEOUT,
+        idempotent=True,
     )
 
 
@@ -254,11 +210,7 @@ def main() -> None:
 
     uses_third_party = third_party_str.lower() == "true"
 
-    token = get_jwt_token(key_id, issuer_id, private_key)
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
+    headers = auth_headers(key_id, issuer_id, private_key)
 
     print(f"Looking up app for bundle ID '{bundle_id}'...")
     app_id = get_app_id(headers, bundle_id)
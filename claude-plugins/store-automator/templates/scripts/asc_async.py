@@ -0,0 +1,154 @@
+"""
+Asyncio variant of the App Store Connect IAP API layer.
+
+Every coroutine here runs its blocking counterpart from asc_iap_api,
+asc_subscription_setup or asc_subscription_submit on a worker thread over
+the shared pooled session. A per-event-loop semaphore caps the number of
+calls in flight, so independent requests can be issued with asyncio.gather
+without flooding App Store Connect.
+
+The limit is ASC_CONCURRENCY (4 when unset), read once at import.
+
+TaskGraph schedules coroutines that depend on each other: every node starts
+as soon as the nodes it runs after have finished, so independent work
+proceeds concurrently (still within the call limit above).
+"""
+import asyncio
+import functools
+import os
+import weakref
+
+import asc_iap_api
+import asc_subscription_setup
+import asc_subscription_submit
+
+DEFAULT_CONCURRENCY = 4
+
+_limit = max(1, int(os.environ.get("ASC_CONCURRENCY", DEFAULT_CONCURRENCY)))
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_limit)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking API function on a worker thread within the concurrency limit."""
+    async with _get_semaphore():
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+
+class TaskGraphError(Exception):
+    """Raised by TaskGraph.run() after every runnable node finished, when some failed."""
+
+    def __init__(self, failures: dict, skipped: set):
+        self.failures = failures
+        self.skipped = skipped
+        summary = "; ".join(f"{name}: {type(e).__name__}: {e}" for name, e in failures.items())
+        super().__init__(f"{len(failures)} task(s) failed, {len(skipped)} skipped -- {summary}")
+
+
+class TaskGraph:
+    """Run named coroutine functions concurrently, each after its dependencies.
+
+    Nodes are added in dependency order with add(name, func, after=[...]);
+    run() starts every node as soon as the nodes it depends on have finished
+    and returns their results by name. If a node raises, the nodes that run
+    after it are skipped while every independent node still runs to the end;
+    run() then raises TaskGraphError naming the failed nodes.
+    """
+
+    def __init__(self):
+        self._nodes: dict = {}
+        self._results: dict = {}
+
+    def add(self, name: str, func, after=()) -> str:
+        """Register a zero-argument coroutine function to run after the named nodes."""
+        if name in self._nodes:
+            raise ValueError(f"Duplicate task name: {name}")
+        missing = [dep for dep in after if dep not in self._nodes]
+        if missing:
+            raise ValueError(f"Task {name} depends on unknown task(s): {', '.join(missing)}")
+        self._nodes[name] = (func, tuple(after))
+        return name
+
+    def result(self, name: str):
+        """Return the result of a finished node (for use by the nodes that run after it)."""
+        return self._results[name]
+
+    async def run(self) -> dict:
+        """Run every node, respecting dependencies. Returns {name: result}."""
+        tasks: dict = {}
+        failures: dict = {}
+        skipped: set = set()
+
+        async def run_node(name: str) -> None:
+            func, after = self._nodes[name]
+            for dep in after:
+                await tasks[dep]
+            if any(dep in failures or dep in skipped for dep in after):
+                skipped.add(name)
+                return
+            try:
+                self._results[name] = await func()
+            except Exception as e:
+                failures[name] = e
+
+        for name in self._nodes:
+            tasks[name] = asyncio.ensure_future(run_node(name))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        if failures:
+            raise TaskGraphError(failures, skipped)
+        return dict(self._results)
+
+
+def _async_variant(func):
+    """Wrap a blocking API function into a bounded coroutine function."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(func, *args, **kwargs)
+    return wrapper
+
+
+# asc_iap_api
+list_subscription_groups = _async_variant(asc_iap_api.list_subscription_groups)
+create_subscription_group = _async_variant(asc_iap_api.create_subscription_group)
+list_subscriptions_in_group = _async_variant(asc_iap_api.list_subscriptions_in_group)
+create_subscription = _async_variant(asc_iap_api.create_subscription)
+get_subscription_localizations = _async_variant(asc_iap_api.get_subscription_localizations)
+create_localization = _async_variant(asc_iap_api.create_localization)
+update_localization = _async_variant(asc_iap_api.update_localization)
+get_group_localizations = _async_variant(asc_iap_api.get_group_localizations)
+create_group_localization = _async_variant(asc_iap_api.create_group_localization)
+update_group_localization = _async_variant(asc_iap_api.update_group_localization)
+
+# asc_subscription_setup
+get_subscription_availability = _async_variant(asc_subscription_setup.get_subscription_availability)
+list_all_territory_ids = _async_variant(asc_subscription_setup.list_all_territory_ids)
+create_subscription_availability = _async_variant(asc_subscription_setup.create_subscription_availability)
+get_subscription_prices = _async_variant(asc_subscription_setup.get_subscription_prices)
+get_price_points_for_territory = _async_variant(asc_subscription_setup.get_price_points_for_territory)
+get_price_point_index = _async_variant(asc_subscription_setup.get_price_point_index)
+get_price_point_equalizations = _async_variant(asc_subscription_setup.get_price_point_equalizations)
+create_subscription_price = _async_variant(asc_subscription_setup.create_subscription_price)
+get_review_screenshot = _async_variant(asc_subscription_setup.get_review_screenshot)
+upload_review_screenshot = _async_variant(asc_subscription_setup.upload_review_screenshot)
+delete_review_screenshot = _async_variant(asc_subscription_setup.delete_review_screenshot)
+
+# asc_subscription_submit
+create_review_submission = _async_variant(asc_subscription_submit.create_review_submission)
+create_group_submission = _async_variant(asc_subscription_submit.create_group_submission)
@@ -0,0 +1,305 @@
+"""
+Shared App Store Connect API client.
+
+Every ASC script talks to api.appstoreconnect.apple.com through the single
+pooled session returned by get_session(), so TCP+TLS handshakes are paid once
+per process instead of once per call. The transport and the retry policy
+(backoff, Retry-After, idempotency rules) come from store_http: HTTP/2 via
+httpx when installed, a keep-alive requests.Session otherwise.
+
+Every App Store Connect call also takes a token from a shared token-bucket
+limiter, so concurrent workers stay within ASC_MAX_RPS requests per second
+(default 20, 0 disables pacing). The limiter adapts to the hourly quota that
+ASC reports in the X-Rate-Limit response header: full speed while more than
+half the quota is left, then slowing in proportion to what is left, so heavy
+use tapers off as the quota drains instead of hitting 429s at full speed.
+The quota left is printed to stderr when the process exits.
+
+Authentication is handled by AscAuth, installed on the session by
+auth_headers(): it signs a new ES256 token shortly before the current one
+expires, so long runs never hit 401s, and caches the still-valid signed
+token in .ci-state/asc-token.json (owner-only) so consecutive scripts in one
+workflow reuse it without parsing the key or signing again. Set
+ASC_TOKEN_CACHE=0 to keep tokens in memory only.
+
+List endpoints are read through paginate(), which follows `links.next`
+lazily and prefetches the next page (see store_paging).
+
+Reads declare the fields they use with sparse_fields(), so ASC returns only
+those attributes and relationships. Response bytes are tallied per endpoint;
+set ASC_PAYLOAD_REPORT=1 to print the tally when the process exits.
+"""
+import atexit
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import ci_state
+import deps
+from rate_limit import TokenBucket
+from store_http import TIMEOUT, StoreSession
+from store_paging import Paginator
+
+# PyJWT signs ES256 through cryptography; both are imported on first signature
+deps.check("jwt", "cryptography")
+
+BASE_URL = "https://api.appstoreconnect.apple.com/v1"
+# Largest page size ASC list endpoints accept
+PAGE_LIMIT = 200
+MAX_RPS = float(os.environ.get("ASC_MAX_RPS", "20"))
+TOKEN_LIFETIME = 1200
+TOKEN_REFRESH_MARGIN = 120
+TOKEN_CACHE_FILE = "asc-token.json"
+
+# Slowest pace when the hourly quota is nearly exhausted (one call per minute)
+MIN_RPS = 1 / 60
+QUOTA_WINDOW = 3600
+
+_session = None
+_session_lock = threading.Lock()
+rate_limiter = TokenBucket(MAX_RPS)
+
+_quota_lock = threading.Lock()
+_quota = {"limit": None, "remaining": None, "requests": 0}
+_payloads: dict[str, list] = {}
+_app_ids: dict[str, str] = {}
+
+
+def credential_fingerprint(key_id: str, issuer_id: str, private_key: str) -> str:
+    """Hash identifying an API key, used to match cached tokens to their key."""
+    return hashlib.sha256(f"{key_id}:{issuer_id}:{private_key}".encode("utf-8")).hexdigest()
+
+
+class AscAuth:
+    """Self-refreshing App Store Connect token provider with a .ci-state cache."""
+
+    def __init__(self, key_id: str, issuer_id: str, private_key: str, use_cache: bool | None = None):
+        self._key_id = key_id
+        self._issuer_id = issuer_id
+        self._private_key = private_key
+        if use_cache is None:
+            use_cache = os.environ.get("ASC_TOKEN_CACHE", "1") != "0"
+        self._use_cache = use_cache
+        self.fingerprint = credential_fingerprint(key_id, issuer_id, private_key)
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0
+
+    def applies_to(self, url: str) -> bool:
+        """Only App Store Connect API calls carry the token (not upload URLs)."""
+        return url.startswith(BASE_URL)
+
+    def authorization(self) -> str:
+        """Return the Authorization header value, refreshing the token if needed."""
+        with self._lock:
+            if self._expires_at - time.time() <= TOKEN_REFRESH_MARGIN:
+                self._load_or_sign()
+            return f"Bearer {self._token}"
+
+    def invalidate(self) -> None:
+        """Forget the current token (e.g. after a 401) so the next call signs a new one."""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0
+            if self._use_cache:
+                ci_state.save_json(TOKEN_CACHE_FILE, {}, private=True)
+
+    def _load_or_sign(self) -> None:
+        if self._use_cache:
+            cached = ci_state.load_json(TOKEN_CACHE_FILE, {}) or {}
+            if (
+                cached.get("fingerprint") == self.fingerprint
+                and cached.get("expires_at", 0) - time.time() > TOKEN_REFRESH_MARGIN
+            ):
+                self._token = cached["token"]
+                self._expires_at = cached["expires_at"]
+                return
+        self._expires_at = int(time.time()) + TOKEN_LIFETIME
+        self._token = get_jwt_token(self._key_id, self._issuer_id, self._private_key)
+        if self._use_cache:
+            ci_state.save_json(TOKEN_CACHE_FILE, {
+                "fingerprint": self.fingerprint,
+                "token": self._token,
+                "expires_at": self._expires_at,
+            }, private=True)
+
+
+class _AscSession(StoreSession):
+    """Retrying session that paces App Store Connect calls through rate_limiter."""
+
+    def before_request(self, method: str, url: str) -> None:
+        if url.startswith(BASE_URL):
+            rate_limiter.acquire()
+
+    def after_response(self, method: str, url: str, resp) -> None:
+        if url.startswith(BASE_URL):
+            _record_quota(resp.headers.get("X-Rate-Limit"))
+            _record_payload(f"{method} {endpoint_template(url)}", len(resp.content or b""))
+
+
+def parse_rate_limit(header: str | None) -> tuple[int | None, int | None]:
+    """Parse 'user-hour-lim:3600;user-hour-rem:3545;' into (limit, remaining)."""
+    if not header:
+        return None, None
+    values = dict(re.findall(r"([\w-]+):(\d+)", header))
+    limit = values.get("user-hour-lim")
+    remaining = values.get("user-hour-rem")
+    return (
+        int(limit) if limit is not None else None,
+        int(remaining) if remaining is not None else None,
+    )
+
+
+def _pace_for_quota(limit: int, remaining: int) -> float:
+    """Requests per second for the quota left: MAX_RPS down to half the quota, then proportional.
+
+    Below half the quota the rate is MAX_RPS * 2 * remaining / limit, so use
+    decays roughly exponentially (it slows, but does not stretch the
+    remainder over the hour). It never drops below an even spread of the
+    remainder over a full window (remaining / QUOTA_WINDOW) or MIN_RPS.
+    """
+    if MAX_RPS <= 0 or limit <= 0:
+        return MAX_RPS
+    fraction = remaining / limit
+    rate = MAX_RPS * min(1.0, 2 * fraction)
+    return max(rate, remaining / QUOTA_WINDOW, MIN_RPS)
+
+
+def _record_quota(header: str | None) -> None:
+    """Remember the latest quota reading and retune the limiter to match."""
+    limit, remaining = parse_rate_limit(header)
+    with _quota_lock:
+        _quota["requests"] += 1
+        if limit is None or remaining is None:
+            return
+        _quota["limit"] = limit
+        _quota["remaining"] = remaining
+    rate = _pace_for_quota(limit, remaining)
+    if rate != rate_limiter.rate:
+        rate_limiter.set_rate(rate, capacity=max(1.0, rate))
+
+
+def sparse_fields(fields: dict[str, list[str]]) -> dict:
+    """Query parameters limiting each resource type to the given attributes/relationships."""
+    return {f"fields[{resource}]": ",".join(names) for resource, names in fields.items()}
+
+
+def endpoint_template(url: str) -> str:
+    """URL path relative to BASE_URL with resource IDs replaced by {id}."""
+    segments = urlsplit(url).path.split("/")[2:]
+    return "/".join(
+        "{id}" if i % 2 and segments[i - 1] != "relationships" else seg
+        for i, seg in enumerate(segments)
+    )
+
+
+def _record_payload(endpoint: str, size: int) -> None:
+    with _quota_lock:
+        calls = _payloads.setdefault(endpoint, [0, 0])
+        calls[0] += 1
+        calls[1] += size
+
+
+def report_payloads() -> None:
+    """Print response bytes per endpoint when ASC_PAYLOAD_REPORT=1."""
+    if os.environ.get("ASC_PAYLOAD_REPORT", "0") in ("", "0"):
+        return
+    with _quota_lock:
+        rows = sorted(_payloads.items(), key=lambda item: -item[1][1])
+    if not rows:
+        return
+    print("ASC payload per endpoint:", file=sys.stderr)
+    for endpoint, (calls, size) in rows:
+        print(
+            f"  {endpoint:<60} {calls:>5} call(s) {size / 1024:>9.1f} KB"
+            f" ({size / calls / 1024:.1f} KB/call)",
+            file=sys.stderr,
+        )
+
+
+def report_quota() -> None:
+    """Print the request count and hourly quota left, if any call was made."""
+    with _quota_lock:
+        requests_made, limit, remaining = _quota["requests"], _quota["limit"], _quota["remaining"]
+    if not requests_made:
+        return
+    summary = f"ASC API: {requests_made} request(s) this run"
+    if limit is not None:
+        summary += f", {remaining}/{limit} hourly quota left"
+    print(summary, file=sys.stderr)
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _AscSession()
+            atexit.register(report_quota)
+            atexit.register(report_payloads)
+        return _session
+
+
+def get_jwt_token(key_id: str, issuer_id: str, private_key: str) -> str:
+    """Generate a signed JWT for App Store Connect API authentication."""
+    now = int(time.time())
+    payload = {
+        "iss": issuer_id,
+        "iat": now,
+        "exp": now + TOKEN_LIFETIME,
+        "aud": "appstoreconnect-v1",
+    }
+    return deps.load("jwt").encode(payload, private_key, algorithm="ES256", headers={"kid": key_id})
+
+
+def auth_headers(key_id: str, issuer_id: str, private_key: str) -> dict:
+    """Install an AscAuth provider on the shared session and return the JSON request headers.
+
+    The Authorization header is added by the session on every call, so the
+    returned headers stay valid for the whole run. A provider already
+    installed for the same key is kept, with its token.
+    """
+    session = get_session()
+    fingerprint = credential_fingerprint(key_id, issuer_id, private_key)
+    if not isinstance(session.auth, AscAuth) or session.auth.fingerprint != fingerprint:
+        session.auth = AscAuth(key_id, issuer_id, private_key)
+    return {"Content-Type": "application/json"}
+
+
+def paginate(headers: dict, url: str, params: dict | None = None, **kwargs) -> Paginator:
+    """Lazy paginator over an App Store Connect list endpoint (see store_paging.Paginator)."""
+    return Paginator(get_session(), url, params, headers=headers, **kwargs)
+
+
+def get_app_id(headers: dict, bundle_id: str) -> str:
+    """Look up the App Store Connect app ID for the given bundle identifier (memoized per process)."""
+    if bundle_id in _app_ids:
+        return _app_ids[bundle_id]
+    resp = get_session().get(
+        f"{BASE_URL}/apps",
+        params={"filter[bundleId]": bundle_id, "limit": 1, **sparse_fields({"apps": ["bundleId"]})},
+        headers=headers,
+        timeout=TIMEOUT,
+    )
+    resp.raise_for_status()
+    data = resp.json().get("data", [])
+    if not data:
+        print(f"ERROR: No app found for bundle ID '{bundle_id}'", file=sys.stderr)
+        sys.exit(1)
+    _app_ids[bundle_id] = data[0]["id"]
+    return _app_ids[bundle_id]
+
+
+def print_api_errors(resp, action: str) -> None:
+    """Print human-readable API error messages."""
+    try:
+        errors = resp.json().get("errors", [])
+        for err in errors:
+            detail = err.get("detail", err.get("title", "Unknown error"))
+            print(f"ERROR ({action}): {detail}", file=sys.stderr)
+    except (ValueError, KeyError):
+        print(f"ERROR ({action}): HTTP {resp.status_code} - {resp.text[:200]}", file=sys.stderr)
@@ -4,23 +4,7 @@ App Store Connect IAP API layer.
 Low-level functions for interacting with the App Store Connect REST API
 for subscription groups and subscriptions.
 """
-import sys
-import time
-
-try:
-    import jwt
-    import requests
-except ImportError:
-    import subprocess
-    subprocess.check_call(
-        [sys.executable, "-m", "pip", "install", "--break-system-packages", "PyJWT", "cryptography", "requests"],
-        stdout=subprocess.DEVNULL,
-    )
-    import jwt
-    import requests
-
-BASE_URL = "https://api.appstoreconnect.apple.com/v1"
-TIMEOUT = (10, 30)
+from asc_client import BASE_URL, PAGE_LIMIT, TIMEOUT, get_session, paginate, print_api_errors, sparse_fields
 
 # ISO 8601 duration to App Store Connect subscription period mapping
 DURATION_MAP = {
@@ -38,48 +22,26 @@ DURATION_MAP = {
     "ONE_YEAR": "ONE_YEAR",
 }
 
-
-def get_jwt_token(key_id: str, issuer_id: str, private_key: str) -> str:
-    """Generate a signed JWT for App Store Connect API authentication."""
-    payload = {
-        "iss": issuer_id,
-        "iat": int(time.time()),
-        "exp": int(time.time()) + 1200,
-        "aud": "appstoreconnect-v1",
-    }
-    return jwt.encode(payload, private_key, algorithm="ES256", headers={"kid": key_id})
-
-
-def get_app_id(headers: dict, bundle_id: str) -> str:
-    """Look up the App Store Connect app ID for the given bundle identifier."""
-    resp = requests.get(
-        f"{BASE_URL}/apps",
-        params={"filter[bundleId]": bundle_id},
-        headers=headers,
-        timeout=TIMEOUT,
-    )
-    resp.raise_for_status()
-    data = resp.json().get("data", [])
-    if not data:
-        print(f"ERROR: No app found for bundle ID '{bundle_id}'", file=sys.stderr)
-        sys.exit(1)
-    return data[0]["id"]
+# Fields the sync reads from each resource type (sent as fields[...] parameters)
+GROUP_FIELDS = ["referenceName"]
+SUBSCRIPTION_FIELDS = ["productId", "name", "state", "reviewNote", "familySharable"]
+SUBSCRIPTION_LOCALIZATION_FIELDS = ["locale", "name", "description"]
+GROUP_LOCALIZATION_FIELDS = ["locale", "name", "customAppName"]
 
 
 def list_subscription_groups(headers: dict, app_id: str) -> list:
     """List all existing subscription groups for the app."""
-    resp = requests.get(
+    return paginate(
+        headers,
         f"{BASE_URL}/apps/{app_id}/subscriptionGroups",
-        headers=headers,
-        timeout=TIMEOUT,
-    )
-    resp.raise_for_status()
-    return resp.json().get("data", [])
+        {"limit": PAGE_LIMIT, **sparse_fields({"subscriptionGroups": GROUP_FIELDS})},
+        raise_errors=True,
+    ).all()
 
 
 def create_subscription_group(headers: dict, app_id: str, reference_name: str) -> str:
-    """Create a subscription group and return its ID."""
-    resp = requests.post(
+    """Create a subscription group and return its ID. Raises the HTTP error on failure."""
+    resp = get_session().post(
         f"{BASE_URL}/subscriptionGroups",
         json={
             "data": {
@@ -95,7 +57,7 @@ def create_subscription_group(headers: dict, app_id: str, reference_name: str) -
     )
     if not resp.ok:
         print_api_errors(resp, f"create subscription group '{reference_name}'")
-        sys.exit(1)
+        resp.raise_for_status()
     group_id = resp.json()["data"]["id"]
     print(f"  Created subscription group '{reference_name}' (ID: {group_id})")
     return group_id
@@ -103,19 +65,18 @@ def create_subscription_group(headers: dict, app_id: str, reference_name: str) -
 
 def list_subscriptions_in_group(headers: dict, group_id: str) -> list:
     """List all subscriptions within a subscription group."""
-    resp = requests.get(
+    return paginate(
+        headers,
         f"{BASE_URL}/subscriptionGroups/{group_id}/subscriptions",
-        headers=headers,
-        timeout=TIMEOUT,
-    )
-    resp.raise_for_status()
-    return resp.json().get("data", [])
+        {"limit": PAGE_LIMIT, **sparse_fields({"subscriptions": SUBSCRIPTION_FIELDS})},
+        raise_errors=True,
+    ).all()
 
 
 def create_subscription(headers: dict, group_id: str, sub_config: dict) -> str:
-    """Create a subscription within a group and return its ID."""
+    """Create a subscription within a group and return its ID. Raises the HTTP error on failure."""
     duration = DURATION_MAP.get(sub_config["duration"], sub_config["duration"])
-    resp = requests.post(
+    resp = get_session().post(
         f"{BASE_URL}/subscriptions",
         json={
             "data": {
@@ -138,7 +99,7 @@ def create_subscription(headers: dict, group_id: str, sub_config: dict) -> str:
     )
     if not resp.ok:
         print_api_errors(resp, f"create subscription '{sub_config['product_id']}'")
-        sys.exit(1)
+        resp.raise_for_status()
     sub_id = resp.json()["data"]["id"]
     print(f"    Created subscription '{sub_config['product_id']}' (ID: {sub_id})")
     return sub_id
@@ -146,18 +107,17 @@ def create_subscription(headers: dict, group_id: str, sub_config: dict) -> str:
 
 def get_subscription_localizations(headers: dict, sub_id: str) -> list:
     """Fetch existing localizations for a subscription."""
-    resp = requests.get(
+    return paginate(
+        headers,
         f"{BASE_URL}/subscriptions/{sub_id}/subscriptionLocalizations",
-        headers=headers,
-        timeout=TIMEOUT,
-    )
-    resp.raise_for_status()
-    return resp.json().get("data", [])
+        {"limit": PAGE_LIMIT, **sparse_fields({"subscriptionLocalizations": SUBSCRIPTION_LOCALIZATION_FIELDS})},
+        raise_errors=True,
+    ).all()
 
 
-def create_localization(headers: dict, sub_id: str, locale: str, loc_data: dict) -> None:
-    """Create a new localization for a subscription."""
-    resp = requests.post(
+def create_localization(headers: dict, sub_id: str, locale: str, loc_data: dict) -> bool:
+    """Create a new localization for a subscription. Returns True on success."""
+    resp = get_session().post(
         f"{BASE_URL}/subscriptionLocalizations",
         json={
             "data": {
@@ -177,13 +137,14 @@ def create_localization(headers: dict, sub_id: str, locale: str, loc_data: dict)
     )
     if not resp.ok:
         print_api_errors(resp, f"create localization '{locale}' for subscription {sub_id}")
-        return
+        return False
     print(f"      Created localization '{locale}'")
+    return True
 
 
-def update_localization(headers: dict, loc_id: str, loc_data: dict) -> None:
-    """Update an existing subscription localization."""
-    resp = requests.patch(
+def update_localization(headers: dict, loc_id: str, loc_data: dict) -> bool:
+    """Update an existing subscription localization. Returns True on success."""
+    resp = get_session().patch(
         f"{BASE_URL}/subscriptionLocalizations/{loc_id}",
         json={
             "data": {
@@ -200,26 +161,26 @@ def update_localization(headers: dict, loc_id: str, loc_data: dict) -> None:
     )
     if not resp.ok:
         print_api_errors(resp, f"update localization {loc_id}")
-        return
+        return False
     print(f"      Updated localization (ID: {loc_id})")
+    return True
 
 
 def get_group_localizations(headers: dict, group_id: str) -> list:
     """Fetch existing localizations for a subscription group."""
-    resp = requests.get(
+    return paginate(
+        headers,
         f"{BASE_URL}/subscriptionGroups/{group_id}/subscriptionGroupLocalizations",
-        headers=headers,
-        timeout=TIMEOUT,
-    )
-    resp.raise_for_status()
-    return resp.json().get("data", [])
+        {"limit": PAGE_LIMIT, **sparse_fields({"subscriptionGroupLocalizations": GROUP_LOCALIZATION_FIELDS})},
+        raise_errors=True,
+    ).all()
 
 
 def create_group_localization(
     headers: dict, group_id: str, locale: str, name: str, custom_app_name: str = None,
-) -> None:
-    """Create a new localization for a subscription group."""
-    resp = requests.post(
+) -> bool:
+    """Create a new localization for a subscription group. Returns True on success."""
+    resp = get_session().post(
         f"{BASE_URL}/subscriptionGroupLocalizations",
         json={
             "data": {
@@ -241,15 +202,16 @@ def create_group_localization(
     )
     if not resp.ok:
         print_api_errors(resp, f"create group localization '{locale}' for group {group_id}")
-        return
+        return False
     print(f"    Created group localization '{locale}'")
+    return True
 
 
 def update_group_localization(
     headers: dict, loc_id: str, name: str, custom_app_name: str = None,
-) -> None:
-    """Update an existing subscription group localization."""
-    resp = requests.patch(
+) -> bool:
+    """Update an existing subscription group localization. Returns True on success."""
+    resp = get_session().patch(
         f"{BASE_URL}/subscriptionGroupLocalizations/{loc_id}",
         json={
             "data": {
@@ -266,16 +228,6 @@ def update_group_localization(
     )
     if not resp.ok:
         print_api_errors(resp, f"update group localization {loc_id}")
-        return
+        return False
     print(f"    Updated group localization (ID: {loc_id})")
-
-
-def print_api_errors(resp, action: str) -> None:
-    """Print human-readable API error messages."""
-    try:
-        errors = resp.json().get("errors", [])
-        for err in errors:
-            detail = err.get("detail", err.get("title", "Unknown error"))
-            print(f"ERROR ({action}): {detail}", file=sys.stderr)
-    except (ValueError, KeyError):
-        print(f"ERROR ({action}): HTTP {resp.status_code} - {resp.text[:200]}", file=sys.stderr)
+    return True
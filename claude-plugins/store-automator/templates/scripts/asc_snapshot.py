@@ -0,0 +1,200 @@
+"""
+Bulk snapshot of an app's subscription state in App Store Connect.
+
+Instead of one GET per subscription and per resource type, the snapshot
+reads the app's subscription groups with their group localizations in one
+compound (include=) request, then each group's subscriptions with their
+localizations, availability and review screenshot in another. Sparse
+fieldsets limit every resource to the attributes the sync compares. The
+number of GETs grows with pages, not with subscriptions x locales.
+
+Entities created during the sync are not in the snapshot and are treated
+as empty. When ASC truncates an included relationship (more related items
+than the include limit), that one relationship is fetched directly.
+"""
+from asc_client import BASE_URL, PAGE_LIMIT, paginate, sparse_fields
+from asc_iap_api import (
+    GROUP_FIELDS,
+    GROUP_LOCALIZATION_FIELDS,
+    SUBSCRIPTION_FIELDS,
+    SUBSCRIPTION_LOCALIZATION_FIELDS,
+    get_group_localizations,
+    get_subscription_localizations,
+)
+from asc_subscription_setup import (
+    AVAILABILITY_FIELDS,
+    SCREENSHOT_FIELDS,
+    get_review_screenshot,
+    get_subscription_availability,
+)
+
+# Maximum related items ASC returns per included relationship
+INCLUDE_LIMIT = 50
+
+
+def _get_compound_pages(headers: dict, url: str, params: dict) -> tuple[list, dict]:
+    """Collect primary records of every page plus included resources by (type, id)."""
+    records: list = []
+    included: dict = {}
+    for body in paginate(headers, url, params, raise_errors=True).iter_pages():
+        records.extend(body.get("data", []))
+        for item in body.get("included", []):
+            included[(item["type"], item["id"])] = item
+    return records, included
+
+
+def _related(record: dict, name: str, included: dict) -> tuple[list, bool]:
+    """Resolve a to-many relationship from the included resources.
+
+    Returns (resources, complete); complete is False when the relationship
+    is missing or ASC truncated it.
+    """
+    rel = record.get("relationships", {}).get(name)
+    if not rel or "data" not in rel:
+        return [], False
+    refs = rel["data"] or []
+    total = rel.get("meta", {}).get("paging", {}).get("total")
+    items = [included[(r["type"], r["id"])] for r in refs if (r["type"], r["id"]) in included]
+    complete = len(items) == len(refs) and (total is None or total <= len(refs))
+    return items, complete
+
+
+def _related_one(record: dict, name: str, included: dict) -> tuple[dict | None, bool]:
+    """Resolve a to-one relationship. Returns (resource or None, known)."""
+    rel = record.get("relationships", {}).get(name)
+    if not rel or "data" not in rel:
+        return None, False
+    ref = rel["data"]
+    if ref is None:
+        return None, True
+    item = included.get((ref["type"], ref["id"]))
+    return item, item is not None
+
+
+class AppSnapshot:
+    """In-memory view of the app's subscription groups, subscriptions and their child resources."""
+
+    def __init__(self):
+        self.groups: list = []
+        self._subscriptions: dict[str, list] = {}
+        self._group_locs: dict[str, dict] = {}
+        self._sub_locs: dict[str, dict] = {}
+        self._availability: dict[str, dict | None] = {}
+        self._screenshots: dict[str, dict | None] = {}
+
+    def subscriptions(self, group_id: str) -> list:
+        """Existing subscriptions of a group (empty for groups created this run)."""
+        return self._subscriptions.get(group_id, [])
+
+    def subscription(self, sub_id: str) -> dict | None:
+        """The fetched subscription resource, or None if it was created this run."""
+        for subs in self._subscriptions.values():
+            for sub in subs:
+                if sub["id"] == sub_id:
+                    return sub
+        return None
+
+    def group_localizations(self, headers: dict, group_id: str) -> dict:
+        """Existing group localizations keyed by locale."""
+        if group_id not in self._group_locs:
+            if not self.has_group(group_id):
+                return {}
+            locs = get_group_localizations(headers, group_id)
+            self._group_locs[group_id] = {loc["attributes"]["locale"]: loc for loc in locs}
+        return self._group_locs[group_id]
+
+    def subscription_localizations(self, headers: dict, sub_id: str) -> dict:
+        """Existing subscription localizations keyed by locale."""
+        if sub_id not in self._sub_locs:
+            if not self._is_known_subscription(sub_id):
+                return {}
+            locs = get_subscription_localizations(headers, sub_id)
+            self._sub_locs[sub_id] = {loc["attributes"]["locale"]: loc for loc in locs}
+        return self._sub_locs[sub_id]
+
+    def availability(self, headers: dict, sub_id: str) -> dict | None:
+        """Existing availability resource of a subscription, or None."""
+        if sub_id not in self._availability:
+            if not self._is_known_subscription(sub_id):
+                return None
+            self._availability[sub_id] = get_subscription_availability(headers, sub_id)
+        return self._availability[sub_id]
+
+    def review_screenshot(self, headers: dict, sub_id: str) -> dict | None:
+        """Existing review screenshot resource of a subscription, or None."""
+        if sub_id not in self._screenshots:
+            if not self._is_known_subscription(sub_id):
+                return None
+            self._screenshots[sub_id] = get_review_screenshot(headers, sub_id)
+        return self._screenshots[sub_id]
+
+    def has_group(self, group_id: str) -> bool:
+        """Whether the group existed when the snapshot was taken."""
+        return any(g["id"] == group_id for g in self.groups)
+
+    def _is_known_subscription(self, sub_id: str) -> bool:
+        return self.subscription(sub_id) is not None
+
+    def _load_groups(self, headers: dict, app_id: str) -> None:
+        groups, included = _get_compound_pages(
+            headers,
+            f"{BASE_URL}/apps/{app_id}/subscriptionGroups",
+            {
+                "include": "subscriptionGroupLocalizations",
+                "limit[subscriptionGroupLocalizations]": INCLUDE_LIMIT,
+                "limit": PAGE_LIMIT,
+                **sparse_fields({
+                    "subscriptionGroups": GROUP_FIELDS + ["subscriptionGroupLocalizations"],
+                    "subscriptionGroupLocalizations": GROUP_LOCALIZATION_FIELDS,
+                }),
+            },
+        )
+        self.groups = groups
+        for group in groups:
+            locs, complete = _related(group, "subscriptionGroupLocalizations", included)
+            if complete:
+                self._group_locs[group["id"]] = {loc["attributes"]["locale"]: loc for loc in locs}
+
+    def _load_subscriptions(self, headers: dict, group_id: str) -> None:
+        subs, included = _get_compound_pages(
+            headers,
+            f"{BASE_URL}/subscriptionGroups/{group_id}/subscriptions",
+            {
+                "include": "subscriptionLocalizations,subscriptionAvailability,appStoreReviewScreenshot",
+                "limit[subscriptionLocalizations]": INCLUDE_LIMIT,
+                "limit": PAGE_LIMIT,
+                **sparse_fields({
+                    "subscriptions": SUBSCRIPTION_FIELDS + [
+                        "subscriptionLocalizations", "subscriptionAvailability", "appStoreReviewScreenshot",
+                    ],
+                    "subscriptionLocalizations": SUBSCRIPTION_LOCALIZATION_FIELDS,
+                    "subscriptionAvailabilities": AVAILABILITY_FIELDS,
+                    "subscriptionAppStoreReviewScreenshots": SCREENSHOT_FIELDS,
+                }),
+            },
+        )
+        self._subscriptions[group_id] = subs
+        for sub in subs:
+            sub_id = sub["id"]
+            locs, complete = _related(sub, "subscriptionLocalizations", included)
+            if complete:
+                self._sub_locs[sub_id] = {loc["attributes"]["locale"]: loc for loc in locs}
+            availability, known = _related_one(sub, "subscriptionAvailability", included)
+            if known:
+                self._availability[sub_id] = availability
+            screenshot, known = _related_one(sub, "appStoreReviewScreenshot", included)
+            if known:
+                self._screenshots[sub_id] = screenshot
+
+
+def load_snapshot(headers: dict, app_id: str) -> AppSnapshot:
+    """Load the app's subscription state with compound requests."""
+    snapshot = AppSnapshot()
+    snapshot._load_groups(headers, app_id)
+    for group in snapshot.groups:
+        snapshot._load_subscriptions(headers, group["id"])
+    print(
+        f"Loaded remote snapshot: {len(snapshot.groups)} group(s), "
+        f"{sum(len(s) for s in snapshot._subscriptions.values())} subscription(s)",
+    )
+    return snapshot
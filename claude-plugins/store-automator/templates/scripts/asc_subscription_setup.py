@@ -3,20 +3,53 @@ App Store Connect Subscription Setup API layer.
 
 Functions for managing subscription availability (territories),
 pricing (price points), and review screenshot uploads.
+
+Territories, price points and equalizations are reference catalogs that
+rarely change; they are served from the store_cache disk cache when a
+fresh copy exists (see store_cache for TTL and refresh settings).
 """
+import bisect
+import mmap
+import os
 import sys
+import threading
+from concurrent.futures import wait
+from decimal import Decimal, InvalidOperation
 
-try:
-    import requests
-except ImportError:
-    import subprocess
-    subprocess.check_call(
-        [sys.executable, "-m", "pip", "install", "--break-system-packages", "requests"],
-        stdout=subprocess.DEVNULL,
-    )
-    import requests
+import store_cache
+from asc_client import BASE_URL, PAGE_LIMIT, TIMEOUT, get_session, paginate, print_api_errors, sparse_fields
+from iap_fingerprints import file_digest
+from store_http import ContextThreadPoolExecutor
+
+# Default cache lifetimes (seconds) for reference data
+TERRITORIES_TTL = 7 * 24 * 3600
+PRICE_POINTS_TTL = 24 * 3600
+EQUALIZATIONS_TTL = 24 * 3600
+
+# Fields the sync reads from each resource type (sent as fields[...] parameters)
+AVAILABILITY_FIELDS = ["availableInNewTerritories"]
+SCREENSHOT_FIELDS = ["fileName", "sourceFileChecksum", "assetDeliveryState"]
+PRICE_POINT_FIELDS = ["customerPrice"]
 
-from asc_iap_api import BASE_URL, TIMEOUT, print_api_errors
+# Concurrent chunk PUTs per screenshot upload (process-wide)
+UPLOAD_WORKERS = 4
+
+_index_lock = threading.Lock()
+_price_point_indexes: dict[tuple[str, str], "PricePointIndex"] = {}
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+
+
+def _get_all_pages(headers: dict, url: str, params: dict, action: str) -> tuple[list, bool]:
+    """Collect every record of a list endpoint.
+
+    Returns (records, complete); complete is False when a page failed.
+    """
+    pages = paginate(headers, url, params)
+    records = pages.all()
+    if pages.failed is not None:
+        print_api_errors(pages.failed, action)
+    return records, pages.complete
 
 
 # ---------------------------------------------------------------------------
@@ -29,8 +62,9 @@ def get_subscription_availability(headers: dict, sub_id: str) -> dict | None:
     Returns the availability resource or None if not yet configured.
     Does not include territory details to avoid ASC API limit errors.
     """
-    resp = requests.get(
+    resp = get_session().get(
         f"{BASE_URL}/subscriptions/{sub_id}/subscriptionAvailability",
+        params=sparse_fields({"subscriptionAvailabilities": AVAILABILITY_FIELDS}),
         headers=headers,
         timeout=TIMEOUT,
     )
@@ -43,20 +77,15 @@ def get_subscription_availability(headers: dict, sub_id: str) -> dict | None:
 
 
 def list_all_territory_ids(headers: dict) -> list[str]:
-    """Fetch all App Store territory IDs."""
-    url: str | None = f"{BASE_URL}/territories"
-    params: dict | None = {"limit": 200}
-    all_ids: list[str] = []
-    while url:
-        resp = requests.get(url, headers=headers, params=params, timeout=TIMEOUT)
-        if not resp.ok:
-            print_api_errors(resp, "list territories")
-            return all_ids
-        data = resp.json()
-        all_ids.extend(t["id"] for t in data.get("data", []))
-        url = data.get("links", {}).get("next")
-        params = None
-    return all_ids
+    """Fetch all App Store territory IDs (cached)."""
+    url = f"{BASE_URL}/territories"
+    params = {"limit": PAGE_LIMIT, **sparse_fields({"territories": ["currency"]})}
+
+    def load() -> tuple[list[str], bool]:
+        territories, complete = _get_all_pages(headers, url, params, "list territories")
+        return [t["id"] for t in territories], complete
+
+    return store_cache.cached("territories", url, params, TERRITORIES_TTL, load)
 
 
 def create_subscription_availability(
@@ -67,7 +96,7 @@ def create_subscription_availability(
 ) -> dict | None:
     """Create availability with specified territories for a subscription."""
     territory_data = [{"type": "territories", "id": tid} for tid in territory_ids]
-    resp = requests.post(
+    resp = get_session().post(
         f"{BASE_URL}/subscriptionAvailabilities",
         json={"data": {
             "type": "subscriptionAvailabilities",
@@ -79,6 +108,7 @@ def create_subscription_availability(
         }},
         headers=headers,
         timeout=TIMEOUT,
+        compress=True,
     )
     if not resp.ok:
         print_api_errors(resp, f"create availability for subscription {sub_id}")
@@ -93,84 +123,117 @@ def create_subscription_availability(
 
 def get_subscription_prices(headers: dict, sub_id: str) -> list:
     """List existing prices for a subscription."""
-    url: str | None = f"{BASE_URL}/subscriptions/{sub_id}/prices"
-    params: dict | None = {"include": "subscriptionPricePoint", "limit": 200}
-    all_prices: list = []
-    while url:
-        resp = requests.get(url, headers=headers, params=params, timeout=TIMEOUT)
-        if not resp.ok:
-            print_api_errors(resp, f"get prices for subscription {sub_id}")
-            return all_prices
-        data = resp.json()
-        all_prices.extend(data.get("data", []))
-        url = data.get("links", {}).get("next")
-        params = None
-    return all_prices
+    prices, _ = _get_all_pages(
+        headers,
+        f"{BASE_URL}/subscriptions/{sub_id}/prices",
+        {
+            "include": "subscriptionPricePoint",
+            "limit": PAGE_LIMIT,
+            **sparse_fields({
+                "subscriptionPrices": ["startDate", "subscriptionPricePoint"],
+                "subscriptionPricePoints": PRICE_POINT_FIELDS,
+            }),
+        },
+        f"get prices for subscription {sub_id}",
+    )
+    return prices
 
 
 def get_price_points_for_territory(
     headers: dict, sub_id: str, territory: str,
 ) -> list:
-    """Get all available price points for a subscription in a given territory.
+    """Get all available price points for a subscription in a given territory (cached).
 
     Uses limit=200 (ASC API max) and follows pagination links to ensure
     higher price tiers (e.g. $9.99, $69.99) beyond the first page are included.
     """
-    url: str | None = f"{BASE_URL}/subscriptions/{sub_id}/pricePoints"
-    params: dict | None = {
+    url = f"{BASE_URL}/subscriptions/{sub_id}/pricePoints"
+    params = {
         "filter[territory]": territory,
-        "include": "territory",
-        "limit": 200,
+        "limit": PAGE_LIMIT,
+        **sparse_fields({"subscriptionPricePoints": PRICE_POINT_FIELDS}),
     }
-    all_points: list = []
-    while url:
-        resp = requests.get(url, headers=headers, params=params, timeout=TIMEOUT)
-        if not resp.ok:
-            print_api_errors(resp, f"get price points for {territory}")
-            return all_points
-        data = resp.json()
-        all_points.extend(data.get("data", []))
-        url = data.get("links", {}).get("next")
-        params = None  # next URL already contains query parameters
-    return all_points
-
-
-def find_price_point_by_amount(
-    price_points: list, amount_str: str,
-) -> dict | None:
-    """Find a price point matching the given customer price (numeric comparison).
+    return store_cache.cached(
+        "price_points", url, params, PRICE_POINTS_TTL,
+        lambda: _get_all_pages(headers, url, params, f"get price points for {territory}"),
+    )
+
+
+def parse_price(value) -> Decimal | None:
+    """Parse a customer price string into a Decimal, or None if it is not a number."""
+    try:
+        price = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        return None
+    return price if price.is_finite() else None
+
+
+class PricePointIndex:
+    """Price points of one (subscription, territory), indexed by exact customer price.
 
-    Apple's API may return prices with trailing zeros (e.g. "9.990" instead
-    of "9.99"), so we compare as floats with a small tolerance rather than
-    doing an exact string match.
+    Decimal keys compare by value, so "9.990" from the API matches "9.99"
+    from the config without any tolerance. Exact lookups are O(1);
+    nearest() bisects the sorted price list to suggest the closest tier.
     """
-    for pp in price_points:
-        customer_price = pp.get("attributes", {}).get("customerPrice", "")
-        try:
-            api_price = float(customer_price)
-            target_price = float(amount_str)
-            if abs(api_price - target_price) < 0.01:
-                return pp
-        except (ValueError, TypeError):
-            continue
-    return None
+
+    def __init__(self, price_points: list):
+        self._by_price: dict[Decimal, dict] = {}
+        for pp in price_points:
+            price = parse_price(pp.get("attributes", {}).get("customerPrice"))
+            if price is not None:
+                self._by_price.setdefault(price, pp)
+        self._prices = sorted(self._by_price)
+
+    def __len__(self) -> int:
+        return len(self._by_price)
+
+    def exact(self, amount) -> dict | None:
+        """Return the price point whose customer price equals `amount`."""
+        price = parse_price(amount)
+        return self._by_price.get(price) if price is not None else None
+
+    def nearest(self, amount) -> dict | None:
+        """Return the price point closest to `amount` (the lower tier on a tie)."""
+        price = parse_price(amount)
+        if price is None or not self._prices:
+            return None
+        pos = bisect.bisect_left(self._prices, price)
+        candidates = self._prices[max(0, pos - 1):pos + 1]
+        best = min(candidates, key=lambda p: (abs(p - price), p))
+        return self._by_price[best]
+
+    def sample_prices(self, count: int = 5) -> list[str]:
+        """Return the lowest `count` customer prices, for diagnostics."""
+        return [str(p) for p in self._prices[:count]]
+
+
+def get_price_point_index(headers: dict, sub_id: str, territory: str) -> PricePointIndex:
+    """Return the price-point index for a subscription and territory, built once per process."""
+    key = (sub_id, territory)
+    with _index_lock:
+        index = _price_point_indexes.get(key)
+    if index is None:
+        index = PricePointIndex(get_price_points_for_territory(headers, sub_id, territory))
+        with _index_lock:
+            index = _price_point_indexes.setdefault(key, index)
+    return index
 
 
 def get_price_point_equalizations(headers: dict, price_point_id: str) -> list:
-    """Get equalized price points for all territories from a base price point."""
-    url: str | None = f"{BASE_URL}/subscriptionPricePoints/{price_point_id}/equalizations"
-    params: dict | None = {"include": "territory", "limit": 200}
-    all_points: list = []
-    while url:
-        resp = requests.get(url, headers=headers, params=params, timeout=TIMEOUT)
-        if not resp.ok:
-            print_api_errors(resp, "get price point equalizations")
-            return all_points
-        data = resp.json()
-        all_points.extend(data.get("data", []))
-        url = data.get("links", {}).get("next")
-        params = None
-    return all_points
+    """Get equalized price points for all territories from a base price point (cached)."""
+    url = f"{BASE_URL}/subscriptionPricePoints/{price_point_id}/equalizations"
+    params = {
+        "include": "territory",
+        "limit": PAGE_LIMIT,
+        **sparse_fields({
+            "subscriptionPricePoints": PRICE_POINT_FIELDS + ["territory"],
+            "territories": ["currency"],
+        }),
+    }
+    return store_cache.cached(
+        "equalizations", url, params, EQUALIZATIONS_TTL,
+        lambda: _get_all_pages(headers, url, params, "get price point equalizations"),
+    )
 
 
 def create_subscription_price(
@@ -180,8 +243,13 @@ def create_subscription_price(
     territory_id: str,
     start_date: str | None = None,
 ) -> dict | None:
-    """Create a price entry for a subscription using a price point ID and territory."""
-    resp = requests.post(
+    """Create a price entry for a subscription using a price point ID and territory.
+
+    Returns the created price, {"existing": True} when a retried POST was
+    rejected with 409 because an earlier attempt had created it, or None on
+    failure.
+    """
+    resp = get_session().post(
         f"{BASE_URL}/subscriptionPrices",
         json={"data": {
             "type": "subscriptionPrices",
@@ -198,7 +266,10 @@ def create_subscription_price(
         }},
         headers=headers,
         timeout=TIMEOUT,
+        idempotent=True,
     )
+    if resp.status_code == 409 and getattr(resp, "attempts", 1) > 1:
+        return {"existing": True}
     if not resp.ok:
         print_api_errors(resp, f"create price for subscription {sub_id}")
         return None
@@ -209,10 +280,20 @@ def create_subscription_price(
 # Review Screenshot
 # ---------------------------------------------------------------------------
 
+def _upload_pool() -> ContextThreadPoolExecutor:
+    """Return the process-wide worker pool for screenshot chunk uploads."""
+    global _upload_executor
+    with _upload_executor_lock:
+        if _upload_executor is None:
+            _upload_executor = ContextThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="asc-upload")
+        return _upload_executor
+
+
 def get_review_screenshot(headers: dict, sub_id: str) -> dict | None:
     """Fetch the current review screenshot for a subscription."""
-    resp = requests.get(
+    resp = get_session().get(
         f"{BASE_URL}/subscriptions/{sub_id}/appStoreReviewScreenshot",
+        params=sparse_fields({"subscriptionAppStoreReviewScreenshots": SCREENSHOT_FIELDS}),
         headers=headers,
         timeout=TIMEOUT,
     )
@@ -224,17 +305,71 @@ def get_review_screenshot(headers: dict, sub_id: str) -> dict | None:
     return resp.json().get("data")
 
 
-def upload_review_screenshot(
-    headers: dict, sub_id: str,
-    file_name: str, file_data: bytes, md5_checksum: str,
-) -> dict | None:
-    """Reserve, upload chunks, and commit a review screenshot in one operation."""
+def delete_review_screenshot(headers: dict, screenshot_id: str) -> bool:
+    """Delete a subscription review screenshot. Returns True on success (or if already gone)."""
+    resp = get_session().delete(
+        f"{BASE_URL}/subscriptionAppStoreReviewScreenshots/{screenshot_id}",
+        headers=headers,
+        timeout=TIMEOUT,
+    )
+    if not resp.ok and resp.status_code != 404:
+        print_api_errors(resp, f"delete review screenshot {screenshot_id}")
+        return False
+    print(f"    Deleted review screenshot (ID: {screenshot_id})")
+    return True
+
+
+def _put_chunk(view: memoryview, op: dict) -> bool:
+    """PUT one reserved upload operation's byte range. Returns True on success."""
+    offset, length = op["offset"], op["length"]
+    op_headers = {h["name"]: h["value"] for h in op.get("requestHeaders", [])}
+    resp = get_session().put(
+        op["url"], headers=op_headers, data=bytes(view[offset:offset + length]), timeout=TIMEOUT,
+    )
+    if not resp.ok:
+        print(
+            f"ERROR (upload chunk at offset {offset}): "
+            f"HTTP {resp.status_code} - {resp.text[:200]}",
+            file=sys.stderr,
+        )
+    return resp.ok
+
+
+def _upload_chunks(view: memoryview, operations: list) -> bool:
+    """Upload the reserved chunks concurrently. Returns False if any chunk failed."""
+    futures = [
+        _upload_pool().submit(_put_chunk, view, op)
+        for op in sorted(operations, key=lambda o: o["offset"])
+    ]
+    try:
+        return all(future.result() for future in futures)
+    finally:
+        # Stop pending chunks after a failure; wait until no worker still reads the mapping
+        for future in futures:
+            future.cancel()
+        wait(futures)
+
+
+def upload_review_screenshot(headers: dict, sub_id: str, file_path: str, md5: str | None = None) -> dict | None:
+    """Reserve, upload chunks, and commit a review screenshot in one operation.
+
+    The file is memory-mapped rather than read into memory and the reserved
+    chunks are PUT concurrently (UPLOAD_WORKERS at a time). `md5` is the
+    file's MD5 when the caller already has it; otherwise the memoized
+    iap_fingerprints.file_digest() provides it.
+    """
     resource_type = "subscriptionAppStoreReviewScreenshots"
-    resp = requests.post(
+    file_name = os.path.basename(file_path)
+    file_size = os.path.getsize(file_path)
+    if not file_size:
+        # An empty file cannot be memory-mapped (nor accepted by ASC)
+        print(f"ERROR: Review screenshot is empty: {file_path}", file=sys.stderr)
+        return None
+    resp = get_session().post(
         f"{BASE_URL}/{resource_type}",
         json={"data": {
             "type": resource_type,
-            "attributes": {"fileName": file_name, "fileSize": len(file_data)},
+            "attributes": {"fileName": file_name, "fileSize": file_size},
             "relationships": {
                 "subscription": {"data": {"type": "subscriptions", "id": sub_id}},
             },
@@ -250,22 +385,17 @@ def upload_review_screenshot(
         print(f"ERROR: Empty reservation response for subscription {sub_id}", file=sys.stderr)
         return None
     screenshot_id = reservation["id"]
-    for op in reservation["attributes"].get("uploadOperations", []):
-        chunk = file_data[op["offset"] : op["offset"] + op["length"]]
-        op_headers = {h["name"]: h["value"] for h in op.get("requestHeaders", [])}
-        chunk_resp = requests.put(op["url"], headers=op_headers, data=chunk, timeout=TIMEOUT)
-        if not chunk_resp.ok:
-            print(
-                f"ERROR (upload chunk at offset {op['offset']}): "
-                f"HTTP {chunk_resp.status_code} - {chunk_resp.text[:200]}",
-                file=sys.stderr,
-            )
-            return None
-    resp = requests.patch(
+    operations = reservation["attributes"].get("uploadOperations", [])
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as view:
+            uploaded = _upload_chunks(view, operations)
+    if not uploaded:
+        return None
+    resp = get_session().patch(
         f"{BASE_URL}/{resource_type}/{screenshot_id}",
         json={"data": {
             "type": resource_type, "id": screenshot_id,
-            "attributes": {"sourceFileChecksum": md5_checksum, "uploaded": True},
+            "attributes": {"sourceFileChecksum": md5 or file_digest(file_path), "uploaded": True},
         }},
         headers=headers,
         timeout=TIMEOUT,
@@ -2,19 +2,7 @@
 
 Functions for submitting subscriptions and subscription groups for App Store review.
 """
-import sys
-
-try:
-    import requests
-except ImportError:
-    import subprocess
-    subprocess.check_call(
-        [sys.executable, "-m", "pip", "install", "--break-system-packages", "requests"],
-        stdout=subprocess.DEVNULL,
-    )
-    import requests
-
-from asc_iap_api import BASE_URL, TIMEOUT, print_api_errors
+from asc_client import BASE_URL, TIMEOUT, get_session, print_api_errors
 
 
 def create_review_submission(
@@ -24,7 +12,7 @@ def create_review_submission(
 
     Idempotent: silently handles 409 Conflict (already submitted).
     """
-    resp = requests.post(
+    resp = get_session().post(
         f"{BASE_URL}/subscriptionSubmissions",
         json={"data": {
             "type": "subscriptionSubmissions",
@@ -34,6 +22,7 @@ def create_review_submission(
         }},
         headers=headers,
         timeout=TIMEOUT,
+        idempotent=True,
     )
     if resp.status_code == 409:
         return None
@@ -51,7 +40,7 @@ def create_group_submission(
 
     Idempotent: silently handles 409 Conflict (already submitted).
     """
-    resp = requests.post(
+    resp = get_session().post(
         f"{BASE_URL}/subscriptionGroupSubmissions",
         json={"data": {
             "type": "subscriptionGroupSubmissions",
@@ -63,6 +52,7 @@ def create_group_submission(
         }},
         headers=headers,
         timeout=TIMEOUT,
+        idempotent=True,
     )
     if resp.status_code == 409:
         return None
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Local receiver for App Store Connect webhook notifications.
+
+WebhookReceiver runs a small HTTP server on a background thread and queues
+every notification POSTed to it, so a script can block until an event
+arrives instead of polling the API. ASC reaches the receiver through
+whatever the pipeline exposes it with (a tunnel or reverse proxy); the
+receiver itself binds to 127.0.0.1 unless told otherwise.
+
+When a secret is configured, each request must carry the HMAC-SHA256 of its
+raw body in the X-Apple-Signature header ("hmacsha256=<hex>"); other
+requests are rejected with 401.
+
+Stand-in sender for local testing:
+
+  python3 asc_webhook.py send http://127.0.0.1:8787/ --state COMPLETE [--secret S]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import queue
+import sys
+import threading
+import time
+
+SIGNATURE_HEADER = "X-Apple-Signature"
+SIGNATURE_PREFIX = "hmacsha256="
+MAX_BODY = 1 << 20
+
+BUILD_UPLOAD_EVENT = "buildUploadStateUpdated"
+
+
+def sign(body: bytes, secret: str) -> str:
+    """Signature header value for a notification body."""
+    return SIGNATURE_PREFIX + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def parse_event(payload: dict) -> dict:
+    """Flatten a notification into {"type", "id", "state", "instance"}."""
+    data = payload.get("data") or {}
+    attributes = data.get("attributes") or {}
+    instance = ((data.get("relationships") or {}).get("instance") or {}).get("data") or {}
+    return {
+        "type": data.get("type"),
+        "id": data.get("id"),
+        "state": attributes.get("newState"),
+        "instance": instance.get("id"),
+    }
+
+
+class WebhookReceiver:
+    """Background HTTP server that queues incoming notifications."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, secret: str | None = None):
+        # Imported here: importing this module (as submit_for_review_ios does) should not load the HTTP server stack
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.events: queue.Queue = queue.Queue()
+        self.received = 0
+        self.rejected = 0
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_BODY:
+                    self._reply(413)
+                    return
+                body = self.rfile.read(length)
+                if secret and not hmac.compare_digest(
+                    self.headers.get(SIGNATURE_HEADER, ""), sign(body, secret),
+                ):
+                    receiver.rejected += 1
+                    self._reply(401)
+                    return
+                try:
+                    event = parse_event(json.loads(body or b"{}"))
+                except (ValueError, AttributeError):
+                    self._reply(400)
+                    return
+                receiver.received += 1
+                receiver.events.put(event)
+                self._reply(200)
+
+            def _reply(self, status: int) -> None:
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="asc-webhook", daemon=True)
+        self._thread.start()
+
+    def next_event(self, timeout: float) -> dict | None:
+        """Return the next notification, or None if none arrives within `timeout` seconds."""
+        try:
+            return self.events.get(timeout=max(0.0, timeout))
+        except queue.Empty:
+            return None
+
+    def sleep(self, seconds: float) -> None:
+        """time.sleep() replacement that returns early when a notification arrives."""
+        self.next_event(seconds)
+
+    def close(self) -> None:
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def send_event(url: str, state: str, secret: str | None = None, event_type: str = BUILD_UPLOAD_EVENT) -> int:
+    """POST a sample notification to `url`. Returns the HTTP status."""
+    import urllib.error
+    import urllib.request
+
+    payload = {"data": {
+        "type": event_type,
+        "id": f"local-{int(time.time())}",
+        "version": 1,
+        "attributes": {"oldState": "PROCESSING", "newState": state, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ")},
+        "relationships": {"instance": {"data": {"type": "buildUploads", "id": "local-build-upload"}}},
+    }}
+    body = json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(url, data=body, method="POST", headers={"Content-Type": "application/json"})
+    if secret:
+        request.add_header(SIGNATURE_HEADER, sign(body, secret))
+    try:
+        with urllib.request.urlopen(request, timeout=10) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stand-in App Store Connect webhook sender")
+    sub = parser.add_subparsers(dest="command", required=True)
+    send = sub.add_parser("send", help="POST a build upload state notification")
+    send.add_argument("url")
+    send.add_argument("--state", default="COMPLETE", help="newState of the build upload (default: COMPLETE)")
+    send.add_argument("--type", default=BUILD_UPLOAD_EVENT, help=f"event type (default: {BUILD_UPLOAD_EVENT})")
+    send.add_argument("--secret", help="HMAC secret shared with the receiver")
+    args = parser.parse_args()
+
+    status = send_event(args.url, args.state, args.secret, args.type)
+    print(f"HTTP {status}")
+    sys.exit(0 if 200 <= status < 300 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Sync In-App Purchases (and optionally set up app records) for several apps
+in one process.
+
+Reads a manifest of apps and runs them concurrently. Everything a separate
+process per app would repeat is shared: the App Store Connect token and
+Google access token, the pooled HTTP connections, the reference-data cache
+(territories, price points; see store_cache.py) and the request budget --
+ASC_MAX_RPS (App Store Connect) and STORE_MAX_RPS (Google Play) limit the
+whole process, not each app. Each app keeps its own .ci-state (fingerprints,
+screenshot index) in its project root, so batch and single-app runs share
+their sync state.
+
+Manifest (JSON):
+  {
+    "apps": [
+      {"platform": "ios", "bundle_id": "com.example.a",
+       "iap_config": "a/fastlane/iap_config.json", "project_root": "a",
+       "create_app": {"app_name": "Example A", "sku": "EXAMPLE_A"}},
+      {"platform": "android", "package_name": "com.example.a",
+       "iap_config": "a/fastlane/iap_config.json", "project_root": "a"}
+    ]
+  }
+
+Relative paths are resolved against the manifest's directory; project_root
+defaults to the directory containing iap_config. `create_app` (iOS only)
+runs create_app_record.py's flow before the IAP sync; its keys default like
+that script's env vars (sku: bundle_id, platform: IOS, price_tier: 0,
+content_rights_third_party: false). An entry may omit iap_config when it
+only sets up the app record.
+
+Required env vars:
+  APP_STORE_CONNECT_KEY_IDENTIFIER  - Key ID (when the manifest has iOS apps)
+  APP_STORE_CONNECT_ISSUER_ID       - Issuer ID (when the manifest has iOS apps)
+  APP_STORE_CONNECT_PRIVATE_KEY     - Contents of the P8 key file (iOS apps)
+  SA_JSON                           - Service account JSON path (Android apps)
+
+Usage:
+  python3 batch_sync.py <manifest.json> [--jobs N] [--report report.json]
+
+Output lines are prefixed with the app they belong to. A per-app report
+(status, duration, writes, error) is printed at the end and, with --report,
+written as JSON. Exits 1 when any app failed.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+
+import ci_state
+import create_app_record
+import sync_iap_android
+import sync_iap_ios
+from asc_client import auth_headers as asc_auth_headers
+from gplay_iap_api import auth_headers as gplay_auth_headers
+
+DEFAULT_JOBS = 4
+PLATFORMS = ("ios", "android")
+
+_app_label: ContextVar[str | None] = ContextVar("batch_app", default=None)
+
+
+class _PrefixedStream:
+    """Text stream that prefixes every line written in an app's context with its label.
+
+    Lines are buffered per thread until complete, so output of apps running
+    concurrently is interleaved by line, never within one.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        label = _app_label.get()
+        if label is None:
+            with self._lock:
+                return self._stream.write(text)
+        buffered = getattr(self._local, "buffer", "") + text
+        *lines, self._local.buffer = buffered.split("\n")
+        if lines:
+            with self._lock:
+                self._stream.write("".join(f"[{label}] {line}\n" for line in lines))
+        return len(text)
+
+    def flush(self) -> None:
+        label = _app_label.get()
+        rest = getattr(self._local, "buffer", "")
+        with self._lock:
+            if rest and label is not None:
+                self._stream.write(f"[{label}] {rest}\n")
+            self._stream.flush()
+        self._local.buffer = ""
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def _resolve(base_dir: str, path: str | None) -> str | None:
+    return os.path.normpath(os.path.join(base_dir, path)) if path else None
+
+
+def load_manifest(path: str) -> list[dict]:
+    """Load and validate the manifest. Returns the normalised app entries."""
+    if not os.path.isfile(path):
+        print(f"ERROR: Manifest not found: {path}", file=sys.stderr)
+        sys.exit(1)
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    entries, errors = [], []
+    for index, app in enumerate(manifest.get("apps", [])):
+        platform = str(app.get("platform", "")).lower()
+        app_key = app.get("bundle_id") if platform == "ios" else app.get("package_name")
+        where = f"apps[{index}]"
+        if platform not in PLATFORMS:
+            errors.append(f"{where}: platform must be one of {', '.join(PLATFORMS)}")
+            continue
+        if not app_key:
+            errors.append(f"{where}: {'bundle_id' if platform == 'ios' else 'package_name'} is required")
+            continue
+        iap_config = _resolve(base_dir, app.get("iap_config"))
+        if not iap_config and not (platform == "ios" and app.get("create_app")):
+            errors.append(f"{where}: iap_config is required")
+            continue
+        if iap_config and not os.path.isfile(iap_config):
+            errors.append(f"{where}: IAP config file not found: {iap_config}")
+            continue
+        project_root = _resolve(base_dir, app.get("project_root")) or (
+            os.path.dirname(iap_config) if iap_config else base_dir
+        )
+        entries.append({
+            "label": f"{platform}:{app_key}",
+            "platform": platform,
+            "app": app_key,
+            "iap_config": iap_config,
+            "project_root": project_root,
+            "create_app": app.get("create_app"),
+        })
+
+    labels = [entry["label"] for entry in entries]
+    errors += [f"duplicate app {label}" for label in sorted(set(labels)) if labels.count(label) > 1]
+    if errors:
+        for error in errors:
+            print(f"ERROR: {error}", file=sys.stderr)
+        sys.exit(1)
+    if not entries:
+        print("WARNING: No apps found in manifest", file=sys.stderr)
+    return entries
+
+
+def authenticate(entries: list[dict]) -> dict:
+    """Authenticate once per store used by the manifest. Returns headers by platform."""
+    headers = {}
+    platforms = {entry["platform"] for entry in entries}
+    if "ios" in platforms:
+        env = {var: os.environ.get(var, "") for var in (
+            "APP_STORE_CONNECT_KEY_IDENTIFIER", "APP_STORE_CONNECT_ISSUER_ID", "APP_STORE_CONNECT_PRIVATE_KEY",
+        )}
+        missing = [var for var, val in env.items() if not val]
+        if missing:
+            print(f"ERROR: Missing env vars: {', '.join(missing)}", file=sys.stderr)
+            sys.exit(1)
+        headers["ios"] = asc_auth_headers(*env.values())
+    if "android" in platforms:
+        sa_json = os.environ.get("SA_JSON", "")
+        if not sa_json or not os.path.isfile(sa_json):
+            print("ERROR: SA_JSON must point to the service account JSON file", file=sys.stderr)
+            sys.exit(1)
+        headers["android"] = gplay_auth_headers(sa_json)
+    return headers
+
+
+def _app_record_config(bundle_id: str, settings: dict) -> dict:
+    """create_app_record's config for a manifest `create_app` block."""
+    return {
+        "bundle_id": bundle_id,
+        "app_name": settings["app_name"],
+        "sku": settings.get("sku") or bundle_id,
+        "platform": settings.get("platform", "IOS"),
+        "price_tier": int(settings.get("price_tier", 0)),
+        "uses_third_party": bool(settings.get("content_rights_third_party", False)),
+    }
+
+
+def _load_config(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    if not config.get("subscription_groups"):
+        print("WARNING: No subscription_groups found in config", file=sys.stderr)
+    return config
+
+
+def _sync_ios(headers: dict, entry: dict, report: dict) -> None:
+    if entry["create_app"]:
+        report["app_id"] = create_app_record.ensure_app(
+            headers, _app_record_config(entry["app"], entry["create_app"]),
+        )
+    if entry["iap_config"]:
+        result = sync_iap_ios.sync_app(headers, entry["app"], _load_config(entry["iap_config"]), entry["project_root"])
+        report["app_id"] = result["app_id"]
+        report["writes"] = result["writes"]
+        report["synced_groups"] = result["synced_groups"]
+
+
+def _sync_android(headers: dict, entry: dict, report: dict) -> None:
+    results = sync_iap_android.sync_app(headers, entry["app"], _load_config(entry["iap_config"]))
+    report["synced_subscriptions"] = results
+    if any(r["action"] == "failed" for r in results):
+        report["status"] = "partial"
+
+
+def run_app(headers: dict, entry: dict) -> dict:
+    """Sync one manifest entry, catching its failure. Returns its report."""
+    report = {"app": entry["label"], "status": "ok", "error": None}
+    _app_label.set(entry["label"])
+    start = time.monotonic()
+    try:
+        with ci_state.use_project_root(entry["project_root"]):
+            if entry["platform"] == "ios":
+                _sync_ios(headers["ios"], entry, report)
+            else:
+                _sync_android(headers["android"], entry, report)
+    except SystemExit as e:
+        report["status"] = "failed"
+        report["error"] = f"exited with status {e.code}"
+    except Exception as e:
+        report["status"] = "failed"
+        report["error"] = f"{type(e).__name__}: {e}"
+        print(f"ERROR: {report['error']}", file=sys.stderr)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    report["seconds"] = round(time.monotonic() - start, 1)
+    return report
+
+
+def run_all(headers: dict, entries: list[dict], jobs: int) -> list[dict]:
+    """Run every entry on up to `jobs` threads. Returns the reports in manifest order."""
+    with ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="batch-app") as pool:
+        # A fresh context per app keeps its label and .ci-state choice to itself
+        futures = [pool.submit(copy_context().run, run_app, headers, entry) for entry in entries]
+        return [future.result() for future in futures]
+
+
+def print_report(reports: list[dict]) -> None:
+    """Print one summary line per app to stderr."""
+    print("\nBatch report:", file=sys.stderr)
+    for report in reports:
+        writes = report.get("writes")
+        detail = f", writes {writes['sent']} sent / {writes['skipped']} skipped" if writes else ""
+        error = f" -- {report['error']}" if report["error"] else ""
+        print(f"  {report['app']}: {report['status']} in {report['seconds']}s{detail}{error}", file=sys.stderr)
+    failed = sum(report["status"] != "ok" for report in reports)
+    print(f"  {len(reports) - failed}/{len(reports)} app(s) ok", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sync IAPs for several apps in one process")
+    parser.add_argument("manifest", help="JSON manifest listing the apps")
+    parser.add_argument(
+        "--jobs", type=int, default=DEFAULT_JOBS, help=f"apps synced concurrently (default: {DEFAULT_JOBS})",
+    )
+    parser.add_argument("--report", help="write the per-app report to this JSON file")
+    args = parser.parse_args()
+
+    entries = load_manifest(args.manifest)
+    headers = authenticate(entries)
+
+    sys.stdout = _PrefixedStream(sys.stdout)
+    sys.stderr = _PrefixedStream(sys.stderr)
+    reports = run_all(headers, entries, args.jobs)
+
+    print_report(reports)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"apps": reports}, f, indent=2)
+    sys.exit(0 if all(report["status"] == "ok" for report in reports) else 1)
+
+
+if __name__ == "__main__":
+    main()
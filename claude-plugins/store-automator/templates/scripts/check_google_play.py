@@ -16,57 +16,23 @@ Output:
 import json
 import os
 import sys
-import time
-
-try:
-    import jwt
-    import requests
-except ImportError:
-    print("Installing dependencies...", file=sys.stderr)
-    import subprocess
-    subprocess.check_call(
-        [sys.executable, "-m", "pip", "install", "--break-system-packages", "PyJWT", "cryptography", "requests"],
-        stdout=subprocess.DEVNULL,
-    )
-    import jwt
-    import requests
+
+from gplay_auth import install_auth
+from store_http import TIMEOUT, get_session
 
 API_BASE = "https://androidpublisher.googleapis.com/androidpublisher/v3/applications"
-TIMEOUT = (10, 30)
-
-
-def get_access_token(sa_path: str) -> str:
-    """Obtain an OAuth2 access token using the service account credentials."""
-    with open(sa_path, "r") as fh:
-        sa = json.load(fh)
-    now = int(time.time())
-    payload = {
-        "iss": sa["client_email"],
-        "scope": "https://www.googleapis.com/auth/androidpublisher",
-        "aud": "https://oauth2.googleapis.com/token",
-        "iat": now,
-        "exp": now + 3600,
-    }
-    signed = jwt.encode(payload, sa["private_key"], algorithm="RS256")
-    resp = requests.post(
-        "https://oauth2.googleapis.com/token",
-        data={
-            "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
-            "assertion": signed,
-        },
-        timeout=TIMEOUT,
-    )
-    resp.raise_for_status()
-    return resp.json()["access_token"]
 
 
-def check_readiness(package_name: str, access_token: str) -> dict:
-    """Check whether the Google Play app is ready for automated publishing."""
-    headers = {"Authorization": f"Bearer {access_token}"}
+def check_readiness(package_name: str) -> dict:
+    """Check whether the Google Play app is ready for automated publishing.
+
+    Requests are authorized by the token provider installed on the shared session.
+    """
+    headers: dict = {}
     missing_steps: list[str] = []
 
     # Create an edit session
-    edit_resp = requests.post(
+    edit_resp = get_session().post(
         f"{API_BASE}/{package_name}/edits",
         headers={**headers, "Content-Type": "application/json"},
         json={},
@@ -84,7 +50,7 @@ def check_readiness(package_name: str, access_token: str) -> dict:
 
     try:
         # Check for uploaded bundles
-        bundles_resp = requests.get(
+        bundles_resp = get_session().get(
             f"{API_BASE}/{package_name}/edits/{edit_id}/bundles",
             headers=headers,
             timeout=TIMEOUT,
@@ -94,7 +60,7 @@ def check_readiness(package_name: str, access_token: str) -> dict:
             missing_steps.append("2. UPLOAD FIRST AAB via Play Console")
 
         # Check for track releases
-        tracks_resp = requests.get(
+        tracks_resp = get_session().get(
             f"{API_BASE}/{package_name}/edits/{edit_id}/tracks",
             headers=headers,
             timeout=TIMEOUT,
@@ -109,7 +75,7 @@ def check_readiness(package_name: str, access_token: str) -> dict:
             missing_steps.append("3. COMPLETE SETUP: Content rating + pricing")
     finally:
         # Always clean up the edit
-        requests.delete(
+        get_session().delete(
             f"{API_BASE}/{package_name}/edits/{edit_id}",
             headers=headers,
             timeout=TIMEOUT,
@@ -130,8 +96,8 @@ def main() -> None:
         print(f"ERROR: Service account file not found: {sa_json}", file=sys.stderr)
         sys.exit(1)
 
-    access_token = get_access_token(sa_json)
-    result = check_readiness(package_name, access_token)
+    install_auth(sa_json)
+    result = check_readiness(package_name)
     print(json.dumps(result))
 
 
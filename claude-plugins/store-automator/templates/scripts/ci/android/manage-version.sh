@@ -3,6 +3,7 @@ set -euo pipefail
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/../common/read-config.sh"
+source "$SCRIPT_DIR/../common/store-worker.sh"
 
 PUBSPEC="$APP_ROOT/pubspec.yaml"
 
@@ -21,7 +22,7 @@ export APP_STORE_CONNECT_ISSUER_ID="$APPLE_ISSUER_ID"
 export APP_STORE_CONNECT_PRIVATE_KEY
 APP_STORE_CONNECT_PRIVATE_KEY=$(cat "$P8_FULL_PATH")
 
-VERSION_JSON=$(python3 "$PROJECT_ROOT/scripts/manage_version_ios.py")
+VERSION_JSON=$(run_store_script manage-version "$PROJECT_ROOT/scripts/manage_version_ios.py")
 if [ -z "$VERSION_JSON" ]; then
   echo "ERROR: manage_version_ios.py returned empty output" >&2
   exit 1
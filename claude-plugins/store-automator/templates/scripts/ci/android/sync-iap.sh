@@ -6,6 +6,7 @@ set -euo pipefail
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/../common/read-config.sh"
 source "$SCRIPT_DIR/../common/ci-notify.sh"
+source "$SCRIPT_DIR/../common/store-worker.sh"
 
 echo "=== Android IAP Sync ==="
 
@@ -21,24 +22,10 @@ if [ ! -f "$IAP_CONFIG" ]; then
   ci_skip "No Android IAP config file found"
 fi
 
-# --- Hash-based change detection (config + Python scripts) ---
-STATE_DIR="$PROJECT_ROOT/.ci-state"
-mkdir -p "$STATE_DIR"
-
-HASH=$(cat "$IAP_CONFIG" \
-  "$PROJECT_ROOT/scripts/sync_iap_android.py" \
-  "$PROJECT_ROOT/scripts/gplay_iap_api.py" \
-  | shasum -a 256 | cut -d' ' -f1)
-STATE_FILE="$STATE_DIR/android-iap-hash"
-
-if [ -f "$STATE_FILE" ]; then
-  STORED_HASH=$(cat "$STATE_FILE")
-  if [ "$HASH" = "$STORED_HASH" ]; then
-    ci_skip "Android IAP config unchanged since last sync"
-  fi
-fi
-
-echo "Changes detected in IAP config (hash: ${HASH:0:12}...)"
+# --- Change detection ---
+# sync_iap_android.py keeps per-entity fingerprints in
+# .ci-state/android-iap-fingerprints.json and only creates or updates
+# subscriptions whose listings changed or that are missing in Google Play.
 
 # --- Resolve service account path ---
 SA_FULL_PATH="$PROJECT_ROOT/$GOOGLE_SA_JSON_PATH"
@@ -59,9 +46,6 @@ echo "Syncing Android IAP configuration..."
 
 SA_JSON="$SA_FULL_PATH" \
 PACKAGE_NAME="$PACKAGE_NAME" \
-python3 "$SYNC_SCRIPT" "$IAP_CONFIG"
-
-# --- Update hash on success ---
-echo "$HASH" > "$STATE_FILE"
+run_store_script sync-iap-android "$SYNC_SCRIPT" "$IAP_CONFIG"
 
 ci_done "Android IAP synced to Google Play"
@@ -0,0 +1,27 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# Runs store-automator Python scripts through the warm worker (scripts/store_worker.py)
+# when one is running, and directly otherwise.
+# Source this file; then call: run_store_script <job> <script> [args...]
+# Start a worker for the rest of the CI job with: python3 scripts/store_worker.py start
+# Set STORE_WORKER=0 to always run scripts directly.
+# Only exit status 75 (the worker never accepted the job) falls back to a direct run;
+# any other status, including 70 (worker lost mid-job), is returned as the job's result.
+
+STORE_WORKER_UNAVAILABLE=75
+
+run_store_script() {
+  local job="$1" script="$2"
+  shift 2
+  local worker
+  worker="$(dirname "$script")/store_worker.py"
+  if [ "${STORE_WORKER:-1}" != "0" ] && [ -f "$worker" ]; then
+    local status=0
+    python3 "$worker" run "$job" -- "$@" || status=$?
+    if [ "$status" -ne "$STORE_WORKER_UNAVAILABLE" ]; then
+      return "$status"
+    fi
+  fi
+  python3 "$script" "$@"
+}
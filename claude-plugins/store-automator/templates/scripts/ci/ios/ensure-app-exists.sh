@@ -7,6 +7,7 @@ set -euo pipefail
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/../common/read-config.sh"
 source "$SCRIPT_DIR/../common/ci-notify.sh"
+source "$SCRIPT_DIR/../common/store-worker.sh"
 
 echo "=== Ensure App Exists in App Store Connect ==="
 
@@ -45,6 +46,6 @@ if [ ! -f "$CREATE_SCRIPT" ]; then
 fi
 
 echo "Ensuring app exists in App Store Connect..."
-python3 "$CREATE_SCRIPT"
+run_store_script ensure-app "$CREATE_SCRIPT"
 
 ci_done "App exists and is configured in App Store Connect"
@@ -3,6 +3,7 @@ set -euo pipefail
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/../common/read-config.sh"
+source "$SCRIPT_DIR/../common/store-worker.sh"
 
 # --- Validate required config ---
 if [ -z "$APPLE_KEY_ID" ] || [ -z "$APPLE_ISSUER_ID" ] || [ -z "$P8_KEY_PATH" ]; then
@@ -27,7 +28,7 @@ export BUNDLE_ID
 
 # --- Run the existing Python script ---
 echo "Running manage_version_ios.py..."
-VERSION_JSON=$(python3 "$PROJECT_ROOT/scripts/manage_version_ios.py")
+VERSION_JSON=$(run_store_script manage-version "$PROJECT_ROOT/scripts/manage_version_ios.py")
 
 if [ -z "$VERSION_JSON" ]; then
   echo "ERROR: manage_version_ios.py returned empty output" >&2
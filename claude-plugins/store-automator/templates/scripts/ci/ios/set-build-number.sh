@@ -24,9 +24,6 @@ if [ -z "${APP_STORE_CONNECT_KEY_IDENTIFIER:-}" ]; then
   APP_STORE_CONNECT_PRIVATE_KEY=$(cat "$P8_FULL_PATH")
 fi
 
-# --- Ensure PyJWT is installed ---
-pip3 install --break-system-packages PyJWT >/dev/null 2>&1 || true
-
 # --- Fetch latest build number from ASC ---
 echo "Fetching latest build number from App Store Connect..."
 
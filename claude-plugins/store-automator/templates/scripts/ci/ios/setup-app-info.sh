@@ -6,6 +6,7 @@ set -euo pipefail
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/../common/read-config.sh"
 source "$SCRIPT_DIR/../common/ci-notify.sh"
+source "$SCRIPT_DIR/../common/store-worker.sh"
 
 echo "=== App Store Connect App Info Setup ==="
 
@@ -38,6 +39,6 @@ if [ ! -f "$SETUP_SCRIPT" ]; then
 fi
 
 echo "Setting up App Store Connect app info..."
-python3 "$SETUP_SCRIPT"
+run_store_script setup-app-info "$SETUP_SCRIPT"
 
 ci_done "App Store Connect app info configured"
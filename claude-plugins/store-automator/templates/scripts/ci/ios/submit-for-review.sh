@@ -5,6 +5,7 @@ set -euo pipefail
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/../common/read-config.sh"
 source "$SCRIPT_DIR/../common/ci-notify.sh"
+source "$SCRIPT_DIR/../common/store-worker.sh"
 
 echo "=== Submit iOS for Review ==="
 
@@ -33,6 +34,6 @@ export BUNDLE_ID
 echo "ASC API key configured (Key ID: $APPLE_KEY_ID)"
 
 echo "Submitting iOS app for App Store review..."
-python3 "$PROJECT_ROOT/scripts/submit_for_review_ios.py"
+run_store_script submit-for-review "$PROJECT_ROOT/scripts/submit_for_review_ios.py"
 
 ci_done "iOS app submitted for App Store review"
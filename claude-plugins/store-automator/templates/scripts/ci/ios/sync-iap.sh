@@ -6,6 +6,7 @@ set -euo pipefail
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/../common/read-config.sh"
 source "$SCRIPT_DIR/../common/ci-notify.sh"
+source "$SCRIPT_DIR/../common/store-worker.sh"
 
 echo "=== iOS IAP Sync ==="
 
@@ -16,27 +17,10 @@ if [ ! -f "$IAP_CONFIG" ]; then
   ci_skip "No iOS IAP config file found"
 fi
 
-# --- Hash-based change detection (config + Python scripts) ---
-CURRENT_HASH=$(cat "$IAP_CONFIG" \
-  "$PROJECT_ROOT/scripts/sync_iap_ios.py" \
-  "$PROJECT_ROOT/scripts/asc_subscription_setup.py" \
-  "$PROJECT_ROOT/scripts/asc_subscription_submit.py" \
-  "$PROJECT_ROOT/scripts/asc_iap_api.py" \
-  | shasum -a 256 | cut -d' ' -f1)
-
-STATE_DIR="$PROJECT_ROOT/.ci-state"
-mkdir -p "$STATE_DIR"
-STATE_FILE="$STATE_DIR/ios-iap-hash"
-
-if [ -f "$STATE_FILE" ]; then
-  STORED_HASH=$(cat "$STATE_FILE")
-  if [ "$CURRENT_HASH" = "$STORED_HASH" ]; then
-    ci_skip "iOS IAP config unchanged since last sync"
-  fi
-  echo "IAP config changed (old: ${STORED_HASH:0:12}..., new: ${CURRENT_HASH:0:12}...)"
-else
-  echo "No cached hash found. First run — will sync IAPs."
-fi
+# --- Change detection ---
+# sync_iap_ios.py keeps per-entity fingerprints in .ci-state/ios-iap-fingerprints.json
+# and only syncs groups, subscriptions and locales whose config changed or that
+# are missing in App Store Connect, so an unchanged config costs a few GETs.
 
 # --- Set up App Store Connect API credentials ---
 P8_FULL_PATH="$PROJECT_ROOT/$P8_KEY_PATH"
@@ -62,8 +46,6 @@ if [ ! -f "$SYNC_SCRIPT" ]; then
 fi
 
 echo "Syncing IAPs to App Store Connect..."
-python3 "$SYNC_SCRIPT" "$IAP_CONFIG"
+run_store_script sync-iap-ios "$SYNC_SCRIPT" "$IAP_CONFIG"
 
-# --- Update hash on success ---
-echo "$CURRENT_HASH" > "$STATE_FILE"
 ci_done "iOS IAP synced to App Store Connect"
@@ -0,0 +1,71 @@
+"""
+Helpers for the .ci-state/ directory shared by the CI scripts.
+
+.ci-state/ lives in the project root (gitignored, persisted between workflow
+runs by actions/cache). Set CI_STATE_DIR to use a different location.
+
+A multi-app run switches the directory per app with use_project_root(); the
+choice is held in a context variable, so it follows the app's threads and
+asyncio tasks.
+"""
+import contextlib
+import json
+import os
+import tempfile
+from contextvars import ContextVar
+
+_project_state_dir: ContextVar[str | None] = ContextVar("ci_state_dir", default=None)
+
+
+def state_dir() -> str:
+    """Return the .ci-state directory, creating it if needed."""
+    path = _project_state_dir.get() or os.environ.get("CI_STATE_DIR") or os.path.join(
+        os.environ.get("PROJECT_ROOT") or os.getcwd(), ".ci-state",
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@contextlib.contextmanager
+def use_project_root(project_root: str):
+    """Use <project_root>/.ci-state for state written in this context."""
+    token = _project_state_dir.set(os.path.join(os.path.abspath(project_root), ".ci-state"))
+    try:
+        yield
+    finally:
+        _project_state_dir.reset(token)
+
+
+def state_path(name: str) -> str:
+    """Return the absolute path of a file (or subdirectory entry) inside .ci-state."""
+    return os.path.join(state_dir(), name)
+
+
+def load_json(name: str, default=None):
+    """Read a JSON state file, returning `default` when missing or unreadable."""
+    try:
+        with open(state_path(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(name: str, data, private: bool = False) -> None:
+    """Atomically write a JSON state file. `private` restricts it to the owner (0600)."""
+    path = state_path(name)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    except OSError:
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        if not private:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
@@ -28,46 +28,18 @@ Exit codes:
 import json
 import os
 import sys
-import time
-
-try:
-    import jwt
-    import requests
-except ImportError:
-    print("Installing dependencies...", file=sys.stderr)
-    import subprocess
-    subprocess.check_call(
-        [sys.executable, "-m", "pip", "install", "--break-system-packages", "PyJWT", "cryptography", "requests"],
-        stdout=subprocess.DEVNULL,
-    )
-    import jwt
-    import requests
 
-# Import content rights and pricing from asc_app_setup (same directory)
+# Import shared client, content rights and pricing (same directory)
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from asc_app_setup import print_api_errors, set_content_rights, set_app_pricing  # noqa: E402
-
-BASE_URL = "https://api.appstoreconnect.apple.com/v1"
-TIMEOUT = (10, 30)
-
-
-def get_jwt_token(key_id: str, issuer_id: str, private_key: str) -> str:
-    """Generate a signed JWT for App Store Connect API authentication."""
-    now = int(time.time())
-    payload = {
-        "iss": issuer_id,
-        "iat": now,
-        "exp": now + 1200,
-        "aud": "appstoreconnect-v1",
-    }
-    return jwt.encode(payload, private_key, algorithm="ES256", headers={"kid": key_id})
+from asc_app_setup import set_content_rights, set_app_pricing  # noqa: E402
+from asc_client import BASE_URL, TIMEOUT, auth_headers, get_session, print_api_errors, sparse_fields  # noqa: E402
 
 
 def ensure_bundle_id(headers: dict, bundle_id: str, app_name: str, platform: str) -> str:
     """Register a Bundle ID if it does not exist. Returns the resource ID."""
-    resp = requests.get(
+    resp = get_session().get(
         f"{BASE_URL}/bundleIds",
-        params={"filter[identifier]": bundle_id},
+        params={"filter[identifier]": bundle_id, "limit": 1, **sparse_fields({"bundleIds": ["identifier"]})},
         headers=headers,
         timeout=TIMEOUT,
     )
@@ -79,7 +51,7 @@ def ensure_bundle_id(headers: dict, bundle_id: str, app_name: str, platform: str
         return resource_id
 
     print(f"  Registering new Bundle ID '{bundle_id}' (platform: {platform})...")
-    post_resp = requests.post(
+    post_resp = get_session().post(
         f"{BASE_URL}/bundleIds",
         json={
             "data": {
@@ -93,6 +65,7 @@ def ensure_bundle_id(headers: dict, bundle_id: str, app_name: str, platform: str
         },
         headers=headers,
         timeout=TIMEOUT,
+        idempotent=True,
     )
     if post_resp.status_code == 409:
         print("  Bundle ID already exists (409 Conflict), re-fetching...")
@@ -107,9 +80,9 @@ def ensure_bundle_id(headers: dict, bundle_id: str, app_name: str, platform: str
 
 def _refetch_bundle_id(headers: dict, bundle_id: str) -> str:
     """Re-fetch a bundle ID resource after a 409 conflict."""
-    resp = requests.get(
+    resp = get_session().get(
         f"{BASE_URL}/bundleIds",
-        params={"filter[identifier]": bundle_id},
+        params={"filter[identifier]": bundle_id, "limit": 1, **sparse_fields({"bundleIds": ["identifier"]})},
         headers=headers,
         timeout=TIMEOUT,
     )
@@ -123,9 +96,13 @@ def _refetch_bundle_id(headers: dict, bundle_id: str) -> str:
 
 def _lookup_existing_app(headers: dict, bundle_id: str) -> dict | None:
     """Look up an existing app by bundle ID. Returns app data dict or None."""
-    resp = requests.get(
+    resp = get_session().get(
         f"{BASE_URL}/apps",
-        params={"filter[bundleId]": bundle_id},
+        params={
+            "filter[bundleId]": bundle_id,
+            "limit": 1,
+            **sparse_fields({"apps": ["name", "bundleId", "sku"]}),
+        },
         headers=headers,
         timeout=TIMEOUT,
     )
@@ -169,7 +146,9 @@ def create_app_record(
             },
         }
     }
-    resp = requests.post(f"{BASE_URL}/apps", json=payload, headers=headers, timeout=TIMEOUT)
+    resp = get_session().post(
+        f"{BASE_URL}/apps", json=payload, headers=headers, timeout=TIMEOUT, idempotent=True,
+    )
     if resp.status_code == 409:
         print("  App creation returned 409, fetching existing record...")
         existing = _lookup_existing_app(headers, bundle_id)
@@ -232,12 +211,12 @@ def validate_env_vars() -> dict:
     }
 
 
-def main() -> None:
-    """Orchestrate the full app creation and configuration flow."""
-    cfg = validate_env_vars()
-    token = get_jwt_token(cfg["key_id"], cfg["issuer_id"], cfg["private_key"])
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+def ensure_app(headers: dict, cfg: dict) -> str:
+    """Run the full creation and configuration flow for one app. Returns the app ID.
 
+    `cfg` holds bundle_id, app_name, sku, platform, price_tier and
+    uses_third_party, as returned by validate_env_vars().
+    """
     print(f"Step 1: Ensuring Bundle ID '{cfg['bundle_id']}' is registered...")
     bundle_id_resource_id = ensure_bundle_id(headers, cfg["bundle_id"], cfg["app_name"], cfg["platform"])
 
@@ -253,6 +232,14 @@ def main() -> None:
     set_app_pricing(headers, app_id, cfg["price_tier"])
 
     print(f"All done. App '{cfg['app_name']}' ({cfg['bundle_id']}) is ready.")
+    return app_id
+
+
+def main() -> None:
+    """Orchestrate the full app creation and configuration flow."""
+    cfg = validate_env_vars()
+    headers = auth_headers(cfg["key_id"], cfg["issuer_id"], cfg["private_key"])
+    ensure_app(headers, cfg)
 
 
 if __name__ == "__main__":
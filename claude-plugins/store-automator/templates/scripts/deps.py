@@ -0,0 +1,58 @@
+"""
+Third-party packages the store scripts depend on.
+
+The scripts never install packages themselves; the workflow does (e.g.
+pip3 install requests PyJWT cryptography). check() runs when a module that
+needs a package is imported: it only locates the packages, so a missing one
+stops the script at startup with the pip command to run, before any API
+call is made. The packages themselves are imported on first use through
+load(), keeping them out of the startup path of runs that never need them
+(usage errors, skipped steps, the store_worker client).
+"""
+import importlib
+import importlib.util
+import sys
+
+# Importable module -> pip distribution that provides it
+PACKAGES = {
+    "requests": "requests",
+    "jwt": "PyJWT",
+    "cryptography": "cryptography",
+    "googleapiclient": "google-api-python-client",
+    "google.oauth2": "google-auth",
+}
+
+
+def _importable(module: str) -> bool:
+    if sys.modules.get(module) is not None:
+        return True
+    try:
+        # Locates the module without executing it (only a dotted name's parent package is imported)
+        return importlib.util.find_spec(module) is not None
+    except ImportError:
+        return False
+
+
+def missing(*modules: str) -> list[str]:
+    """The modules among `modules` that cannot be imported."""
+    return [module for module in modules if not _importable(module)]
+
+
+def check(*modules: str) -> None:
+    """Exit with an install hint unless every module is importable (without importing any)."""
+    absent = missing(*modules)
+    if not absent:
+        return
+    packages = " ".join(PACKAGES.get(module, module) for module in absent)
+    print(f"ERROR: Missing Python package(s): {packages}", file=sys.stderr)
+    print(f"Install with: pip3 install --break-system-packages {packages}", file=sys.stderr)
+    sys.exit(1)
+
+
+def load(module: str):
+    """Import and return `module` on first use, exiting with an install hint when it is missing."""
+    loaded = sys.modules.get(module)
+    if loaded is not None:
+        return loaded
+    check(module)
+    return importlib.import_module(module)
@@ -0,0 +1,125 @@
+"""
+Shared Google OAuth access-token provider for the Google Play scripts.
+
+Exchanging a service-account assertion for an access token costs a key
+parse, an RS256 signature and a round trip to oauth2.googleapis.com. The
+provider does that once and reuses the token until shortly before its
+expires_in, keeping it in memory and in .ci-state/gplay-token.json
+(owner-only) so later scripts in the same workflow skip the exchange.
+A 401 from the Android Publisher API drops the token and fetches a new one.
+Set GPLAY_TOKEN_CACHE=0 to keep tokens in memory only.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import ci_state
+import deps
+from store_http import TIMEOUT, get_session
+
+# PyJWT signs RS256 through cryptography; both are imported on first exchange
+deps.check("jwt", "cryptography")
+
+TOKEN_URL = "https://oauth2.googleapis.com/token"
+SCOPE = "https://www.googleapis.com/auth/androidpublisher"
+API_HOST = "https://androidpublisher.googleapis.com/"
+TOKEN_CACHE_FILE = "gplay-token.json"
+REFRESH_MARGIN = 300
+
+_providers: dict = {}
+
+
+class GoogleTokenProvider:
+    """Caching OAuth2 access-token provider for one service account."""
+
+    def __init__(self, sa_path: str, use_cache: bool | None = None):
+        with open(sa_path, "r", encoding="utf-8") as fh:
+            self._sa = json.load(fh)
+        if use_cache is None:
+            use_cache = os.environ.get("GPLAY_TOKEN_CACHE", "1") != "0"
+        self._use_cache = use_cache
+        self._fingerprint = hashlib.sha256(
+            f"{self._sa['client_email']}:{self._sa.get('private_key_id', '')}:{SCOPE}".encode("utf-8"),
+        ).hexdigest()
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+
+    def applies_to(self, url: str) -> bool:
+        """Only Android Publisher calls carry the token (never the token endpoint itself)."""
+        return url.startswith(API_HOST)
+
+    def access_token(self) -> str:
+        """Return a valid access token, exchanging a new one when needed."""
+        with self._lock:
+            if self._expires_at - time.time() <= REFRESH_MARGIN:
+                self._load_or_exchange()
+            return self._token
+
+    def authorization(self) -> str:
+        """Return the Authorization header value."""
+        return f"Bearer {self.access_token()}"
+
+    def invalidate(self) -> None:
+        """Forget the current token (e.g. after a 401) so the next call fetches a new one."""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+            if self._use_cache:
+                ci_state.save_json(TOKEN_CACHE_FILE, {}, private=True)
+
+    def _load_or_exchange(self) -> None:
+        if self._use_cache:
+            cached = ci_state.load_json(TOKEN_CACHE_FILE, {}) or {}
+            if (
+                cached.get("fingerprint") == self._fingerprint
+                and cached.get("expires_at", 0) - time.time() > REFRESH_MARGIN
+            ):
+                self._token = cached["access_token"]
+                self._expires_at = cached["expires_at"]
+                return
+        self._token, self._expires_at = self._exchange()
+        if self._use_cache:
+            ci_state.save_json(TOKEN_CACHE_FILE, {
+                "fingerprint": self._fingerprint,
+                "access_token": self._token,
+                "expires_at": self._expires_at,
+            }, private=True)
+
+    def _exchange(self) -> tuple[str, float]:
+        """Sign a service-account assertion and exchange it for an access token."""
+        now = int(time.time())
+        payload = {
+            "iss": self._sa["client_email"],
+            "scope": SCOPE,
+            "aud": TOKEN_URL,
+            "iat": now,
+            "exp": now + 3600,
+        }
+        signed = deps.load("jwt").encode(payload, self._sa["private_key"], algorithm="RS256")
+        resp = get_session().post(
+            TOKEN_URL,
+            data={"grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer", "assertion": signed},
+            timeout=TIMEOUT,
+            idempotent=True,
+        )
+        resp.raise_for_status()
+        body = resp.json()
+        return body["access_token"], now + float(body.get("expires_in", 3600))
+
+
+def get_provider(sa_path: str) -> GoogleTokenProvider:
+    """Return the process-wide provider for a service-account file."""
+    key = os.path.abspath(sa_path)
+    if key not in _providers:
+        _providers[key] = GoogleTokenProvider(sa_path)
+    return _providers[key]
+
+
+def install_auth(sa_path: str) -> GoogleTokenProvider:
+    """Attach the provider to the shared session so every Play API call is authorized."""
+    provider = get_provider(sa_path)
+    get_session().auth = provider
+    return provider
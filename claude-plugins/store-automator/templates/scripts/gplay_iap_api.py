@@ -3,25 +3,26 @@ Google Play IAP API layer.
 
 Low-level functions for interacting with the Android Publisher API
 for subscriptions, base plans, and offers.
+
+The batch_* functions group per-product operations into the API's batch
+endpoints (subscriptions:batchUpdate, basePlans:batchUpdateStates and
+offers:batchUpdate), BATCH_LIMIT requests per call. A batch is applied
+atomically, so when one fails its items are retried one by one with the
+single-item functions to pinpoint the failing product.
+
+convert_region_prices() turns one price into every Play region's local
+price; results are cached by (price, currency, regions version) in memory
+and in the store_cache disk cache, so identical prices across products and
+runs cost a single call.
 """
-import json
 import sys
-import time
-
-try:
-    import jwt
-    import requests
-except ImportError:
-    import subprocess
-    subprocess.check_call(
-        [sys.executable, "-m", "pip", "install", "--break-system-packages", "PyJWT", "cryptography", "requests"],
-        stdout=subprocess.DEVNULL,
-    )
-    import jwt
-    import requests
+
+import store_cache
+from gplay_auth import get_provider, install_auth
+from store_http import TIMEOUT, get_session
+from store_paging import Paginator, google_next_page
 
 API_BASE = "https://androidpublisher.googleapis.com/androidpublisher/v3/applications"
-TIMEOUT = (10, 30)
 
 # ISO 8601 duration mapping (normalize to ISO 8601 for Google Play)
 DURATION_MAP = {
@@ -36,43 +37,52 @@ DURATION_MAP = {
 # Regions version required by the API
 REGIONS_VERSION = {"version": "2022/02"}
 
+# Default cache lifetime (seconds) for convertRegionPrices results
+REGION_PRICES_TTL = 24 * 3600
+
+_converted_prices: dict = {}
+
+# Subscriptions per list page (the API maximum)
+PAGE_SIZE = 1000
+
+# Maximum requests per batch call
+BATCH_LIMIT = 100
+
+# Batch writes may take a few minutes to propagate; in exchange they are
+# not throttled like latency-sensitive updates.
+LATENCY_TOLERANCE = "PRODUCT_UPDATE_LATENCY_TOLERANCE_LATENCY_TOLERANT"
+
 
 def get_access_token(sa_path: str) -> str:
-    """Obtain an OAuth2 access token using the service account credentials."""
-    with open(sa_path, "r", encoding="utf-8") as fh:
-        sa = json.load(fh)
-    now = int(time.time())
-    payload = {
-        "iss": sa["client_email"],
-        "scope": "https://www.googleapis.com/auth/androidpublisher",
-        "aud": "https://oauth2.googleapis.com/token",
-        "iat": now,
-        "exp": now + 3600,
-    }
-    signed = jwt.encode(payload, sa["private_key"], algorithm="RS256")
-    resp = requests.post(
-        "https://oauth2.googleapis.com/token",
-        data={"grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer", "assertion": signed},
-        timeout=TIMEOUT,
-    )
-    resp.raise_for_status()
-    return resp.json()["access_token"]
+    """Return a cached (or freshly exchanged) OAuth2 access token for the service account."""
+    return get_provider(sa_path).access_token()
+
+
+def auth_headers(sa_path: str) -> dict:
+    """Install the service-account token provider on the shared session and return JSON headers.
+
+    The Authorization header is added (and refreshed) by the session on every call.
+    """
+    install_auth(sa_path)
+    return {"Content-Type": "application/json"}
 
 
 def list_subscriptions(headers: dict, package_name: str) -> dict:
     """List all existing subscriptions. Returns a dict keyed by productId."""
-    resp = requests.get(
+    pages = Paginator(
+        get_session(),
         f"{API_BASE}/{package_name}/subscriptions",
+        {"pageSize": PAGE_SIZE},
         headers=headers,
-        timeout=TIMEOUT,
+        records_key="subscriptions",
+        next_page=google_next_page,
     )
-    if resp.status_code == 404:
-        return {}
-    resp.raise_for_status()
-    if not resp.text.strip():
-        return {}
-    subs = resp.json().get("subscriptions", [])
-    return {s["productId"]: s for s in subs}
+    subs = {s["productId"]: s for s in pages}
+    if pages.failed is not None:
+        if pages.failed.status_code == 404:
+            return {}
+        pages.failed.raise_for_status()
+    return subs
 
 
 def normalize_duration(duration: str) -> str:
@@ -91,6 +101,48 @@ def build_price(price_str: str, currency: str = "USD") -> dict:
     return {"currencyCode": currency, "units": units, "nanos": nanos}
 
 
+def convert_region_prices(headers: dict, package_name: str, price_str: str, currency: str = "USD") -> dict | None:
+    """Convert a price into every Play region's local price (cached).
+
+    Returns {"regions": {regionCode: Money}, "other": {"usdPrice": Money,
+    "eurPrice": Money}}, or None if the conversion failed.
+    """
+    money = build_price(price_str, currency)
+    key = (money["currencyCode"], money["units"], money["nanos"], REGIONS_VERSION["version"])
+    if key in _converted_prices:
+        return _converted_prices[key]
+
+    def load() -> tuple[dict | None, bool]:
+        resp = get_session().post(
+            f"{API_BASE}/{package_name}/pricing:convertRegionPrices",
+            json={"price": money},
+            headers=headers,
+            timeout=TIMEOUT,
+            idempotent=True,
+        )
+        if not resp.ok:
+            print_api_error(resp, f"convert region prices for {price_str} {currency}")
+            return None, False
+        body = resp.json()
+        regions = {
+            code: entry["price"]
+            for code, entry in body.get("convertedRegionPrices", {}).items()
+            if entry.get("price")
+        }
+        return {"regions": regions, "other": body.get("convertedOtherRegionsPrice", {})}, True
+
+    converted = store_cache.cached(
+        "region_prices",
+        "pricing:convertRegionPrices",
+        {"price": money, "regionsVersion": REGIONS_VERSION["version"]},
+        REGION_PRICES_TTL,
+        load,
+    )
+    if converted is not None:
+        _converted_prices[key] = converted
+    return converted
+
+
 def currency_to_region(currency: str) -> str:
     """Map common currency codes to region codes."""
     mapping = {
@@ -106,7 +158,7 @@ def currency_to_region(currency: str) -> str:
 
 def create_subscription(headers: dict, package_name: str, product_id: str, body: dict) -> dict:
     """Create a new subscription via the API."""
-    resp = requests.post(
+    resp = get_session().post(
         f"{API_BASE}/{package_name}/subscriptions",
         params={"productId": product_id, "regionsVersion.version": REGIONS_VERSION["version"]},
         json=body,
@@ -123,7 +175,7 @@ def create_subscription(headers: dict, package_name: str, product_id: str, body:
 
 def update_subscription(headers: dict, package_name: str, product_id: str, body: dict) -> dict:
     """Update an existing subscription via the API."""
-    resp = requests.patch(
+    resp = get_session().patch(
         f"{API_BASE}/{package_name}/subscriptions/{product_id}",
         params={
             "updateMask": "listings",
@@ -143,11 +195,12 @@ def update_subscription(headers: dict, package_name: str, product_id: str, body:
 
 def activate_base_plan(headers: dict, package_name: str, product_id: str, base_plan_id: str) -> bool:
     """Activate a base plan for a subscription."""
-    resp = requests.post(
+    resp = get_session().post(
         f"{API_BASE}/{package_name}/subscriptions/{product_id}/basePlans/{base_plan_id}:activate",
         headers=headers,
         json={},
         timeout=TIMEOUT,
+        idempotent=True,
     )
     if not resp.ok:
         print_api_error(resp, f"activate base plan '{base_plan_id}'")
@@ -156,29 +209,150 @@ def activate_base_plan(headers: dict, package_name: str, product_id: str, base_p
     return True
 
 
-def create_intro_offer(
+def upsert_offer(
     headers: dict, package_name: str, product_id: str, base_plan_id: str, offer_id: str, body: dict
 ) -> bool:
-    """Create an introductory offer (free trial) for a base plan."""
-    resp = requests.post(
+    """Create or update one offer (e.g. a free trial) of a base plan.
+
+    PATCH with allowMissing, like the batch call: a missing offer is created
+    and an existing one gets the configured phases, targeting and prices.
+    """
+    resp = get_session().patch(
         f"{API_BASE}/{package_name}/subscriptions/{product_id}"
-        f"/basePlans/{base_plan_id}/offers",
-        params={"offerId": offer_id, "regionsVersion.version": REGIONS_VERSION["version"]},
-        json=body,
+        f"/basePlans/{base_plan_id}/offers/{offer_id}",
+        params={
+            "updateMask": "phases,targeting,regionalConfigs",
+            "regionsVersion.version": REGIONS_VERSION["version"],
+            "allowMissing": "true",
+            "latencyTolerance": LATENCY_TOLERANCE,
+        },
+        json={"packageName": package_name, **body},
         headers=headers,
         timeout=TIMEOUT,
     )
-    if resp.status_code == 409:
-        print(f"      Intro offer '{offer_id}' already exists")
-        return True
     if not resp.ok:
-        print_api_error(resp, f"create intro offer for '{product_id}'")
+        print_api_error(resp, f"upsert offer '{offer_id}' for '{product_id}'")
         return False
 
-    print(f"      Created intro offer '{offer_id}'")
+    print(f"      Upserted offer '{offer_id}'")
     return True
 
 
+def _chunks(items: list, size: int = BATCH_LIMIT):
+    """Yield consecutive slices of at most `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def batch_update_subscriptions(
+    headers: dict, package_name: str, subscriptions: list, existing_ids,
+    update_mask: str = "listings",
+) -> set[str]:
+    """Create or update subscriptions in batches. Returns the product IDs that succeeded.
+
+    Uses allowMissing, so subscriptions that do not exist yet are created from
+    the full body (the update mask only applies to existing ones).
+    `existing_ids` picks the single-item fallback (update vs create).
+    """
+    done: set[str] = set()
+    for chunk in _chunks(subscriptions):
+        resp = get_session().post(
+            f"{API_BASE}/{package_name}/subscriptions:batchUpdate",
+            json={"requests": [
+                {
+                    "subscription": body,
+                    "updateMask": update_mask,
+                    "regionsVersion": REGIONS_VERSION,
+                    "allowMissing": True,
+                    "latencyTolerance": LATENCY_TOLERANCE,
+                }
+                for body in chunk
+            ]},
+            headers=headers,
+            timeout=TIMEOUT,
+            compress=True,
+            idempotent=True,
+        )
+        if resp.ok:
+            done.update(body["productId"] for body in chunk)
+            print(f"    Batch-updated {len(chunk)} subscription(s)")
+            continue
+        print_api_error(resp, f"batch update of {len(chunk)} subscription(s), retrying individually")
+        for body in chunk:
+            product_id = body["productId"]
+            fallback = update_subscription if product_id in existing_ids else create_subscription
+            if fallback(headers, package_name, product_id, body):
+                done.add(product_id)
+    return done
+
+
+def batch_activate_base_plans(headers: dict, package_name: str, base_plans: list) -> set[tuple[str, str]]:
+    """Activate (product_id, base_plan_id) pairs in batches. Returns the pairs that succeeded."""
+    done: set[tuple[str, str]] = set()
+    for chunk in _chunks(base_plans):
+        resp = get_session().post(
+            f"{API_BASE}/{package_name}/subscriptions/-/basePlans:batchUpdateStates",
+            json={"requests": [
+                {"activateBasePlanRequest": {
+                    "packageName": package_name,
+                    "productId": product_id,
+                    "basePlanId": base_plan_id,
+                    "latencyTolerance": LATENCY_TOLERANCE,
+                }}
+                for product_id, base_plan_id in chunk
+            ]},
+            headers=headers,
+            timeout=TIMEOUT,
+            idempotent=True,
+        )
+        if resp.ok:
+            done.update(chunk)
+            print(f"    Batch-activated {len(chunk)} base plan(s)")
+            continue
+        print_api_error(resp, f"batch activation of {len(chunk)} base plan(s), retrying individually")
+        for product_id, base_plan_id in chunk:
+            if activate_base_plan(headers, package_name, product_id, base_plan_id):
+                done.add((product_id, base_plan_id))
+    return done
+
+
+def batch_upsert_offers(headers: dict, package_name: str, offers: list) -> set[tuple[str, str, str]]:
+    """Create or update subscription offers in batches.
+
+    Each offer body must carry productId, basePlanId and offerId. Returns the
+    (product_id, base_plan_id, offer_id) triples that succeeded.
+    """
+    done: set[tuple[str, str, str]] = set()
+    for chunk in _chunks(offers):
+        resp = get_session().post(
+            f"{API_BASE}/{package_name}/subscriptions/-/basePlans/-/offers:batchUpdate",
+            json={"requests": [
+                {
+                    "subscriptionOffer": {"packageName": package_name, **body},
+                    "updateMask": "phases,targeting,regionalConfigs",
+                    "regionsVersion": REGIONS_VERSION,
+                    "allowMissing": True,
+                    "latencyTolerance": LATENCY_TOLERANCE,
+                }
+                for body in chunk
+            ]},
+            headers=headers,
+            timeout=TIMEOUT,
+            compress=True,
+            idempotent=True,
+        )
+        keys = [(body["productId"], body["basePlanId"], body["offerId"]) for body in chunk]
+        if resp.ok:
+            done.update(keys)
+            print(f"    Batch-updated {len(chunk)} offer(s)")
+            continue
+        print_api_error(resp, f"batch update of {len(chunk)} offer(s), retrying individually")
+        for key, body in zip(keys, chunk):
+            if upsert_offer(headers, package_name, *key, body):
+                done.add(key)
+    return done
+
+
 def print_api_error(resp, action: str) -> None:
     """Print human-readable API error messages."""
     try:
@@ -0,0 +1,135 @@
+"""
+Per-entity change detection for the IAP sync scripts.
+
+Each synced entity (subscription group, subscription, localization) gets a
+fingerprint: the SHA-256 of its canonical JSON config. Fingerprints of
+entities synced successfully are kept in .ci-state/<name>.json, scoped to
+the app they were synced to, so the next run only touches entities whose
+config changed (or that are missing remotely). Bump FINGERPRINT_VERSION when
+the sync logic changes what an entity's config produces remotely; set
+IAP_FULL_SYNC=1 to ignore stored fingerprints for one run.
+
+AssetIndex is the content-addressed counterpart for uploaded files: it maps
+an entity (e.g. a subscription's review screenshot) to the MD5 and remote
+asset ID of the file last uploaded for it.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import ci_state
+
+FINGERPRINT_VERSION = 1
+
+_digest_lock = threading.Lock()
+_digests: dict[tuple, str] = {}
+
+
+def fingerprint(value) -> str:
+    """Canonical SHA-256 of a JSON-serialisable value."""
+    raw = json.dumps([FINGERPRINT_VERSION, value], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: str | None) -> str | None:
+    """MD5 of a file's contents, or None when it does not exist.
+
+    Digests are memoized per process by (path, size, mtime), so a file
+    shared by several entities is read once.
+    """
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+    with _digest_lock:
+        cached = _digests.get(key)
+    if cached:
+        return cached
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    with _digest_lock:
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+class FingerprintStore:
+    """Stored fingerprints for one app; changes are persisted by save()."""
+
+    def __init__(self, name: str, scope: str):
+        self._name = name
+        self._scope = scope
+        self._lock = threading.Lock()
+        stored = ci_state.load_json(name, {}) or {}
+        full_sync = os.environ.get("IAP_FULL_SYNC", "0") not in ("", "0")
+        if full_sync or stored.get("scope") != scope:
+            stored = {}
+        self._entities: dict = stored.get("entities", {})
+        self.unchanged_count = 0
+
+    def unchanged(self, key: str, value) -> bool:
+        """Whether `value` matches the fingerprint recorded for `key` by the last successful sync."""
+        same = self._entities.get(key) == fingerprint(value)
+        if same:
+            with self._lock:
+                self.unchanged_count += 1
+        return same
+
+    def record(self, key: str, value) -> None:
+        """Remember `value` as successfully synced for `key`."""
+        with self._lock:
+            self._entities[key] = fingerprint(value)
+
+    def forget(self, key: str) -> None:
+        """Drop the fingerprint for `key` so it is synced again next run."""
+        with self._lock:
+            self._entities.pop(key, None)
+
+    def save(self) -> None:
+        """Persist the fingerprints to .ci-state."""
+        with self._lock:
+            data = {"scope": self._scope, "entities": dict(self._entities)}
+        ci_state.save_json(self._name, data)
+
+
+class AssetIndex:
+    """Uploaded files by entity: {key: {"md5": ..., "id": remote asset ID}}, kept in .ci-state."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._lock = threading.Lock()
+        stored = ci_state.load_json(name, {}) or {}
+        full_sync = os.environ.get("IAP_FULL_SYNC", "0") not in ("", "0")
+        self._assets: dict = {} if full_sync else stored.get("assets", {})
+
+    def matches(self, key: str, md5: str | None) -> bool:
+        """Whether the file last uploaded for `key` has this MD5."""
+        with self._lock:
+            entry = self._assets.get(key)
+        return bool(md5) and bool(entry) and entry.get("md5") == md5
+
+    def asset_id(self, key: str) -> str | None:
+        """Remote ID of the asset last uploaded for `key`."""
+        with self._lock:
+            return (self._assets.get(key) or {}).get("id")
+
+    def record(self, key: str, md5: str, asset_id: str | None) -> None:
+        """Remember that the file with this MD5 is uploaded for `key` as `asset_id`."""
+        with self._lock:
+            self._assets[key] = {"md5": md5, "id": asset_id}
+
+    def forget(self, key: str) -> None:
+        """Drop the entry for `key`."""
+        with self._lock:
+            self._assets.pop(key, None)
+
+    def save(self) -> None:
+        """Persist the index to .ci-state."""
+        with self._lock:
+            data = {"assets": dict(self._assets)}
+        ci_state.save_json(self._name, data)
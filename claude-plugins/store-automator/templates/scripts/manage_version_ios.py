@@ -23,56 +23,20 @@ Required env vars:
 import os
 import sys
 import json
-import time
-
-try:
-    import jwt
-    import requests
-except ImportError:
-    print("Installing dependencies...", file=sys.stderr)
-    import subprocess
-    subprocess.check_call([
-        sys.executable, "-m", "pip", "install", "--break-system-packages",
-        "PyJWT", "cryptography", "requests"
-    ], stdout=subprocess.DEVNULL)
-    import jwt
-    import requests
-
-BASE_URL = "https://api.appstoreconnect.apple.com/v1"
-
-
-def get_jwt_token(key_id, issuer_id, private_key):
-    payload = {
-        "iss": issuer_id,
-        "exp": int(time.time()) + 1200,
-        "aud": "appstoreconnect-v1",
-    }
-    return jwt.encode(payload, private_key, algorithm="ES256", headers={"kid": key_id})
-
-
-def get_app_id(headers, bundle_id):
-    resp = requests.get(
-        f"{BASE_URL}/apps",
-        params={"filter[bundleId]": bundle_id},
-        headers=headers,
-        timeout=(10, 30),
-    )
-    resp.raise_for_status()
-    data = resp.json().get("data", [])
-    if not data:
-        print(f"ERROR: No app found for bundle ID {bundle_id}", file=sys.stderr)
-        sys.exit(1)
-    return data[0]["id"]
+
+from asc_client import BASE_URL, PAGE_LIMIT, TIMEOUT, auth_headers, get_app_id, get_session, paginate, sparse_fields
 
 
 def get_versions(headers, app_id):
-    resp = requests.get(
+    return paginate(
+        headers,
         f"{BASE_URL}/apps/{app_id}/appStoreVersions",
-        headers=headers,
-        timeout=(10, 30),
-    )
-    resp.raise_for_status()
-    return resp.json().get("data", [])
+        {
+            "limit": PAGE_LIMIT,
+            **sparse_fields({"appStoreVersions": ["versionString", "appStoreState", "createdDate"]}),
+        },
+        raise_errors=True,
+    ).all()
 
 
 def increment_version(version_str):
@@ -89,7 +53,7 @@ def increment_version(version_str):
 
 
 def create_version(headers, app_id, version_string):
-    resp = requests.post(
+    resp = get_session().post(
         f"{BASE_URL}/appStoreVersions",
         json={
             "data": {
@@ -105,7 +69,7 @@ def create_version(headers, app_id, version_string):
             }
         },
         headers=headers,
-        timeout=(10, 30),
+        timeout=TIMEOUT,
     )
     resp.raise_for_status()
     return resp.json()["data"]
@@ -121,11 +85,7 @@ def main():
         print("ERROR: Missing required environment variables", file=sys.stderr)
         sys.exit(1)
 
-    token = get_jwt_token(key_id, issuer_id, private_key)
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
+    headers = auth_headers(key_id, issuer_id, private_key)
 
     app_id = get_app_id(headers, bundle_id)
     versions = get_versions(headers, app_id)
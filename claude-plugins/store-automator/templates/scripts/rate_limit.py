@@ -0,0 +1,49 @@
+"""
+Thread-safe token-bucket rate limiter shared by the store API layers.
+
+The bucket refills at `rate` tokens per second up to `capacity`; each call to
+acquire() takes one token, blocking the calling thread until one is
+available. A rate of 0 disables limiting.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Token-bucket limiter safe to share between worker threads."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self._lock = threading.Lock()
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take `tokens` from the bucket, sleeping as needed. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                if self.rate <= 0:
+                    return waited
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def set_rate(self, rate: float, capacity: float | None = None) -> None:
+        """Change the refill rate (and optionally the burst capacity) in place."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+            if capacity:
+                self.capacity = float(capacity)
+            self._tokens = min(self._tokens, self.capacity)
@@ -0,0 +1,172 @@
+"""
+On-disk TTL cache for slowly changing store reference data.
+
+Catalogs such as App Store territories, subscription price points and their
+equalizations change rarely but cost many paginated requests to download.
+Entries are stored as one JSON file each under .ci-state/cache/, keyed by a
+hash of the endpoint and its parameters, and expire after a per-kind TTL.
+Entries read or written are also kept in memory, so apps synced in one
+process (see batch_sync.py) share them even when their .ci-state
+directories differ, and concurrent loads of the same entry are made once.
+
+Environment:
+  STORE_CACHE=0                 disable the cache (always fetch)
+  STORE_CACHE_REFRESH=1         ignore cached entries but store fresh ones
+  STORE_CACHE_MAX_MB            size bound for each .ci-state/cache written
+                                to (default 50); oldest entries are evicted
+                                at process exit
+  STORE_CACHE_TTL_<KIND>        TTL in seconds for one kind, e.g.
+                                STORE_CACHE_TTL_TERRITORIES=86400
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+
+import ci_state
+
+CACHE_DIR = "cache"
+DEFAULT_MAX_MB = 50
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0}
+_memory: dict[tuple[str, str], tuple[float, object]] = {}
+_load_locks: dict[tuple[str, str], threading.Lock] = {}
+# Cache directories written by this process (one per .ci-state), evicted at exit
+_written_dirs: set[str] = set()
+
+
+def enabled() -> bool:
+    """Whether the cache is in use for this process."""
+    return os.environ.get("STORE_CACHE", "1") != "0"
+
+
+def _force_refresh() -> bool:
+    return os.environ.get("STORE_CACHE_REFRESH", "0") not in ("", "0")
+
+
+def ttl_for(kind: str, default: float) -> float:
+    """Return the TTL for `kind`, honouring STORE_CACHE_TTL_<KIND>."""
+    value = os.environ.get(f"STORE_CACHE_TTL_{kind.upper()}")
+    try:
+        return float(value) if value else default
+    except ValueError:
+        return default
+
+
+def cache_key(endpoint: str, params: dict | None = None) -> str:
+    """Stable key for an endpoint and its query parameters."""
+    raw = json.dumps([endpoint, params or {}], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _entry_name(kind: str, key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{kind}-{key}.json")
+
+
+def get(kind: str, key: str, ttl: float):
+    """Return the cached value for (kind, key), or None when missing or expired."""
+    if not enabled() or _force_refresh():
+        return None
+    with _lock:
+        memo = _memory.get((kind, key))
+    if memo and time.time() - memo[0] <= ttl:
+        with _lock:
+            _stats["hits"] += 1
+        return memo[1]
+    entry = ci_state.load_json(_entry_name(kind, key))
+    if not isinstance(entry, dict) or time.time() - entry.get("stored_at", 0) > ttl:
+        with _lock:
+            _stats["misses"] += 1
+        return None
+    with _lock:
+        _stats["hits"] += 1
+        _memory[(kind, key)] = (entry.get("stored_at", 0), entry.get("value"))
+    return entry.get("value")
+
+
+def put(kind: str, key: str, value) -> None:
+    """Store `value` for (kind, key)."""
+    if not enabled():
+        return
+    stored_at = time.time()
+    ci_state.save_json(_entry_name(kind, key), {"stored_at": stored_at, "value": value})
+    directory = ci_state.state_path(CACHE_DIR)
+    with _lock:
+        _memory[(kind, key)] = (stored_at, value)
+        _stats["writes"] += 1
+        if not _written_dirs:
+            atexit.register(evict)
+        _written_dirs.add(directory)
+
+
+def cached(kind: str, endpoint: str, params: dict | None, ttl: float, loader):
+    """Return the cached value for the endpoint, or call loader() and cache its result.
+
+    loader() returns (value, complete); incomplete results (e.g. a page
+    failed mid-pagination) are returned but never cached.
+    """
+    key = cache_key(endpoint, params)
+    ttl = ttl_for(kind, ttl)
+    value = get(kind, key, ttl)
+    if value is not None:
+        return value
+    with _lock:
+        load_lock = _load_locks.setdefault((kind, key), threading.Lock())
+    with load_lock:
+        # Another thread may have loaded the entry while this one waited
+        value = get(kind, key, ttl) if enabled() else None
+        if value is not None:
+            return value
+        value, complete = loader()
+        if complete:
+            put(kind, key, value)
+    return value
+
+
+def evict(max_bytes: int | None = None) -> int:
+    """Delete the oldest entries of every cache directory written to until each fits the size bound.
+
+    Returns the number of files removed.
+    """
+    if max_bytes is None:
+        max_bytes = int(float(os.environ.get("STORE_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+    with _lock:
+        directories = sorted(_written_dirs)
+    return sum(_evict_directory(directory, max_bytes) for directory in directories)
+
+
+def _evict_directory(directory: str, max_bytes: int) -> int:
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    entries = []
+    total = 0
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def stats() -> dict:
+    """Return hit/miss/write counters for this process."""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,388 @@
+"""
+Shared HTTP layer for the App Store Connect and Google Play scripts.
+
+Provides the pooled transport (HTTP/2 via httpx when installed, keep-alive
+requests.Session otherwise) and StoreSession, which sends every call through
+one retry policy:
+
+  - 429 responses are retried for any method (the request was rejected
+    before it was processed);
+  - 5xx responses and network errors are retried only for idempotent calls:
+    GET/HEAD/PUT/PATCH/DELETE by default, or any call made with
+    idempotent=True (e.g. POSTs whose duplicates are rejected with 409);
+  - the wait honours Retry-After, otherwise uses exponential backoff with
+    full jitter;
+  - each call makes at most STORE_RETRY_ATTEMPTS attempts (default 5) and
+    the whole process sleeps at most STORE_RETRY_BUDGET seconds (default
+    300) across all retries.
+
+When retries are exhausted the last response is returned, so callers keep
+their existing error handling. Every response carries `attempts`, the number
+of attempts made: a 409 on a retried create means an earlier attempt went
+through. Set ASC_HTTP2=0 to force requests.
+
+Sessions can also attach credentials per request through an auth provider:
+any object with applies_to(url), authorization() (the Authorization header
+value, refreshed as needed) and invalidate() (drop the current credential).
+A 401 response invalidates the credential and repeats the call once with a
+fresh one.
+
+Payloads: responses are requested with Accept-Encoding gzip/deflate (plus br
+when a brotli decoder is installed) and JSON is encoded/decoded with orjson
+when it is installed, the stdlib json module otherwise (STORE_JSON=stdlib
+forces the latter). `json=` bodies of calls made with compress=True are
+gzipped once they reach GZIP_MIN_BYTES; if the server rejects the encoding
+of a compressed body (415, or a 400 whose error mentions the encoding) it is
+resent uncompressed and compression is turned off for the session.
+STORE_GZIP_REQUESTS=0 disables request compression.
+
+Pacing: a session can carry a shared TokenBucket (`limiter`) taken once per
+attempt. The process-wide session of get_session() is limited to
+STORE_MAX_RPS requests per second (default 0, unlimited), one budget for
+every thread and app using it.
+
+Worker pools: ContextThreadPoolExecutor runs each submitted call in a copy
+of the submitter's context, so per-app context variables (the .ci-state
+directory, write stats, the batch output prefix) follow work handed to the
+process-wide pools.
+"""
+import contextvars
+import gzip
+import importlib.util
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import deps
+from rate_limit import TokenBucket
+
+deps.check("requests")
+
+TIMEOUT = (10, 30)
+POOL_SIZE = 16
+
+GZIP_MIN_BYTES = 1024
+ACCEPT_ENCODING = "gzip, deflate" + (
+    ", br" if any(importlib.util.find_spec(m) for m in ("brotli", "brotlicffi")) else ""
+)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"})
+
+_session = None
+_session_lock = threading.Lock()
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_codec() -> str:
+    """Name of the JSON codec in use ("orjson" or "json")."""
+    return "orjson" if orjson is not None and os.environ.get("STORE_JSON") != "stdlib" else "json"
+
+
+def loads(data: bytes | str):
+    """Decode a JSON document with the configured codec."""
+    if json_codec() == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value) -> bytes:
+    """Encode a value as compact UTF-8 JSON with the configured codec."""
+    if json_codec() == "orjson":
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class RetryPolicy:
+    """Jittered exponential backoff with a per-call attempt cap and a shared sleep budget."""
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        budget: float = 300.0,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._budget = budget
+        self._lock = threading.Lock()
+
+    def should_retry(self, status: int, idempotent: bool) -> bool:
+        """Whether a response with this status may be retried."""
+        if status == 429:
+            return True
+        return idempotent and status in RETRY_STATUSES
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential delay for the given (1-based) attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def reserve(self, delay: float) -> bool:
+        """Take `delay` seconds from the shared budget. False when it would overrun."""
+        with self._lock:
+            if delay > self._budget:
+                return False
+            self._budget -= delay
+            return True
+
+
+DEFAULT_RETRY = RetryPolicy(
+    max_attempts=int(os.environ.get("STORE_RETRY_ATTEMPTS", "5")),
+    budget=float(os.environ.get("STORE_RETRY_BUDGET", "300")),
+)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    import email.utils  # HTTP-date form only; keeps the email package off the startup path
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class _Http2Response:
+    """Expose the subset of the requests.Response interface the scripts use."""
+
+    def __init__(self, resp):
+        self._resp = resp
+        self.status_code = resp.status_code
+        self.headers = resp.headers
+
+    @property
+    def ok(self) -> bool:
+        return self._resp.is_success
+
+    @property
+    def text(self) -> str:
+        return self._resp.text
+
+    @property
+    def content(self) -> bytes:
+        return self._resp.content
+
+    def json(self):
+        return loads(self._resp.content)
+
+    def raise_for_status(self) -> None:
+        self._resp.raise_for_status()
+
+
+class _RequestsResponse:
+    """requests.Response whose json() uses the configured JSON codec."""
+
+    def __init__(self, resp):
+        self._resp = resp
+
+    def __getattr__(self, name):
+        return getattr(self._resp, name)
+
+    def json(self):
+        return loads(self._resp.content)
+
+
+class _Http2Transport:
+    """HTTP/2 transport over httpx.Client with a requests-style request()."""
+
+    def __init__(self, httpx_module):
+        self._httpx = httpx_module
+        self._client = httpx_module.Client(
+            http2=True,
+            headers={"Accept-Encoding": ACCEPT_ENCODING},
+            limits=httpx_module.Limits(
+                max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE,
+            ),
+        )
+        self.transient_errors = (httpx_module.TransportError,)
+
+    def request(self, method: str, url: str, timeout=TIMEOUT, data=None, **kwargs):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = self._httpx.Timeout(read, connect=connect)
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            kwargs["content"] = bytes(data)
+        elif data is not None:
+            kwargs["data"] = data
+        return _Http2Response(self._client.request(method, url, timeout=timeout, **kwargs))
+
+
+class _RequestsTransport:
+    """Keep-alive requests.Session with a connection pool sized for worker threads."""
+
+    def __init__(self, requests_module):
+        self._session = requests_module.Session()
+        self._session.mount(
+            "https://", requests_module.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE),
+        )
+        self.transient_errors = (requests_module.ConnectionError, requests_module.Timeout)
+        self._session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+    def request(self, method: str, url: str, **kwargs):
+        return _RequestsResponse(self._session.request(method, url, **kwargs))
+
+
+def create_transport():
+    """Build the HTTP/2 transport when httpx[http2] is installed, else a pooled requests.Session."""
+    if os.environ.get("ASC_HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None:
+        try:
+            import httpx
+            return _Http2Transport(httpx)
+        except ImportError:
+            pass
+    return _RequestsTransport(deps.load("requests"))
+
+
+def _rejects_encoding(resp) -> bool:
+    """Whether a response refuses a request body's Content-Encoding (rather than its content)."""
+    if resp.status_code == 415:
+        return True
+    if resp.status_code != 400:
+        return False
+    try:
+        text = resp.text.lower()
+    except (AttributeError, UnicodeDecodeError):
+        return False
+    return "encoding" in text or "gzip" in text
+
+
+class StoreSession:
+    """requests.Session-like facade that retries calls under a RetryPolicy.
+
+    Subclasses can override before_request() / after_response() to add
+    per-host behaviour such as pacing; both run once per attempt.
+    """
+
+    def __init__(self, transport=None, retry: RetryPolicy = DEFAULT_RETRY, limiter: TokenBucket | None = None):
+        self._transport = transport or create_transport()
+        self._retry = retry
+        self.limiter = limiter
+        self.auth = None
+        self.compress_requests = os.environ.get("STORE_GZIP_REQUESTS", "1") != "0"
+
+    def auth_for(self, url: str):
+        """Return the auth provider to apply to `url`, or None."""
+        if self.auth is not None and self.auth.applies_to(url):
+            return self.auth
+        return None
+
+    def before_request(self, method: str, url: str) -> None:
+        """Hook called before every attempt; waits for the limiter when one is set."""
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+    def after_response(self, method: str, url: str, resp) -> None:
+        """Hook called after every attempt that produced a response."""
+
+    def _encode_json(self, kwargs: dict, compress: bool) -> bytes | None:
+        """Serialise a json= body into data=, gzipping it when allowed. Returns the plain body if gzipped."""
+        if "json" not in kwargs:
+            return None
+        body = dumps(kwargs.pop("json"))
+        headers = {**(kwargs.get("headers") or {}), "Content-Type": "application/json"}
+        plain = None
+        if compress and self.compress_requests and len(body) >= GZIP_MIN_BYTES:
+            plain, body = body, gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        kwargs["data"] = body
+        kwargs["headers"] = headers
+        return plain
+
+    def request(self, method: str, url: str, idempotent: bool | None = None, compress: bool = False, **kwargs):
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        plain_body = self._encode_json(kwargs, compress)
+        auth = self.auth_for(url)
+        reauthenticated = False
+        attempt = 0
+        while True:
+            attempt += 1
+            if auth is not None:
+                kwargs["headers"] = {**(kwargs.get("headers") or {}), "Authorization": auth.authorization()}
+            self.before_request(method, url)
+            try:
+                resp = self._transport.request(method, url, **kwargs)
+            except self._transport.transient_errors as exc:
+                if not idempotent or not self._wait(attempt, None, method, url, type(exc).__name__):
+                    raise
+                continue
+            resp.attempts = attempt
+            self.after_response(method, url, resp)
+            if resp.status_code == 401 and auth is not None and not reauthenticated:
+                auth.invalidate()
+                reauthenticated = True
+                continue
+            if plain_body is not None and _rejects_encoding(resp):
+                # The server may not accept compressed bodies: resend as is
+                self.compress_requests = False
+                kwargs["data"], plain_body = plain_body, None
+                kwargs["headers"] = {k: v for k, v in kwargs["headers"].items() if k != "Content-Encoding"}
+                continue
+            if not self._retry.should_retry(resp.status_code, idempotent):
+                return resp
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            if not self._wait(attempt, retry_after, method, url, f"HTTP {resp.status_code}"):
+                return resp
+
+    def _wait(self, attempt: int, retry_after: float | None, method: str, url: str, reason: str) -> bool:
+        """Sleep before the next attempt. False when attempts or budget are exhausted."""
+        if attempt >= self._retry.max_attempts:
+            return False
+        delay = retry_after if retry_after is not None else self._retry.backoff(attempt)
+        if not self._retry.reserve(delay):
+            return False
+        path = url.split("?", 1)[0]
+        print(
+            f"  Retrying {method} {path} after {reason} "
+            f"(attempt {attempt + 1}/{self._retry.max_attempts}, waiting {delay:.1f}s)",
+            file=sys.stderr,
+        )
+        time.sleep(delay)
+        return True
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+
+def get_session() -> StoreSession:
+    """Return the process-wide retrying session for non-ASC hosts (e.g. Google Play)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = StoreSession(limiter=TokenBucket(float(os.environ.get("STORE_MAX_RPS", "0"))))
+        return _session
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that runs every call in a copy of the submitting thread's context."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
@@ -0,0 +1,138 @@
+"""
+Lazy paginator shared by the App Store Connect and Google Play list calls.
+
+Paginator yields records as pages arrive instead of collecting the whole
+catalog first. While the caller consumes page N, page N+1 is already being
+fetched on a small worker pool, so network latency overlaps with
+processing. Iteration stops early (without fetching further pages) once
+max_records records have been yielded or the consumer stops iterating.
+
+Two continuation styles are supported:
+  - asc_next_page:    JSON:API `links.next`, a full URL with the query
+                      parameters already included (App Store Connect);
+  - google_next_page: `nextPageToken`, repeated as `pageToken` next to the
+                      original parameters (Android Publisher).
+
+Environment:
+  STORE_PREFETCH=0   fetch pages strictly one after another
+"""
+import os
+import threading
+from store_http import TIMEOUT, ContextThreadPoolExecutor
+
+PREFETCH_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def asc_next_page(body: dict, url: str, params: dict | None) -> tuple[str, dict | None] | None:
+    """Next request of an App Store Connect list, from `links.next`."""
+    next_url = (body.get("links") or {}).get("next")
+    return (next_url, None) if next_url else None
+
+
+def google_next_page(body: dict, url: str, params: dict | None) -> tuple[str, dict | None] | None:
+    """Next request of an Android Publisher list, from `nextPageToken`."""
+    token = body.get("nextPageToken")
+    return (url, {**(params or {}), "pageToken": token}) if token else None
+
+
+def prefetch_enabled() -> bool:
+    """Whether next pages are fetched in the background."""
+    return os.environ.get("STORE_PREFETCH", "1") != "0"
+
+
+def _prefetch_pool() -> ContextThreadPoolExecutor:
+    """Return the process-wide worker pool for page prefetches."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ContextThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="page-prefetch")
+        return _executor
+
+
+class Paginator:
+    """Iterable over the records of a paginated list endpoint.
+
+    Iterating yields records; iter_pages() yields whole response bodies
+    (e.g. to read JSON:API `included` resources). A failed page ends the
+    iteration: with raise_errors=True its HTTPError is raised, otherwise the
+    response is kept in `failed` for the caller to report. `complete` is
+    True only once every page was read.
+    """
+
+    def __init__(
+        self,
+        session,
+        url: str,
+        params: dict | None = None,
+        headers: dict | None = None,
+        records_key: str = "data",
+        next_page=asc_next_page,
+        max_records: int | None = None,
+        raise_errors: bool = False,
+        prefetch: bool | None = None,
+    ):
+        self._session = session
+        self._url = url
+        self._params = params
+        self._headers = headers
+        self._records_key = records_key
+        self._next_page = next_page
+        self.max_records = max_records
+        self.raise_errors = raise_errors
+        self.prefetch = prefetch_enabled() if prefetch is None else prefetch
+        self.failed = None
+        self.complete = False
+        self.pages = 0
+
+    def _fetch(self, url: str, params: dict | None):
+        """GET one page and decode it. Returns (response, body or None)."""
+        resp = self._session.get(url, headers=self._headers, params=params, timeout=TIMEOUT)
+        if not resp.ok:
+            return resp, None
+        return resp, (resp.json() if resp.text.strip() else {})
+
+    def iter_pages(self):
+        """Yield response bodies page by page, prefetching the next one."""
+        request = (self._url, self._params)
+        pending = None
+        fetched = 0
+        while request:
+            resp, body = pending.result() if pending else self._fetch(*request)
+            pending = None
+            if body is None:
+                self.failed = resp
+                if self.raise_errors:
+                    resp.raise_for_status()
+                return
+            self.pages += 1
+            fetched += len(body.get(self._records_key) or [])
+            request = self._next_page(body, *request)
+            capped = self.max_records is not None and fetched >= self.max_records
+            if request and self.prefetch and not capped:
+                pending = _prefetch_pool().submit(self._fetch, *request)
+            try:
+                yield body
+            except GeneratorExit:
+                if pending:
+                    pending.cancel()
+                raise
+            if request and capped:
+                return
+        self.complete = True
+
+    def __iter__(self):
+        remaining = self.max_records
+        for body in self.iter_pages():
+            for record in body.get(self._records_key) or []:
+                if remaining is not None and remaining <= 0:
+                    return
+                yield record
+                if remaining is not None:
+                    remaining -= 1
+
+    def all(self) -> list:
+        """Collect every record (up to max_records) into a list."""
+        return list(self)
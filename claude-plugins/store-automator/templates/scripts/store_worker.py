@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Optional warm worker for the store-automator scripts.
+
+Every CI step normally starts a cold interpreter that imports the HTTP and
+JWT stack, signs a token and looks the app up again. The worker is a
+long-lived process that runs whitelisted jobs -- the main() of the script
+behind each CI step -- and keeps what they build in memory between jobs:
+imported modules, pooled connections, auth providers and their tokens, app
+ID lookups and the reference-data cache.
+
+Jobs arrive over a Unix socket (mode 0600). The client sends its argv,
+environment and working directory; the worker runs the job with exactly
+that environment, streams stdout/stderr back and returns the exit status.
+Jobs run one at a time. Memoized lookups (app IDs, price point indexes,
+converted prices, file digests) are cleared before every job. Tuning
+variables are read once, at import time (TUNING_VARS), so a job whose
+values differ from the worker's is refused and runs directly instead. The
+per-run ASC quota/payload reports are printed when the worker exits
+instead of after each job.
+
+If the scripts change on disk the worker refuses the next job and exits.
+`run` exits with status 75 only when the worker never accepted the job, so
+callers can fall back to running the script directly without repeating a
+write (see ci/common/store-worker.sh). If the worker goes away after
+accepting a job, `run` exits with status 70 and the job is not retried:
+it may have created review submissions or prices already.
+
+Environment:
+  STORE_WORKER_SOCKET   socket path (default: per-user, per-scripts-dir
+                        path in the temp directory)
+
+Usage:
+  python3 store_worker.py start [--idle-timeout SECONDS]
+  python3 store_worker.py serve [--idle-timeout SECONDS]
+  python3 store_worker.py run <job> [-- args...]
+  python3 store_worker.py status | stop
+"""
+import argparse
+import contextlib
+import hashlib
+import importlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+# Job name -> module whose main() runs it
+JOBS = {
+    "ensure-app": "create_app_record",
+    "sync-iap-ios": "sync_iap_ios",
+    "sync-iap-android": "sync_iap_android",
+    "setup-app-info": "asc_app_setup",
+    "manage-version": "manage_version_ios",
+    "submit-for-review": "submit_for_review_ios",
+}
+
+# Imported lazily by the scripts (see deps.py); loaded up front by the worker
+PRELOAD_PACKAGES = ("requests", "jwt")
+
+# Environment variables read once at import time; a job must use the worker's values
+TUNING_VARS = (
+    "ASC_MAX_RPS", "ASC_CONCURRENCY", "ASC_PRICE_WORKERS", "ASC_HTTP2",
+    "STORE_MAX_RPS", "STORE_RETRY_ATTEMPTS", "STORE_RETRY_BUDGET", "STORE_JSON", "STORE_GZIP_REQUESTS",
+)
+
+# Module -> per-process memo dicts cleared before every job
+JOB_MEMOS = {
+    "asc_client": ("_app_ids",),
+    "asc_subscription_setup": ("_price_point_indexes",),
+    "gplay_iap_api": ("_converted_prices",),
+    "iap_fingerprints": ("_digests",),
+}
+
+# Exit status of `run` when no worker accepted the job (EX_TEMPFAIL)
+EXIT_UNAVAILABLE = 75
+# Exit status of `run` when the worker went away after accepting the job (EX_SOFTWARE)
+EXIT_WORKER_LOST = 70
+DEFAULT_IDLE_TIMEOUT = 1800
+START_TIMEOUT = 30
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def socket_path() -> str:
+    """Socket the worker listens on, honouring STORE_WORKER_SOCKET."""
+    configured = os.environ.get("STORE_WORKER_SOCKET")
+    if configured:
+        return configured
+    tag = hashlib.sha256(SCRIPTS_DIR.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"store-worker-{os.getuid()}-{tag}.sock")
+
+
+def _scripts_signature() -> int:
+    """Latest modification time of the scripts, to notice code changes."""
+    latest = 0
+    for name in os.listdir(SCRIPTS_DIR):
+        if name.endswith(".py"):
+            with contextlib.suppress(OSError):
+                latest = max(latest, os.stat(os.path.join(SCRIPTS_DIR, name)).st_mtime_ns)
+    return latest
+
+
+def _send(conn: socket.socket, message: dict) -> None:
+    conn.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def _messages(conn: socket.socket):
+    """Yield the newline-delimited JSON messages read from `conn`."""
+    with conn.makefile("rb") as stream:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _connect(path: str, timeout: float | None = None) -> socket.socket:
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.settimeout(timeout)
+    try:
+        conn.connect(path)
+    except OSError:
+        conn.close()
+        raise
+    conn.settimeout(None)
+    return conn
+
+
+def _request(path: str, message: dict) -> dict | None:
+    """Send a control message and return the reply, or None when no worker answers."""
+    try:
+        with _connect(path, timeout=5) as conn:
+            _send(conn, message)
+            return next(_messages(conn), None)
+    except (OSError, ValueError):
+        return None
+
+
+class _SocketStream:
+    """Text stream forwarding writes to the client as {"stream", "data"} messages.
+
+    Output is dropped once the client has gone away; the job keeps running.
+    """
+
+    encoding = "utf-8"
+    errors = "replace"
+
+    def __init__(self, conn: socket.socket, name: str, lock: threading.Lock):
+        self._conn = conn
+        self._name = name
+        self._lock = lock
+        self.closed_by_client = False
+
+    def write(self, text: str) -> int:
+        if text and not self.closed_by_client:
+            with self._lock:
+                try:
+                    _send(self._conn, {"stream": self._name, "data": text})
+                except OSError:
+                    self.closed_by_client = True
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+
+def _exit_status(code) -> int:
+    """Process exit status for a SystemExit code."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _tuning(env: dict) -> dict:
+    return {var: env.get(var) for var in TUNING_VARS}
+
+
+def _clear_memos() -> None:
+    """Drop the memoized lookups of the previous job."""
+    for module_name, names in JOB_MEMOS.items():
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        for name in names:
+            getattr(module, name).clear()
+
+
+def run_job(conn: socket.socket, job: str, request: dict) -> int:
+    """Run one job with the client's argv, environment and cwd. Returns its exit status."""
+    lock = threading.Lock()
+    saved_env, saved_cwd, saved_argv = dict(os.environ), os.getcwd(), sys.argv
+    os.environ.clear()
+    os.environ.update(request.get("env") or {})
+    try:
+        with contextlib.redirect_stdout(_SocketStream(conn, "stdout", lock)), \
+                contextlib.redirect_stderr(_SocketStream(conn, "stderr", lock)):
+            try:
+                os.chdir(request.get("cwd") or saved_cwd)
+                module = importlib.import_module(JOBS[job])
+                sys.argv = [module.__file__, *request.get("args", [])]
+                module.main()
+                return 0
+            except SystemExit as e:
+                return _exit_status(e.code)
+            except Exception:
+                traceback.print_exc()
+                return 1
+    finally:
+        sys.argv = saved_argv
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+
+
+class Worker:
+    """Accepts one connection at a time and runs its job."""
+
+    def __init__(self, path: str, idle_timeout: float):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.jobs_run = 0
+        self._signature = _scripts_signature()
+        self._tuning = _tuning(os.environ)
+
+    def _bind(self) -> socket.socket:
+        if os.path.exists(self.path):
+            if _request(self.path, {"command": "ping"}):
+                print(f"ERROR: A store worker is already listening on {self.path}", file=sys.stderr)
+                sys.exit(1)
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        server.listen(8)
+        server.settimeout(self.idle_timeout or None)
+        return server
+
+    def _preload(self) -> None:
+        """Import the job modules and the packages they load on first use, so the first job starts warm."""
+        for module in (*JOBS.values(), *PRELOAD_PACKAGES):
+            try:
+                importlib.import_module(module)
+            except (Exception, SystemExit) as e:
+                print(f"WARNING: Could not preload {module}: {e}", file=sys.stderr)
+
+    def serve(self) -> None:
+        """Serve jobs until stopped, idle for idle_timeout seconds, or the scripts change."""
+        server = self._bind()
+        try:
+            self._preload()
+            print(f"Store worker {os.getpid()} listening on {self.path}", file=sys.stderr)
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    print(f"Store worker idle for {self.idle_timeout:.0f}s, exiting", file=sys.stderr)
+                    return
+                with conn:
+                    if not self._handle(conn):
+                        return
+        finally:
+            server.close()
+            with contextlib.suppress(OSError):
+                os.unlink(self.path)
+
+    def _handle(self, conn: socket.socket) -> bool:
+        """Answer one request. Returns False when the worker should exit."""
+        conn.settimeout(None)
+        try:
+            request = next(_messages(conn), None) or {}
+        except (OSError, ValueError):
+            return True
+        command = request.get("command")
+        try:
+            if command == "ping":
+                _send(conn, {"pid": os.getpid(), "jobs_run": self.jobs_run, "jobs": sorted(JOBS)})
+                return True
+            if command == "stop":
+                _send(conn, {"stopping": True})
+                return False
+            if command != "run":
+                _send(conn, {"error": f"unknown command {command!r}"})
+                return True
+            job = request.get("job")
+            if job not in JOBS:
+                _send(conn, {"error": f"unknown job {job!r} (expected one of: {', '.join(sorted(JOBS))})"})
+                return True
+            if _scripts_signature() != self._signature:
+                _send(conn, {"unavailable": "scripts changed since the worker started"})
+                return False
+            changed = [var for var, value in _tuning(request.get("env") or {}).items() if value != self._tuning[var]]
+            if changed:
+                _send(conn, {"unavailable": f"{', '.join(changed)} differ from the worker's environment"})
+                return True
+            _clear_memos()
+            _send(conn, {"accepted": True})
+            started = time.monotonic()
+            status = run_job(conn, job, request)
+            self.jobs_run += 1
+            print(f"Job {job}: exit {status} in {time.monotonic() - started:.1f}s", file=sys.stderr)
+            _send(conn, {"exit": status})
+        except OSError:
+            pass
+        return True
+
+
+def run_client(path: str, job: str, args: list) -> int:
+    """Run `job` on the worker, relaying its output. Returns its exit status.
+
+    Returns 75 when no worker accepted the job and 70 when the worker went
+    away while running it.
+    """
+    try:
+        conn = _connect(path, timeout=5)
+    except OSError:
+        return EXIT_UNAVAILABLE
+    accepted = False
+    with conn:
+        try:
+            _send(conn, {"command": "run", "job": job, "args": args, "env": dict(os.environ), "cwd": os.getcwd()})
+            for message in _messages(conn):
+                if "accepted" in message:
+                    accepted = True
+                elif "stream" in message:
+                    stream = sys.stdout if message["stream"] == "stdout" else sys.stderr
+                    stream.write(message["data"])
+                    stream.flush()
+                elif "exit" in message:
+                    return message["exit"]
+                elif "unavailable" in message:
+                    print(f"Store worker unavailable: {message['unavailable']}", file=sys.stderr)
+                    return EXIT_UNAVAILABLE
+                elif "error" in message:
+                    print(f"ERROR: {message['error']}", file=sys.stderr)
+                    return 2
+        except (OSError, ValueError):
+            pass
+    if not accepted:
+        print("WARNING: Store worker closed the connection before accepting the job", file=sys.stderr)
+        return EXIT_UNAVAILABLE
+    # The job may already have written to the stores, so it must not be re-run blindly
+    print("ERROR: Store worker stopped before the job finished", file=sys.stderr)
+    return EXIT_WORKER_LOST
+
+
+def start_worker(path: str, idle_timeout: float) -> int:
+    """Start a detached worker unless one is running, and wait until it answers."""
+    if _request(path, {"command": "ping"}):
+        print(f"Store worker already running on {path}")
+        return 0
+    log_path = f"{path}.log"
+    with open(log_path, "ab") as log:
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "serve", "--idle-timeout", str(idle_timeout)],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            env={**os.environ, "STORE_WORKER_SOCKET": path}, start_new_session=True,
+        )
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        reply = _request(path, {"command": "ping"})
+        if reply:
+            print(f"Store worker {reply['pid']} running on {path} (log: {log_path})")
+            return 0
+        time.sleep(0.2)
+    print(f"ERROR: Store worker did not start within {START_TIMEOUT}s (see {log_path})", file=sys.stderr)
+    return 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Warm worker for the store-automator scripts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("start", "start a detached worker"), ("serve", "run the worker in the foreground")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument(
+            "--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+            help=f"exit after this many idle seconds, 0 to never (default: {DEFAULT_IDLE_TIMEOUT})",
+        )
+    run = sub.add_parser("run", help="run a job on the worker")
+    run.add_argument("job", choices=sorted(JOBS))
+    run.add_argument("args", nargs=argparse.REMAINDER)
+    sub.add_parser("status", help="show whether a worker is running")
+    sub.add_parser("stop", help="stop the running worker")
+    args = parser.parse_args()
+
+    path = socket_path()
+    if args.command == "serve":
+        Worker(path, args.idle_timeout).serve()
+    elif args.command == "start":
+        sys.exit(start_worker(path, args.idle_timeout))
+    elif args.command == "run":
+        job_args = args.args[1:] if args.args[:1] == ["--"] else args.args
+        sys.exit(run_client(path, args.job, job_args))
+    elif args.command == "status":
+        reply = _request(path, {"command": "ping"})
+        if not reply:
+            print(f"No store worker on {path}")
+            sys.exit(1)
+        print(f"Store worker {reply['pid']} on {path}: {reply['jobs_run']} job(s) run")
+    else:
+        reply = _request(path, {"command": "stop"})
+        print("Store worker stopped" if reply else f"No store worker on {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,122 +6,239 @@ Polls App Store Connect API waiting for a build to finish processing,
 attaches it to the version in PREPARE_FOR_SUBMISSION state, then submits
 for review using the Review Submissions API.
 
+Polling backs off per phase (build not listed yet, processing, near the
+expected finish) with jitter; the expected finish is learned from recent
+builds' processing times kept in .ci-state.
+
+With BUILD_WEBHOOK_PORT set, a local receiver for App Store Connect webhook
+notifications (see asc_webhook) is started first: the build is checked as
+soon as a build upload notification arrives, and the poll loop only takes
+over if none arrives within BUILD_WEBHOOK_TIMEOUT. The webhook wait and the
+poll loop share one MAX_POLL_DURATION budget.
+
 Required env vars:
   APP_STORE_CONNECT_KEY_IDENTIFIER  - Key ID from App Store Connect
   APP_STORE_CONNECT_ISSUER_ID       - Issuer ID from App Store Connect
   APP_STORE_CONNECT_PRIVATE_KEY     - Contents of the P8 key file
   BUNDLE_ID                         - App bundle identifier
+
+Optional env vars:
+  BUILD_POLL_WAITING / BUILD_POLL_PROCESSING / BUILD_POLL_NEAR
+                                    - Poll schedule of a phase as
+                                      "initial[,max[,factor]]" seconds
+  BUILD_WEBHOOK_PORT                - Listen for ASC webhook notifications on
+                                      this port instead of polling right away
+  BUILD_WEBHOOK_HOST                - Receiver bind address (default: 127.0.0.1)
+  BUILD_WEBHOOK_SECRET              - Webhook secret; unsigned requests are rejected
+  BUILD_WEBHOOK_TIMEOUT             - Seconds to wait for a notification before
+                                      falling back to polling (default: 1800)
 """
 import os
 import sys
 import time
+from datetime import datetime
 
-try:
-    import jwt
-    import requests
-except ImportError:
-    import subprocess
-    subprocess.check_call([
-        sys.executable, "-m", "pip", "install", "--break-system-packages",
-        "PyJWT", "cryptography", "requests"
-    ], stdout=subprocess.DEVNULL)
-    import jwt
-    import requests
-
-BASE_URL = "https://api.appstoreconnect.apple.com/v1"
-POLL_INTERVAL = 30
-MAX_POLL_DURATION = 2400
-
-
-def get_jwt_token(key_id, issuer_id, private_key):
-    payload = {
-        "iss": issuer_id,
-        "exp": int(time.time()) + 1200,
-        "aud": "appstoreconnect-v1",
-    }
-    return jwt.encode(payload, private_key, algorithm="ES256", headers={"kid": key_id})
+from adaptive_poll import DurationHistory, PhasedPoller, PollPhase, phase_from_env
+from asc_client import BASE_URL, TIMEOUT, auth_headers, get_app_id, get_session, print_api_errors, sparse_fields
+from asc_webhook import BUILD_UPLOAD_EVENT, WebhookReceiver
 
+MAX_POLL_DURATION = 2400
 
-def get_app_id(headers, bundle_id):
-    resp = requests.get(
-        f"{BASE_URL}/apps",
-        params={"filter[bundleId]": bundle_id},
-        headers=headers,
-        timeout=(10, 30),
-    )
-    resp.raise_for_status()
-    data = resp.json().get("data", [])
-    if not data:
-        print(f"ERROR: No app found for bundle ID {bundle_id}", file=sys.stderr)
-        sys.exit(1)
-    return data[0]["id"]
+# Poll schedule per phase: (initial, maximum, backoff factor) in seconds.
+# Override with BUILD_POLL_WAITING / BUILD_POLL_PROCESSING / BUILD_POLL_NEAR.
+DEFAULT_POLL_PHASES = {
+    "waiting": PollPhase(15, 60, 1.5),
+    "processing": PollPhase(30, 120, 1.5),
+    "near": PollPhase(5, 15, 1.3),
+}
+# Switch to the "near" phase this many seconds before the expected finish
+NEAR_WINDOW = 60
+# Longest processing-phase wait while no processing time has been learned
+NO_ESTIMATE_CAP = 30
+# Recent upload-to-VALID durations per app, in .ci-state
+HISTORY_FILE = "build-processing.json"
+DEFAULT_WEBHOOK_TIMEOUT = 1800
 
 
 def fail_on_error(resp, action):
-    try:
-        errors = resp.json().get("errors", [])
-        for err in errors:
-            detail = err.get("detail", err.get("title", "Unknown error"))
-            print(f"ERROR ({action}): {detail}", file=sys.stderr)
-    except (ValueError, KeyError):
-        print(f"ERROR ({action}): HTTP {resp.status_code}", file=sys.stderr)
+    print_api_errors(resp, action)
     sys.exit(1)
 
 
-def poll_build_processing(headers, app_id, version_string, key_id, issuer_id, private_key):
-    start = time.time()
-    last_token_time = start
+def _parse_timestamp(value):
+    """Epoch seconds of an ASC ISO 8601 timestamp, or None."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
 
-    while True:
-        elapsed = int(time.time() - start)
 
-        if time.time() - last_token_time > 900:
-            token = get_jwt_token(key_id, issuer_id, private_key)
-            headers["Authorization"] = f"Bearer {token}"
-            last_token_time = time.time()
+def _poll_phases():
+    return {
+        name: phase_from_env("BUILD_POLL", name, default)
+        for name, default in DEFAULT_POLL_PHASES.items()
+    }
 
-        resp = requests.get(
-            f"{BASE_URL}/builds",
-            params={
-                "filter[app]": app_id,
-                "filter[preReleaseVersion.version]": version_string,
-                "sort": "-uploadedDate",
-                "limit": 1,
-            },
-            headers=headers,
-            timeout=(10, 30),
-        )
-        resp.raise_for_status()
-        builds = resp.json().get("data", [])
 
-        if builds:
-            state = builds[0]["attributes"]["processingState"]
+def fetch_latest_build(headers, app_id, version_string):
+    resp = get_session().get(
+        f"{BASE_URL}/builds",
+        params={
+            "filter[app]": app_id,
+            "filter[preReleaseVersion.version]": version_string,
+            "sort": "-uploadedDate",
+            "limit": 1,
+            **sparse_fields({"builds": ["version", "uploadedDate", "processingState"]}),
+        },
+        headers=headers,
+        timeout=TIMEOUT,
+    )
+    resp.raise_for_status()
+    builds = resp.json().get("data", [])
+    return builds[0] if builds else None
+
+
+def poll_build_processing(headers, app_id, version_string, sleep=time.sleep, max_duration=MAX_POLL_DURATION):
+    """Wait until the latest build of the version is VALID and return it.
+
+    Polls in three phases: "waiting" until the build is listed, "processing"
+    while it is far from its expected finish, and "near" from NEAR_WINDOW
+    seconds before the finish expected from recent builds' processing times
+    (.ci-state/build-processing.json). Without history the processing phase
+    never waits longer than NO_ESTIMATE_CAP. Gives up after `max_duration`
+    seconds.
+    """
+    poller = PhasedPoller(_poll_phases(), max_duration, sleep=sleep)
+    history = DurationHistory(HISTORY_FILE, app_id)
+    estimate = history.estimate()
+    seen_at = None
+    uploaded_at = None
+    saw_processing = False
+    last_poll = None
+
+    while True:
+        elapsed = int(poller.elapsed)
+        build = fetch_latest_build(headers, app_id, version_string)
+        polled_at = time.time()
+
+        if build:
+            attrs = build["attributes"]
+            state = attrs["processingState"]
+            if seen_at is None:
+                seen_at = time.time()
+                uploaded_at = _parse_timestamp(attrs.get("uploadedDate")) or seen_at
             if state == "VALID":
                 print(f"  [{elapsed}s] Build processing complete.")
-                return builds[0]
+                if saw_processing:
+                    # It finished between the previous poll and this one
+                    history.record((last_poll + polled_at) / 2 - uploaded_at)
+                _report_poll_stats(poller, seen_at, uploaded_at, estimate)
+                return build
             if state in ("FAILED", "INVALID"):
                 print(f"ERROR: Build processing ended with state '{state}'.", file=sys.stderr)
                 sys.exit(1)
+            saw_processing = True
             print(f"  [{elapsed}s] Build processing... (state: {state})")
+            if estimate is None:
+                phase, cap = "processing", NO_ESTIMATE_CAP
+            else:
+                until_finish = uploaded_at + estimate - time.time()
+                if until_finish > NEAR_WINDOW:
+                    phase, cap = "processing", until_finish - NEAR_WINDOW
+                else:
+                    phase, cap = "near", None
         else:
             print(f"  [{elapsed}s] Waiting for build to appear...")
+            phase, cap = "waiting", None
 
-        if elapsed >= MAX_POLL_DURATION:
-            print(f"ERROR: Timed out after {MAX_POLL_DURATION}s waiting for build.", file=sys.stderr)
+        if poller.expired():
+            print(f"ERROR: Timed out after {poller.elapsed:.0f}s of polling for build.", file=sys.stderr)
+            _report_poll_stats(poller, seen_at, uploaded_at, estimate)
             sys.exit(1)
 
-        time.sleep(POLL_INTERVAL)
+        last_poll = polled_at
+        poller.wait(phase, cap)
+
+
+def _report_poll_stats(poller, seen_at, uploaded_at, estimate):
+    summary = f"Build poll: {poller.summary()}"
+    if seen_at is not None:
+        summary += f", processing {time.time() - uploaded_at:.0f}s since upload"
+    if estimate is not None:
+        summary += f" (expected {estimate:.0f}s)"
+    print(summary, file=sys.stderr)
+
+
+def wait_for_build_notification(receiver, headers, app_id, version_string, timeout):
+    """Check the build whenever a build upload notification arrives.
+
+    Returns the VALID build, or None if it is not ready within `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    build = fetch_latest_build(headers, app_id, version_string)
+    checks = 1
+    while not build or build["attributes"]["processingState"] not in ("VALID", "FAILED", "INVALID"):
+        event = receiver.next_event(deadline - time.monotonic())
+        if event is None:
+            print(
+                f"  No ready build after {timeout}s ({receiver.received} notification(s)), "
+                "falling back to polling.",
+            )
+            return None
+        if event["type"] != BUILD_UPLOAD_EVENT:
+            continue
+        print(f"  Build upload notification: state {event['state']}")
+        build = fetch_latest_build(headers, app_id, version_string)
+        checks += 1
+    state = build["attributes"]["processingState"]
+    if state != "VALID":
+        print(f"ERROR: Build processing ended with state '{state}'.", file=sys.stderr)
+        sys.exit(1)
+    print(
+        f"Build webhook: {receiver.received} notification(s), {checks} build check(s)",
+        file=sys.stderr,
+    )
+    return build
+
+
+def wait_for_build(headers, app_id, version_string):
+    """Wait for the processed build, event-driven when BUILD_WEBHOOK_PORT is set."""
+    port = os.environ.get("BUILD_WEBHOOK_PORT")
+    if not port:
+        return poll_build_processing(headers, app_id, version_string)
+    host = os.environ.get("BUILD_WEBHOOK_HOST", "127.0.0.1")
+    try:
+        receiver = WebhookReceiver(host, int(port), os.environ.get("BUILD_WEBHOOK_SECRET") or None)
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Webhook receiver unavailable ({e}), polling instead", file=sys.stderr)
+        return poll_build_processing(headers, app_id, version_string)
+    started = time.monotonic()
+    timeout = min(float(os.environ.get("BUILD_WEBHOOK_TIMEOUT") or DEFAULT_WEBHOOK_TIMEOUT), MAX_POLL_DURATION)
+    print(f"  Listening for build notifications on {host}:{receiver.port} (up to {timeout:.0f}s)")
+    try:
+        build = wait_for_build_notification(receiver, headers, app_id, version_string, timeout)
+        if build:
+            return build
+        # Poll for what is left of MAX_POLL_DURATION; late notifications still cut the waits short
+        remaining = max(0.0, MAX_POLL_DURATION - (time.monotonic() - started))
+        return poll_build_processing(
+            headers, app_id, version_string, sleep=receiver.sleep, max_duration=remaining,
+        )
+    finally:
+        receiver.close()
 
 
 def get_version_for_submission(headers, app_id):
-    resp = requests.get(
+    resp = get_session().get(
         f"{BASE_URL}/apps/{app_id}/appStoreVersions",
         params={
             "filter[appStoreState]": "PREPARE_FOR_SUBMISSION",
             "filter[platform]": "IOS",
+            "limit": 1,
+            **sparse_fields({"appStoreVersions": ["versionString"]}),
         },
         headers=headers,
-        timeout=(10, 30),
+        timeout=TIMEOUT,
     )
     resp.raise_for_status()
     versions = resp.json().get("data", [])
@@ -132,11 +249,11 @@ def get_version_for_submission(headers, app_id):
 
 
 def attach_build_to_version(headers, version_id, build_id):
-    resp = requests.patch(
+    resp = get_session().patch(
         f"{BASE_URL}/appStoreVersions/{version_id}/relationships/build",
         json={"data": {"type": "builds", "id": build_id}},
         headers=headers,
-        timeout=(10, 30),
+        timeout=TIMEOUT,
     )
     if not resp.ok:
         fail_on_error(resp, "attach build to version")
@@ -144,7 +261,7 @@ def attach_build_to_version(headers, version_id, build_id):
 
 
 def get_or_create_submission(headers, app_id):
-    create_resp = requests.post(
+    create_resp = get_session().post(
         f"{BASE_URL}/reviewSubmissions",
         json={
             "data": {
@@ -156,15 +273,20 @@ def get_or_create_submission(headers, app_id):
             }
         },
         headers=headers,
-        timeout=(10, 30),
+        timeout=TIMEOUT,
+        idempotent=True,
     )
 
     if create_resp.status_code == 409:
-        existing_resp = requests.get(
+        existing_resp = get_session().get(
             f"{BASE_URL}/apps/{app_id}/reviewSubmissions",
-            params={"filter[state]": "READY_FOR_REVIEW,WAITING_FOR_REVIEW"},
+            params={
+                "filter[state]": "READY_FOR_REVIEW,WAITING_FOR_REVIEW",
+                "limit": 1,
+                **sparse_fields({"reviewSubmissions": ["state"]}),
+            },
             headers=headers,
-            timeout=(10, 30),
+            timeout=TIMEOUT,
         )
         existing_resp.raise_for_status()
         submissions = existing_resp.json().get("data", [])
@@ -183,7 +305,7 @@ def submit_for_review(headers, app_id, version_id):
     submission_id = get_or_create_submission(headers, app_id)
     print(f"  Review submission ID: {submission_id}")
 
-    item_resp = requests.post(
+    item_resp = get_session().post(
         f"{BASE_URL}/reviewSubmissionItems",
         json={
             "data": {
@@ -199,12 +321,12 @@ def submit_for_review(headers, app_id, version_id):
             }
         },
         headers=headers,
-        timeout=(10, 30),
+        timeout=TIMEOUT,
     )
     if not item_resp.ok:
         fail_on_error(item_resp, "add review submission item")
 
-    submit_resp = requests.patch(
+    submit_resp = get_session().patch(
         f"{BASE_URL}/reviewSubmissions/{submission_id}",
         json={
             "data": {
@@ -214,7 +336,7 @@ def submit_for_review(headers, app_id, version_id):
             }
         },
         headers=headers,
-        timeout=(10, 30),
+        timeout=TIMEOUT,
     )
     if not submit_resp.ok:
         fail_on_error(submit_resp, "submit for review")
@@ -232,11 +354,7 @@ def main():
         print("ERROR: Missing required environment variables", file=sys.stderr)
         sys.exit(1)
 
-    token = get_jwt_token(key_id, issuer_id, private_key)
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
+    headers = auth_headers(key_id, issuer_id, private_key)
 
     app_id = get_app_id(headers, bundle_id)
     print(f"App ID: {app_id}")
@@ -247,7 +365,7 @@ def main():
     print(f"Version {version_string} (ID: {version_id})")
 
     print(f"Polling for processed build (version {version_string})...")
-    build = poll_build_processing(headers, app_id, version_string, key_id, issuer_id, private_key)
+    build = wait_for_build(headers, app_id, version_string)
     build_id = build["id"]
     build_version = build["attributes"]["version"]
     print(f"Build {build_version} (ID: {build_id})")
@@ -17,37 +17,68 @@ import os
 import sys
 
 from gplay_iap_api import (
-    activate_base_plan,
+    auth_headers,
+    batch_activate_base_plans,
+    batch_update_subscriptions,
+    batch_upsert_offers,
     build_price,
-    create_intro_offer,
-    create_subscription,
+    convert_region_prices,
     currency_to_region,
-    get_access_token,
     list_subscriptions,
     normalize_duration,
-    update_subscription,
 )
+from iap_fingerprints import FingerprintStore
 
+# Per-entity fingerprints of the last successful sync, in .ci-state
+FINGERPRINT_FILE = "android-iap-fingerprints.json"
 
-def _build_base_plan(sub_config: dict) -> dict:
-    """Build a base plan object from subscription config."""
+
+def _base_plan_id(product_id: str) -> str:
+    """Google Play base plan ID derived from a product ID."""
+    return product_id.replace(".", "-").replace("_", "-")
+
+
+def _base_price(sub_config: dict) -> tuple[str, str]:
+    """The (amount, currency) that regional prices are converted from (USD when configured)."""
+    prices = sub_config.get("prices", {})
+    if "USD" in prices or not prices:
+        return prices.get("USD", sub_config.get("price_tier", "0")), "USD"
+    currency = next(iter(prices))
+    return prices[currency], currency
+
+
+def _region_prices(sub_config: dict, converted: dict | None) -> dict:
+    """Regional prices for a base plan: converted prices overridden by explicitly configured ones."""
+    region_prices = dict(converted["regions"]) if converted else {}
+    for currency, amount in sub_config.get("prices", {}).items():
+        region = currency_to_region(currency)
+        if region:
+            region_prices[region] = build_price(amount, currency)
+    return region_prices
+
+
+def _build_base_plan(sub_config: dict, converted: dict | None = None) -> dict:
+    """Build a base plan object from subscription config.
+
+    `converted` is the convert_region_prices() result for the base price;
+    without it only the regions of explicitly configured currencies get a
+    price and the rest fall back to otherRegionsConfig.
+    """
     duration = normalize_duration(sub_config["duration"])
     prices = sub_config.get("prices", {})
+    other = converted.get("other", {}) if converted else {}
     usd_price = prices.get("USD", sub_config.get("price_tier", "0"))
     eur_price = prices.get("EUR", usd_price)
+    usd_money = build_price(usd_price, "USD") if "USD" in prices or not other else other["usdPrice"]
+    eur_money = build_price(eur_price, "EUR") if "EUR" in prices or not other else other["eurPrice"]
 
-    regional_configs = []
-    for currency, amount in prices.items():
-        region = currency_to_region(currency)
-        if region:
-            regional_configs.append({
-                "regionCode": region,
-                "newSubscriberAvailability": True,
-                "price": build_price(amount, currency),
-            })
+    regional_configs = [
+        {"regionCode": region, "newSubscriberAvailability": True, "price": money}
+        for region, money in sorted(_region_prices(sub_config, converted).items())
+    ]
 
     return {
-        "basePlanId": sub_config["product_id"].replace(".", "-").replace("_", "-"),
+        "basePlanId": _base_plan_id(sub_config["product_id"]),
         "autoRenewingBasePlanType": {
             "billingPeriodDuration": duration,
             "gracePeriodDuration": "P3D",
@@ -56,8 +87,8 @@ def _build_base_plan(sub_config: dict) -> dict:
         },
         "regionalConfigs": regional_configs,
         "otherRegionsConfig": {
-            "usdPrice": build_price(usd_price, "USD"),
-            "eurPrice": build_price(eur_price, "EUR"),
+            "usdPrice": usd_money,
+            "eurPrice": eur_money,
             "newSubscriberAvailability": True,
         },
     }
@@ -87,35 +118,48 @@ def _build_listings(sub_config: dict) -> list:
     return listings
 
 
-def _build_subscription_body(sub_config: dict, package_name: str) -> dict:
+def _build_subscription_body(sub_config: dict, package_name: str, converted: dict | None = None) -> dict:
     """Build the full subscription request body."""
     return {
         "packageName": package_name,
         "productId": sub_config["product_id"],
-        "basePlans": [_build_base_plan(sub_config)],
+        "basePlans": [_build_base_plan(sub_config, converted)],
         "listings": _build_listings(sub_config),
     }
 
 
-def _build_intro_offer_body(sub_config: dict) -> dict:
-    """Build the introductory offer request body from subscription config."""
+def _build_intro_offer_body(
+    sub_config: dict, converted: dict | None = None, converted_intro: dict | None = None,
+) -> dict:
+    """Build the introductory offer request body from subscription config.
+
+    `converted` / `converted_intro` are the convert_region_prices() results for
+    the base price and the (paid) intro price. With them the offer covers every
+    region of the base plan; without them only the US.
+    """
     intro = sub_config["introductory_offer"]
     offer_type = intro.get("type", "FREE")
     duration = normalize_duration(intro.get("duration", "P1W"))
 
     phases = [{"recurrenceCount": intro.get("periods", 1), "duration": duration}]
+    base_prices = _region_prices(sub_config, converted) if converted else {"US": build_price("0", "USD")}
+    regions = sorted(base_prices)
 
     if offer_type in ("FREE", "FREE_TRIAL"):
         phases[0]["regionalConfigs"] = [
-            {"regionCode": "US", "price": build_price("0", "USD")}
+            {"regionCode": region, "price": build_price("0", base_prices[region]["currencyCode"])}
+            for region in regions
         ]
     else:
         price = intro.get("price", "0")
+        intro_prices = dict(converted_intro["regions"]) if converted_intro else {}
+        intro_prices["US"] = build_price(price, "USD")
+        regions = [region for region in regions if region in intro_prices] or ["US"]
         phases[0]["regionalConfigs"] = [
-            {"regionCode": "US", "price": build_price(price, "USD")}
+            {"regionCode": region, "price": intro_prices[region]} for region in regions
         ]
 
-    offer_id = f"{sub_config['product_id'].replace('.', '-').replace('_', '-')}-intro"
+    offer_id = f"{_base_plan_id(sub_config['product_id'])}-intro"
     return {
         "offerId": offer_id,
         "phases": phases,
@@ -124,33 +168,102 @@ def _build_intro_offer_body(sub_config: dict) -> dict:
                 "scope": {"thisSubscription": {}}
             }
         },
-        "regionalConfigs": [{"regionCode": "US", "newSubscriberAvailability": True}],
+        "regionalConfigs": [
+            {"regionCode": region, "newSubscriberAvailability": True} for region in regions
+        ],
     }
 
 
-def sync_subscription(headers: dict, package_name: str, sub_config: dict, existing: dict) -> dict:
-    """Sync a single subscription: create if missing, update if exists."""
-    product_id = sub_config["product_id"]
-    print(f"\n  Processing subscription: {product_id}")
-    body = _build_subscription_body(sub_config, package_name)
-
-    if product_id in existing:
-        update_subscription(headers, package_name, product_id, body)
-        return {"product_id": product_id, "action": "updated"}
-
-    result = create_subscription(headers, package_name, product_id, body)
-    if not result:
-        return {"product_id": product_id, "action": "failed"}
-
-    base_plan_id = product_id.replace(".", "-").replace("_", "-")
-    activate_base_plan(headers, package_name, product_id, base_plan_id)
-
-    if sub_config.get("introductory_offer"):
-        offer_body = _build_intro_offer_body(sub_config)
-        offer_id = f"{product_id.replace('.', '-').replace('_', '-')}-intro"
-        create_intro_offer(headers, package_name, product_id, base_plan_id, offer_id, offer_body)
-
-    return {"product_id": product_id, "action": "created"}
+def _record_listings(fingerprints: FingerprintStore, product_id: str, listings: list) -> None:
+    """Remember the per-locale listings of a subscription as synced."""
+    for listing in listings:
+        fingerprints.record(f"sub:{product_id}:loc:{listing['languageCode']}", listing)
+    fingerprints.record(f"sub:{product_id}:locales", sorted(l["languageCode"] for l in listings))
+
+
+def _listings_unchanged(fingerprints: FingerprintStore, product_id: str, listings: list) -> bool:
+    """Whether no locale's listing changed since the last successful sync."""
+    changed = [
+        listing["languageCode"] for listing in listings
+        if not fingerprints.unchanged(f"sub:{product_id}:loc:{listing['languageCode']}", listing)
+    ]
+    same_locales = fingerprints.unchanged(
+        f"sub:{product_id}:locales", sorted(l["languageCode"] for l in listings),
+    )
+    if changed:
+        print(f"    {product_id}: changed locales: {', '.join(changed)}")
+    return not changed and same_locales
+
+
+def sync_subscriptions(
+    headers: dict, package_name: str, sub_configs: list, existing: dict, fingerprints: FingerprintStore,
+) -> list:
+    """Sync subscriptions with batch calls: create missing ones, update changed listings.
+
+    Existing subscriptions are skipped when no locale's listing changed since
+    the last successful sync. New subscriptions then get their base plans
+    activated and intro offers created, also in batches.
+    """
+    results: dict[str, str] = {}
+    conversions: dict[str, dict | None] = {}
+    bodies = []
+    for sub_config in sub_configs:
+        product_id = sub_config["product_id"]
+        if product_id in existing:
+            # Only listings are updated on existing subscriptions; prices are left alone
+            body = _build_subscription_body(sub_config, package_name)
+            if _listings_unchanged(fingerprints, product_id, body["listings"]):
+                print(f"    {product_id}: listings unchanged since last sync")
+                results[product_id] = "unchanged"
+                continue
+        else:
+            conversions[product_id] = convert_region_prices(
+                headers, package_name, *_base_price(sub_config),
+            )
+            body = _build_subscription_body(sub_config, package_name, conversions[product_id])
+        bodies.append(body)
+    if not bodies:
+        return [{"product_id": pid, "action": action} for pid, action in results.items()]
+
+    synced = batch_update_subscriptions(headers, package_name, bodies, existing)
+    created = [sc for sc in sub_configs if sc["product_id"] in synced and sc["product_id"] not in existing]
+
+    base_plans = [(sc["product_id"], _base_plan_id(sc["product_id"])) for sc in created]
+    activated = batch_activate_base_plans(headers, package_name, base_plans) if base_plans else set()
+
+    offers = []
+    for sc in created:
+        intro = sc.get("introductory_offer")
+        if intro:
+            converted = conversions.get(sc["product_id"])
+            converted_intro = None
+            if converted and intro.get("type", "FREE") not in ("FREE", "FREE_TRIAL"):
+                converted_intro = convert_region_prices(headers, package_name, intro.get("price", "0"), "USD")
+            offers.append({
+                "productId": sc["product_id"],
+                "basePlanId": _base_plan_id(sc["product_id"]),
+                **_build_intro_offer_body(sc, converted, converted_intro),
+            })
+    offered = batch_upsert_offers(headers, package_name, offers) if offers else set()
+    offered_products = {product_id for product_id, _, _ in offered}
+
+    for body in bodies:
+        product_id = body["productId"]
+        if product_id not in synced:
+            results[product_id] = "failed"
+            continue
+        if product_id in existing:
+            results[product_id] = "updated"
+            _record_listings(fingerprints, product_id, body["listings"])
+            continue
+        results[product_id] = "created"
+        has_offer = any(o["productId"] == product_id for o in offers)
+        if (product_id, _base_plan_id(product_id)) in activated and (
+            not has_offer or product_id in offered_products
+        ):
+            _record_listings(fingerprints, product_id, body["listings"])
+
+    return [{"product_id": sc["product_id"], "action": results[sc["product_id"]]} for sc in sub_configs]
 
 
 def validate_env() -> tuple:
@@ -184,6 +297,26 @@ def load_iap_config(config_path: str) -> dict:
     return config
 
 
+def sync_app(headers: dict, package_name: str, config: dict) -> list:
+    """Sync the subscriptions of every group in `config` for one package. Returns per-product results."""
+    print(f"Package: {package_name}")
+
+    existing = list_subscriptions(headers, package_name)
+    print(f"Found {len(existing)} existing subscription(s)")
+
+    fingerprints = FingerprintStore(FINGERPRINT_FILE, package_name)
+    sub_configs = []
+    for group in config.get("subscription_groups", []):
+        group_name = group.get("reference_name", group.get("group_name", "Unknown"))
+        subs = group.get("subscriptions", [])
+        print(f"Group {group_name}: {len(subs)} subscription(s)")
+        sub_configs.extend(subs)
+    try:
+        return sync_subscriptions(headers, package_name, sub_configs, existing, fingerprints)
+    finally:
+        fingerprints.save()
+
+
 def main() -> None:
     if len(sys.argv) < 2:
         print(f"Usage: {sys.argv[0]} <path/to/iap_config.json>", file=sys.stderr)
@@ -192,25 +325,10 @@ def main() -> None:
     config_path = sys.argv[1]
     sa_json, package_name = validate_env()
 
-    access_token = get_access_token(sa_json)
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-    }
+    headers = auth_headers(sa_json)
 
     config = load_iap_config(config_path)
-    print(f"Package: {package_name}")
-
-    existing = list_subscriptions(headers, package_name)
-    print(f"Found {len(existing)} existing subscription(s)")
-
-    results = []
-    for group in config.get("subscription_groups", []):
-        group_name = group.get("reference_name", group.get("group_name", "Unknown"))
-        print(f"\nProcessing group: {group_name}")
-        for sub_config in group.get("subscriptions", []):
-            result = sync_subscription(headers, package_name, sub_config, existing)
-            results.append(result)
+    results = sync_app(headers, package_name, config)
 
     print(f"\n{json.dumps({'synced_subscriptions': results}, indent=2)}")
 
@@ -15,47 +15,45 @@ Required env vars:
 Usage:
   python3 sync_iap_ios.py <path/to/iap_config.json>
 """
-import hashlib
+import asyncio
 import json
 import os
 import sys
-import time
-
-import requests
-
-from asc_iap_api import (
-    BASE_URL,
-    TIMEOUT,
-    create_group_localization,
-    create_localization,
-    create_subscription,
-    create_subscription_group,
-    get_app_id,
-    get_group_localizations,
-    get_jwt_token,
-    get_subscription_localizations,
-    list_subscription_groups,
-    list_subscriptions_in_group,
-    print_api_errors,
-    update_group_localization,
-    update_localization,
-)
+import threading
+from contextvars import ContextVar
+
+import asc_async
+from asc_client import BASE_URL, TIMEOUT, auth_headers, get_app_id, get_session, print_api_errors
+from asc_iap_api import create_subscription, create_subscription_group
+from asc_snapshot import AppSnapshot, load_snapshot
+from iap_fingerprints import AssetIndex, FingerprintStore, file_digest
 from asc_subscription_setup import (
     create_subscription_availability,
     create_subscription_price,
-    find_price_point_by_amount,
+    delete_review_screenshot,
     get_price_point_equalizations,
-    get_price_points_for_territory,
-    get_review_screenshot,
-    get_subscription_availability,
+    get_price_point_index,
     get_subscription_prices,
     list_all_territory_ids,
     upload_review_screenshot,
 )
-from asc_subscription_submit import (
-    create_group_submission,
-    create_review_submission,
-)
+from store_http import ContextThreadPoolExecutor
+
+# Parallel workers for per-territory price writes (paced by asc_client.rate_limiter),
+# shared by every subscription priced concurrently
+PRICE_WORKERS = max(1, int(os.environ.get("ASC_PRICE_WORKERS", "8")))
+
+# Per-entity fingerprints of the last successful sync, in .ci-state
+FINGERPRINT_FILE = "ios-iap-fingerprints.json"
+
+# Review screenshots uploaded per subscription (MD5 and asset ID), in .ci-state
+SCREENSHOT_INDEX_FILE = "ios-review-screenshots.json"
+
+# Subscription states in which an unchanged subscription needs no new review submission
+SUBMITTED_STATES = {"WAITING_FOR_REVIEW", "IN_REVIEW", "APPROVED"}
+
+# Touch values sent to make Apple re-evaluate a subscription's state
+TOUCH_ATTRIBUTES = {"reviewNote": "", "familySharable": False}
 
 CURRENCY_TO_TERRITORY = {
     "USD": "USA", "EUR": "FRA", "GBP": "GBR", "JPY": "JPN",
@@ -72,6 +70,48 @@ CURRENCY_TO_TERRITORY = {
 }
 
 
+class WriteStats:
+    """Thread-safe tally of mutating calls sent and of no-op writes skipped."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.skipped = 0
+
+    def record(self, sent: int = 0, skipped: int = 0) -> None:
+        with self._lock:
+            self.sent += sent
+            self.skipped += skipped
+
+
+write_stats = WriteStats()
+# Tally of the app being synced; sync_app() gives every app its own
+_app_write_stats: ContextVar[WriteStats] = ContextVar("write_stats", default=write_stats)
+
+
+def current_write_stats() -> WriteStats:
+    """Return the WriteStats of the app being synced in this context."""
+    return _app_write_stats.get()
+
+
+_price_executor = None
+_price_executor_lock = threading.Lock()
+
+
+def _price_pool() -> ContextThreadPoolExecutor:
+    """Return the process-wide worker pool for price writes."""
+    global _price_executor
+    with _price_executor_lock:
+        if _price_executor is None:
+            _price_executor = ContextThreadPoolExecutor(max_workers=PRICE_WORKERS, thread_name_prefix="asc-price")
+        return _price_executor
+
+
+def _differs(remote: dict, desired: dict) -> bool:
+    """Whether any desired attribute differs from the remote value (None and "" are equal)."""
+    return any((remote.get(key) or "") != (value or "") for key, value in desired.items())
+
+
 def find_or_create_group(headers: dict, app_id: str, reference_name: str, existing_groups: list) -> str:
     """Find an existing subscription group by reference name or create a new one."""
     for group in existing_groups:
@@ -93,89 +133,253 @@ def find_or_create_subscription(headers: dict, group_id: str, sub_config: dict,
     return create_subscription(headers, group_id, sub_config)
 
 
-def set_subscription_localization(headers: dict, sub_id: str, locale: str, loc_data: dict) -> None:
-    """Create or update a localization for a subscription."""
-    existing = get_subscription_localizations(headers, sub_id)
-    for loc in existing:
-        if loc["attributes"]["locale"] == locale:
-            update_localization(headers, loc["id"], loc_data)
-            return
-    create_localization(headers, sub_id, locale, loc_data)
+async def _apply_localization_writes(
+    writes: dict, total: int, fingerprints: FingerprintStore, key_prefix: str, localizations: dict,
+) -> int:
+    """Run the per-locale writes concurrently and record fingerprints of the locales now in sync."""
+    current_write_stats().record(sent=len(writes), skipped=total - len(writes))
+    results = dict(zip(writes, await asyncio.gather(*writes.values())))
+    for locale, loc_data in localizations.items():
+        if results.get(locale, True):
+            fingerprints.record(f"{key_prefix}:loc:{locale}", loc_data)
+    return len(writes)
+
+
+async def set_subscription_localizations(
+    headers: dict, sub_id: str, product_id: str, localizations: dict,
+    snapshot: AppSnapshot, fingerprints: FingerprintStore,
+) -> int:
+    """Create or update changed localizations for a subscription concurrently. Returns writes sent.
+
+    Locales whose config is unchanged since the last successful sync and that
+    still exist remotely are skipped without comparing attributes.
+    """
+    if not localizations:
+        return 0
+    existing_map = await asc_async.run_blocking(snapshot.subscription_localizations, headers, sub_id)
+    writes = {}
+    for locale, loc_data in localizations.items():
+        existing = existing_map.get(locale)
+        if existing is None:
+            writes[locale] = asc_async.create_localization(headers, sub_id, locale, loc_data)
+        elif fingerprints.unchanged(f"sub:{product_id}:loc:{locale}", loc_data):
+            continue
+        elif _differs(existing.get("attributes", {}), {
+            "name": loc_data.get("name", ""), "description": loc_data.get("description", ""),
+        }):
+            writes[locale] = asc_async.update_localization(headers, existing["id"], loc_data)
+    return await _apply_localization_writes(
+        writes, len(localizations), fingerprints, f"sub:{product_id}", localizations,
+    )
+
+
+async def set_group_localizations(
+    headers: dict, group_id: str, ref_name: str, localizations: dict,
+    snapshot: AppSnapshot, fingerprints: FingerprintStore,
+) -> int:
+    """Create or update changed localizations for a subscription group concurrently. Returns writes sent."""
+    if not localizations:
+        return 0
+    existing_map = await asc_async.run_blocking(snapshot.group_localizations, headers, group_id)
+    writes = {}
+    for locale, loc_data in localizations.items():
+        name = loc_data.get("name", "")
+        custom_name = loc_data.get("custom_name")
+        existing = existing_map.get(locale)
+        if existing is None:
+            writes[locale] = asc_async.create_group_localization(
+                headers, group_id, locale, name, custom_name,
+            )
+        elif fingerprints.unchanged(f"group:{ref_name}:loc:{locale}", loc_data):
+            continue
+        elif _differs(existing.get("attributes", {}), {"name": name, "customAppName": custom_name}):
+            writes[locale] = asc_async.update_group_localization(
+                headers, existing["id"], name, custom_name,
+            )
+    return await _apply_localization_writes(
+        writes, len(localizations), fingerprints, f"group:{ref_name}", localizations,
+    )
+
+
+def _subscription_fingerprint_source(sub_config: dict, project_root: str) -> dict:
+    """Config that drives availability, pricing and the review screenshot of a subscription."""
+    source = {k: v for k, v in sub_config.items() if k != "localizations"}
+    screenshot = sub_config.get("review_screenshot")
+    if screenshot:
+        source["review_screenshot_md5"] = file_digest(os.path.join(project_root, screenshot))
+    return source
+
+
+def schedule_subscription(
+    graph: asc_async.TaskGraph, prefix: str, group_node: str, headers: dict, sub_config: dict,
+    snapshot: AppSnapshot, fingerprints: FingerprintStore, screenshots: AssetIndex, project_root: str,
+) -> str:
+    """Add one subscription's sync steps to the task graph. Returns the name of its final node.
+
+    Localizations, availability, pricing and the review screenshot run
+    concurrently once the subscription exists; the touch PATCH and the
+    review submission run after all of them.
+    """
+    product_id = sub_config["product_id"]
+    setup_key = f"sub:{product_id}"
+    setup_source = _subscription_fingerprint_source(sub_config, project_root)
+
+    async def find():
+        group_id = graph.result(group_node)
+        sub_id = await asc_async.run_blocking(
+            find_or_create_subscription, headers, group_id, sub_config, snapshot.subscriptions(group_id),
+        )
+        remote = snapshot.subscription(sub_id)
+        setup_unchanged = bool(remote) and fingerprints.unchanged(setup_key, setup_source)
+        if setup_unchanged:
+            print(f"      {product_id}: availability, pricing and screenshot unchanged since last sync")
+        return {"id": sub_id, "remote": remote, "setup_unchanged": setup_unchanged}
+
+    found = graph.add(f"{prefix}:find", find, after=[group_node])
+
+    async def localizations():
+        return await set_subscription_localizations(
+            headers, graph.result(found)["id"], product_id,
+            sub_config.get("localizations", {}), snapshot, fingerprints,
+        )
+
+    def setup_step(step, *extra):
+        async def run():
+            sub = graph.result(found)
+            if sub["setup_unchanged"]:
+                return 0, True
+            return await asc_async.run_blocking(step, headers, sub["id"], sub_config, *extra)
+        return run
+
+    steps = [
+        graph.add(f"{prefix}:localizations", localizations, after=[found]),
+        graph.add(f"{prefix}:availability", setup_step(_sync_availability, snapshot), after=[found]),
+        graph.add(f"{prefix}:pricing", setup_step(_sync_pricing), after=[found]),
+        graph.add(
+            f"{prefix}:screenshot",
+            setup_step(_sync_review_screenshot, project_root, snapshot, screenshots),
+            after=[found],
+        ),
+    ]
+
+    async def submit():
+        sub = graph.result(found)
+        sub_id, remote = sub["id"], sub["remote"]
+        changes = 0 if remote else 1
+        changes += graph.result(steps[0])
+        if not sub["setup_unchanged"]:
+            setup_results = [graph.result(name) for name in steps[1:]]
+            changes += sum(writes for writes, _ in setup_results)
+            if all(ok for _, ok in setup_results):
+                fingerprints.record(setup_key, setup_source)
+            else:
+                fingerprints.forget(setup_key)
+
+        remote_attrs = remote.get("attributes", {}) if remote else {}
+        state = remote_attrs.get("state")
+        if changes or state == "MISSING_METADATA" or _differs(remote_attrs, TOUCH_ATTRIBUTES):
+            await asc_async.run_blocking(_touch_subscription, headers, sub_id)
+        else:
+            current_write_stats().record(skipped=1)
+        submitted = bool(changes) or state not in SUBMITTED_STATES
+        if submitted:
+            await asc_async.create_review_submission(headers, sub_id)
+            current_write_stats().record(sent=1)
+        else:
+            current_write_stats().record(skipped=1)
+        return {"product_id": product_id, "id": sub_id, "submitted": submitted}
+
+    return graph.add(f"{prefix}:submit", submit, after=steps)
+
 
+def schedule_subscription_group(
+    graph: asc_async.TaskGraph, prefix: str, headers: dict, app_id: str, group_config: dict,
+    snapshot: AppSnapshot, fingerprints: FingerprintStore, screenshots: AssetIndex, project_root: str,
+) -> str:
+    """Add a subscription group and its subscriptions to the task graph.
 
-def sync_subscription_group(
-    headers: dict, app_id: str, group_config: dict,
-    existing_groups: list, project_root: str,
-) -> dict:
-    """Sync a single subscription group and its subscriptions. Returns sync result."""
+    Returns the name of the group's final node, whose result is the group's
+    sync result. The group submission runs after every subscription has
+    been submitted.
+    """
     ref_name = group_config.get("reference_name", group_config.get("group_name", ""))
     if not ref_name:
         print("WARNING: Subscription group missing reference_name, skipping", file=sys.stderr)
-        return {"group": ref_name, "status": "skipped", "subscriptions": []}
-
-    print(f"\nProcessing subscription group: {ref_name}")
-    group_id = find_or_create_group(headers, app_id, ref_name, existing_groups)
-
-    # Sync group localizations
-    group_localizations = group_config.get("localizations", {})
-    if group_localizations:
-        existing_locs = get_group_localizations(headers, group_id)
-        existing_map = {loc["attributes"]["locale"]: loc for loc in existing_locs}
-
-        for locale, loc_data in group_localizations.items():
-            name = loc_data.get("name", "")
-            custom_name = loc_data.get("custom_name")
-
-            if locale in existing_map:
-                update_group_localization(
-                    headers, existing_map[locale]["id"], name, custom_name
-                )
-                print(f"    Updated group localization: {locale}")
-            else:
-                create_group_localization(
-                    headers, group_id, locale, name, custom_name
-                )
-                print(f"    Created group localization: {locale}")
-
-    existing_subs = list_subscriptions_in_group(headers, group_id)
-    sub_results = []
-
-    for sub_config in group_config.get("subscriptions", []):
-        sub_id = find_or_create_subscription(headers, group_id, sub_config, existing_subs)
-        for locale, loc_data in sub_config.get("localizations", {}).items():
-            set_subscription_localization(headers, sub_id, locale, loc_data)
-        _sync_availability(headers, sub_id, sub_config)
-        _sync_pricing(headers, sub_id, sub_config)
-        _sync_review_screenshot(headers, sub_id, sub_config, project_root)
-        # Patch subscription to trigger Apple's state re-evaluation
-        resp = requests.patch(
-            f"{BASE_URL}/subscriptions/{sub_id}",
-            json={"data": {
-                "type": "subscriptions", "id": sub_id,
-                "attributes": {"reviewNote": "", "familySharable": False},
-            }},
-            headers=headers,
-            timeout=TIMEOUT,
+
+        async def skipped():
+            return {"group": ref_name, "status": "skipped", "subscriptions": []}
+        return graph.add(f"{prefix}:result", skipped)
+
+    async def find():
+        print(f"\nProcessing subscription group: {ref_name}")
+        return await asc_async.run_blocking(
+            find_or_create_group, headers, app_id, ref_name, snapshot.groups,
+        )
+
+    group_node = graph.add(f"{prefix}:group", find)
+
+    async def localizations():
+        return await set_group_localizations(
+            headers, graph.result(group_node), ref_name,
+            group_config.get("localizations", {}), snapshot, fingerprints,
+        )
+
+    locs_node = graph.add(f"{prefix}:localizations", localizations, after=[group_node])
+    sub_nodes = [
+        schedule_subscription(
+            graph, f"{prefix}:sub[{index}]", group_node, headers, sub_config,
+            snapshot, fingerprints, screenshots, project_root,
         )
-        if not resp.ok:
-            print_api_errors(resp, f"touch subscription {sub_id}")
-        create_review_submission(headers, sub_id)
-        sub_results.append({"product_id": sub_config["product_id"], "id": sub_id})
+        for index, sub_config in enumerate(group_config.get("subscriptions", []))
+    ]
 
-    create_group_submission(headers, group_id)
-    return {"group": ref_name, "group_id": group_id, "subscriptions": sub_results}
+    async def submit():
+        group_id = graph.result(group_node)
+        subs = [graph.result(name) for name in sub_nodes]
+        if graph.result(locs_node) or not snapshot.has_group(group_id) or any(s["submitted"] for s in subs):
+            await asc_async.create_group_submission(headers, group_id)
+            current_write_stats().record(sent=1)
+        else:
+            current_write_stats().record(skipped=1)
+        return {
+            "group": ref_name,
+            "group_id": group_id,
+            "subscriptions": [{"product_id": s["product_id"], "id": s["id"]} for s in subs],
+        }
+
+    return graph.add(f"{prefix}:result", submit, after=[locs_node, *sub_nodes])
+
+
+def _touch_subscription(headers: dict, sub_id: str) -> None:
+    """Patch the subscription to trigger Apple's state re-evaluation."""
+    current_write_stats().record(sent=1)
+    resp = get_session().patch(
+        f"{BASE_URL}/subscriptions/{sub_id}",
+        json={"data": {
+            "type": "subscriptions", "id": sub_id,
+            "attributes": TOUCH_ATTRIBUTES,
+        }},
+        headers=headers,
+        timeout=TIMEOUT,
+    )
+    if not resp.ok:
+        print_api_errors(resp, f"touch subscription {sub_id}")
 
 
-def _sync_availability(headers: dict, sub_id: str, sub_config: dict) -> None:
+def _sync_availability(
+    headers: dict, sub_id: str, sub_config: dict, snapshot: AppSnapshot,
+) -> tuple[int, bool]:
     """Ensure subscription territory availability is configured with all territories.
 
     If availability already exists, it is left as-is (idempotent skip).
     Otherwise fetches all App Store territories and creates availability.
+    Returns (writes sent, succeeded).
     """
-    existing = get_subscription_availability(headers, sub_id)
+    existing = snapshot.availability(headers, sub_id)
     if existing:
         print("      Availability already configured")
-        return
+        current_write_stats().record(skipped=1)
+        return 0, True
 
     avail_config = sub_config.get("availability", {})
     available_in_new = avail_config.get("available_in_new_territories", True)
@@ -186,8 +390,9 @@ def _sync_availability(headers: dict, sub_id: str, sub_config: dict) -> None:
         territory_ids = list_all_territory_ids(headers)
         if not territory_ids:
             print("      WARNING: Could not fetch territories", file=sys.stderr)
-            return
+            return 0, False
 
+    current_write_stats().record(sent=1)
     result = create_subscription_availability(
         headers, sub_id, territory_ids, available_in_new=available_in_new,
     )
@@ -195,27 +400,30 @@ def _sync_availability(headers: dict, sub_id: str, sub_config: dict) -> None:
         print(f"      Availability set ({len(territory_ids)} territories)")
     else:
         print("      WARNING: Failed to configure availability", file=sys.stderr)
+    return 1, bool(result)
 
 
-def _sync_pricing(headers: dict, sub_id: str, sub_config: dict) -> None:
+def _sync_pricing(headers: dict, sub_id: str, sub_config: dict) -> tuple[int, bool]:
     """Set subscription prices for all territories using Apple's equalization.
 
     Finds the base price point (USD/USA), then uses the equalizations
     endpoint to get Apple-calculated prices for all other territories.
+    Returns (writes sent, succeeded).
     """
     prices = sub_config.get("prices", {})
     if not prices:
         print("      WARNING: No prices configured, skipping pricing", file=sys.stderr)
-        return
+        return 0, True
 
-    # Build set of territories that already have prices
+    # Map territories that already have prices to their latest price point
     existing_prices = get_subscription_prices(headers, sub_id)
-    priced_territories: set[str] = set()
+    existing_prices.sort(key=lambda ep: ep.get("attributes", {}).get("startDate") or "")
+    priced_territories: dict[str, str] = {}
     for ep in existing_prices:
         pp_rel = ep.get("relationships", {}).get("subscriptionPricePoint", {})
         pp_id = pp_rel.get("data", {}).get("id", "")
         if "_" in pp_id:
-            priced_territories.add(pp_id.rsplit("_", 1)[-1])
+            priced_territories[pp_id.rsplit("_", 1)[-1]] = pp_id
 
     # Use first configured currency as base (typically USD -> USA)
     base_currency = next(iter(prices))
@@ -223,55 +431,72 @@ def _sync_pricing(headers: dict, sub_id: str, sub_config: dict) -> None:
     base_territory = CURRENCY_TO_TERRITORY.get(base_currency)
     if not base_territory:
         print(f"      WARNING: Unknown base currency '{base_currency}'", file=sys.stderr)
-        return
+        return 0, True
 
     # Find the base price point
-    price_points = get_price_points_for_territory(headers, sub_id, base_territory)
-    base_point = find_price_point_by_amount(price_points, base_amount)
+    index = get_price_point_index(headers, sub_id, base_territory)
+    base_point = index.exact(base_amount)
     if not base_point:
-        sample = [pp.get("attributes", {}).get("customerPrice", "?") for pp in price_points[:5]]
+        nearest = index.nearest(base_amount)
+        hint = nearest.get("attributes", {}).get("customerPrice") if nearest else None
         print(
             f"      WARNING: No price point matching {base_amount} for {base_territory}"
-            f" (API returned {len(price_points)} points, first prices: {sample})",
+            f" (API returned {len(index)} points, nearest tier: {hint},"
+            f" first prices: {index.sample_prices()})",
             file=sys.stderr,
         )
-        return
+        return 0, False
 
     created, skipped, failed = _apply_equalized_prices(
         headers, sub_id, base_point, base_territory, base_amount, base_currency, priced_territories,
     )
     print(f"      Pricing: {created} set, {skipped} existed, {failed} failed")
+    current_write_stats().record(sent=created + failed, skipped=skipped)
+    return created + failed, failed == 0
 
 
 def _apply_equalized_prices(
     headers: dict, sub_id: str, base_point: dict,
     base_territory: str, base_amount: str, base_currency: str,
-    priced_territories: set[str],
+    priced_territories: dict[str, str],
 ) -> tuple[int, int, int]:
-    """Set base price then apply Apple-equalized prices for all territories."""
+    """Set base price then apply Apple-equalized prices for all territories.
+
+    `priced_territories` maps territories that already have a price to their
+    current price point ID; those are left untouched.
+    """
     created = 0
     skipped = 0
     failed = 0
 
-    # Always set base territory price to ensure it matches config.
-    # Apple's preserveCurrentPrice=False handles updates; if the price
-    # is already correct this is effectively a no-op re-confirmation.
-    result = create_subscription_price(headers, sub_id, base_point["id"], base_territory)
-    if result:
-        created += 1
-        print(f"      Set base price {base_amount} {base_currency} for {base_territory}")
+    # Set the base territory price unless it already uses the configured
+    # price point (preserveCurrentPrice=False makes the POST an update).
+    if priced_territories.get(base_territory) == base_point["id"]:
+        skipped += 1
     else:
-        failed += 1
-        print(f"      WARNING: Failed to set base price for {base_territory}", file=sys.stderr)
-        return created, skipped, failed
+        base_result = create_subscription_price(headers, sub_id, base_point["id"], base_territory)
+        if not base_result:
+            failed += 1
+            print(f"      WARNING: Failed to set base price for {base_territory}", file=sys.stderr)
+            return created, skipped, failed
+        if base_result.get("existing"):
+            skipped += 1
+        else:
+            created += 1
+            print(f"      Set base price {base_amount} {base_currency} for {base_territory}")
 
     # Get equalized prices for all other territories
     equalized = get_price_point_equalizations(headers, base_point["id"])
     if not equalized:
+        # Every other territory stays unpriced: fail the step so its fingerprint
+        # is not recorded and the next run prices them
         print("      WARNING: No equalizations returned", file=sys.stderr)
+        failed += 1
         return created, skipped, failed
 
-    # Set price for each equalized territory
+    # Collect territories still missing a price, then POST them from a worker
+    # pool; asc_client's token bucket paces the calls to ASC_MAX_RPS.
+    pending: list[tuple[str, str]] = []
     for eq_point in equalized:
         territory_id = eq_point.get("relationships", {}).get(
             "territory", {}
@@ -279,55 +504,81 @@ def _apply_equalized_prices(
         if not territory_id:
             failed += 1
             continue
-        if territory_id in priced_territories:
+        if territory_id in priced_territories or territory_id == base_territory:
             skipped += 1
             continue
-        result = create_subscription_price(headers, sub_id, eq_point["id"], territory_id)
-        if result:
-            created += 1
-        else:
+        pending.append((eq_point["id"], territory_id))
+
+    results = _price_pool().map(
+        lambda item: create_subscription_price(headers, sub_id, item[0], item[1]),
+        pending,
+    )
+    for result in results:
+        if not result:
             failed += 1
-        time.sleep(0.05)
+        elif result.get("existing"):
+            skipped += 1
+        else:
+            created += 1
 
     return created, skipped, failed
 
 
 def _sync_review_screenshot(
-    headers: dict, sub_id: str, sub_config: dict, project_root: str,
-) -> None:
+    headers: dict, sub_id: str, sub_config: dict, project_root: str, snapshot: AppSnapshot,
+    screenshots: AssetIndex,
+) -> tuple[int, bool]:
     """Upload a review screenshot for the subscription if configured.
 
     Falls back to the first iPhone screenshot from fastlane/screenshots/ios/en-US/
-    when the configured path does not exist.
+    when the configured path does not exist. The file's MD5 is checked against
+    the local screenshot index first (no remote lookup when it matches), then
+    against the remote screenshot's sourceFileChecksum; a screenshot whose
+    content changed is deleted and uploaded again. Returns (writes sent, succeeded).
     """
     screenshot_path = sub_config.get("review_screenshot")
     if not screenshot_path:
         print("      WARNING: No review_screenshot configured, skipping", file=sys.stderr)
-        return
+        return 0, True
 
     full_path = os.path.join(project_root, screenshot_path)
     if not os.path.isfile(full_path):
         full_path = _find_fallback_screenshot(project_root)
         if not full_path:
             print(f"      WARNING: Screenshot not found: {screenshot_path}", file=sys.stderr)
-            return
+            return 0, True
         print(f"      Using fallback screenshot: {os.path.basename(full_path)}")
 
-    existing = get_review_screenshot(headers, sub_id)
-    if existing:
-        print("      Review screenshot already uploaded")
-        return
-
-    with open(full_path, "rb") as f:
-        file_data = f.read()
+    md5 = file_digest(full_path)
+    if screenshots.matches(sub_id, md5):
+        print("      Review screenshot unchanged since last upload")
+        current_write_stats().record(skipped=1)
+        return 0, True
 
+    writes = 0
+    existing = snapshot.review_screenshot(headers, sub_id)
+    if existing:
+        if existing.get("attributes", {}).get("sourceFileChecksum") == md5:
+            print("      Review screenshot already uploaded")
+            screenshots.record(sub_id, md5, existing["id"])
+            current_write_stats().record(skipped=1)
+            return 0, True
+        print("      Review screenshot changed, replacing it")
+        current_write_stats().record(sent=1)
+        writes += 1
+        if not delete_review_screenshot(headers, existing["id"]):
+            return writes, False
+
+    current_write_stats().record(sent=1)
     file_name = os.path.basename(full_path)
-    md5_checksum = hashlib.md5(file_data).hexdigest()
-    result = upload_review_screenshot(headers, sub_id, file_name, file_data, md5_checksum)
+    result = upload_review_screenshot(headers, sub_id, full_path, md5)
     if result:
+        screenshots.record(sub_id, md5, result["id"])
         print(f"      Review screenshot uploaded: {file_name}")
     else:
+        screenshots.forget(sub_id)
         print("      WARNING: Failed to upload screenshot", file=sys.stderr)
+    return writes + 1, bool(result)
 
 
 def _find_fallback_screenshot(project_root: str) -> str | None:
@@ -345,6 +596,52 @@ def _find_fallback_screenshot(project_root: str) -> str | None:
     return None
 
 
+async def sync_all_groups(headers: dict, app_id: str, config: dict, project_root: str) -> list:
+    """Sync every configured subscription group concurrently. Returns the per-group results.
+
+    Groups, subscriptions and independent per-subscription steps run in
+    parallel through a TaskGraph, capped by ASC_CONCURRENCY calls in flight.
+    """
+    snapshot = await asc_async.run_blocking(load_snapshot, headers, app_id)
+    fingerprints = FingerprintStore(FINGERPRINT_FILE, app_id)
+    screenshots = AssetIndex(SCREENSHOT_INDEX_FILE)
+    graph = asc_async.TaskGraph()
+    result_nodes = [
+        schedule_subscription_group(
+            graph, f"group[{index}]", headers, app_id, group_config,
+            snapshot, fingerprints, screenshots, project_root,
+        )
+        for index, group_config in enumerate(config.get("subscription_groups", []))
+    ]
+    try:
+        results = await graph.run()
+    finally:
+        fingerprints.save()
+        screenshots.save()
+    print(f"Entities unchanged since last sync: {fingerprints.unchanged_count}", file=sys.stderr)
+    return [results[name] for name in result_nodes]
+
+
+def sync_app(headers: dict, bundle_id: str, config: dict, project_root: str) -> dict:
+    """Sync the subscription groups of one app.
+
+    Returns {"app_id", "synced_groups", "writes": {"sent", "skipped"}}; the
+    write counts cover this app only, so several apps can be synced
+    concurrently in one process. Raises asc_async.TaskGraphError when a
+    group or subscription failed, after the others finished syncing and the
+    fingerprints were saved.
+    """
+    stats = WriteStats()
+    token = _app_write_stats.set(stats)
+    try:
+        app_id = get_app_id(headers, bundle_id)
+        print(f"App ID: {app_id} (Bundle: {bundle_id})")
+        results = asyncio.run(sync_all_groups(headers, app_id, config, project_root))
+    finally:
+        _app_write_stats.reset(token)
+    return {"app_id": app_id, "synced_groups": results, "writes": {"sent": stats.sent, "skipped": stats.skipped}}
+
+
 def main() -> None:
     if len(sys.argv) < 2:
         print(f"Usage: {sys.argv[0]} <path/to/iap_config.json>", file=sys.stderr)
@@ -372,24 +669,19 @@ def main() -> None:
     if not config.get("subscription_groups"):
         print("WARNING: No subscription_groups found in config", file=sys.stderr)
 
-    token = get_jwt_token(key_id, issuer_id, private_key)
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
-
-    app_id = get_app_id(headers, bundle_id)
-    print(f"App ID: {app_id} (Bundle: {bundle_id})")
-
-    existing_groups = list_subscription_groups(headers, app_id)
-    results = []
-    for group_config in config.get("subscription_groups", []):
-        result = sync_subscription_group(
-            headers, app_id, group_config, existing_groups, project_root,
-        )
-        results.append(result)
+    headers = auth_headers(key_id, issuer_id, private_key)
+    try:
+        result = sync_app(headers, bundle_id, config, project_root)
+    except asc_async.TaskGraphError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    writes = result["writes"]
+    print(
+        f"\nWrites: {writes['sent']} sent, {writes['skipped']} skipped (already up to date)",
+        file=sys.stderr,
+    )
 
-    print(f"\n{json.dumps({'synced_groups': results}, indent=2)}")
+    print(f"\n{json.dumps({'synced_groups': result['synced_groups']}, indent=2)}")
 
 
 if __name__ == "__main__":
@@ -33,15 +33,7 @@ import os
 import sys
 from pathlib import Path
 
-
-def ensure_dependencies():
-    """Install required Python packages if not already present."""
-    import subprocess
-    subprocess.run(
-        ["pip3", "install", "--break-system-packages", "google-api-python-client", "google-auth"],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
+import deps
 
 
 def load_service_account_credentials(sa_json_path: str):
@@ -187,8 +179,8 @@ def validate_inputs():
 
 
 def main():
-    # --- Ensure dependencies are installed ---
-    ensure_dependencies()
+    # --- Check dependencies (installed by the workflow) ---
+    deps.check("googleapiclient", "google.oauth2")
 
     # --- Validate inputs ---
     sa_json_path, package_name, csv_path = validate_inputs()
@@ -0,0 +1,5 @@
+"""Make the template scripts importable as top-level modules, as CI runs them."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "templates", "scripts"))
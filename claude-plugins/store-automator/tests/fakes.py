@@ -0,0 +1,38 @@
+"""In-memory stand-ins for the HTTP transport and responses the scripts use."""
+import json
+
+
+class FakeResponse:
+    """The subset of the requests.Response interface StoreSession and the scripts read."""
+
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body if body is not None else {}
+        self.content = json.dumps(self._body).encode("utf-8")
+        self.text = self.content.decode("utf-8")
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeTransport:
+    """Returns queued responses in order and records every request made."""
+
+    transient_errors = (ConnectionError,)
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs))
+        return self.responses.pop(0)
@@ -0,0 +1,57 @@
+import pytest
+
+import adaptive_poll
+from adaptive_poll import DurationHistory, PhasedPoller, PollPhase, phase_from_env
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(adaptive_poll.random, "uniform", lambda low, high: 1.0)
+
+
+def test_phase_backs_off_up_to_its_maximum():
+    phase = PollPhase(10, 30, 2)
+    assert [phase.delay(n) for n in range(4)] == [10, 20, 30, 30]
+
+
+def test_phase_can_be_overridden_from_the_environment(monkeypatch, capsys):
+    default = PollPhase(30, 120, 1.5)
+    monkeypatch.setenv("BUILD_POLL_NEAR", "5,15")
+    near = phase_from_env("BUILD_POLL", "near", default)
+    assert (near.initial, near.maximum, near.factor) == (5, 15, 1.5)
+    monkeypatch.setenv("BUILD_POLL_NEAR", "soon")
+    assert phase_from_env("BUILD_POLL", "near", default) is default
+    assert "Ignoring invalid BUILD_POLL_NEAR" in capsys.readouterr().err
+
+
+def test_backoff_restarts_when_the_phase_changes(no_jitter):
+    slept = []
+    poller = PhasedPoller({"waiting": PollPhase(10, 40, 2), "near": PollPhase(5, 5)}, timeout=1000, sleep=slept.append)
+    for phase in ("waiting", "waiting", "waiting", "near", "waiting"):
+        poller.wait(phase)
+    assert slept == [10, 20, 40, 5, 10]
+    assert poller.polls == {"waiting": 4, "near": 1}
+    assert poller.slept == 85
+
+
+def test_waits_are_capped_and_never_pass_the_timeout(monkeypatch, no_jitter):
+    slept = []
+    poller = PhasedPoller({"processing": PollPhase(60, 60)}, timeout=100, sleep=slept.append)
+    poller.wait("processing", cap=20)
+    poller.wait("processing", cap=0)
+    monkeypatch.setattr(poller, "_start", poller._start - 95)
+    poller.wait("processing")
+    assert slept[:2] == [20, 1]
+    assert slept[2] == pytest.approx(5, abs=0.1)
+    assert not poller.expired()
+
+
+def test_history_keeps_the_recent_durations_per_scope(monkeypatch, tmp_path):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path))
+    history = DurationHistory("durations.json", "app-1", size=3)
+    assert history.estimate() is None
+    for seconds in (100, 400, 200, 300):
+        history.record(seconds)
+    assert history.samples == [400, 200, 300]
+    assert DurationHistory("durations.json", "app-1").estimate() == 300
+    assert DurationHistory("durations.json", "app-2").estimate() is None
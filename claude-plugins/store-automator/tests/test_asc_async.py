@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import asc_async
+
+
+def test_failed_node_skips_dependents_and_lets_siblings_finish():
+    graph = asc_async.TaskGraph()
+    finished = []
+
+    async def fail():
+        raise RuntimeError("create failed")
+
+    async def work(name):
+        await asyncio.sleep(0.01)
+        finished.append(name)
+        return name
+
+    graph.add("a:find", fail)
+    graph.add("a:submit", lambda: work("a:submit"), after=["a:find"])
+    graph.add("b:find", lambda: work("b:find"))
+    graph.add("b:submit", lambda: work("b:submit"), after=["b:find"])
+
+    with pytest.raises(asc_async.TaskGraphError) as excinfo:
+        asyncio.run(graph.run())
+
+    assert finished == ["b:find", "b:submit"]
+    assert list(excinfo.value.failures) == ["a:find"]
+    assert excinfo.value.skipped == {"a:submit"}
+
+
+def test_blocking_calls_are_capped_at_the_concurrency_limit(monkeypatch):
+    monkeypatch.setattr(asc_async, "_limit", 2)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def call():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+
+    async def main():
+        await asyncio.gather(*(asc_async.run_blocking(call) for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak[0] == 2
@@ -0,0 +1,137 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import asc_client
+import asc_iap_api
+from fakes import FakeResponse, FakeTransport
+from store_http import RetryPolicy
+
+
+@pytest.fixture
+def max_rps(monkeypatch):
+    monkeypatch.setattr(asc_client, "MAX_RPS", 20.0)
+
+
+@pytest.mark.parametrize("remaining, expected", [
+    (3600, 20.0),
+    (1800, 20.0),
+    (900, 10.0),
+    (360, 4.0),
+    (36, 0.4),
+])
+def test_pace_is_full_speed_down_to_half_the_quota_then_proportional(max_rps, remaining, expected):
+    assert asc_client._pace_for_quota(3600, remaining) == pytest.approx(expected)
+
+
+def test_pace_never_drops_below_the_floor(max_rps):
+    assert asc_client._pace_for_quota(3600, 0) == asc_client.MIN_RPS
+
+
+def test_pace_is_unchanged_when_pacing_is_disabled(monkeypatch):
+    monkeypatch.setattr(asc_client, "MAX_RPS", 0.0)
+    assert asc_client._pace_for_quota(3600, 10) == 0.0
+
+
+def test_concurrent_first_calls_share_one_session(monkeypatch):
+    created, registered = [], []
+
+    class SlowSession:
+        def __init__(self):
+            time.sleep(0.05)
+            created.append(self)
+
+    monkeypatch.setattr(asc_client, "_session", None)
+    monkeypatch.setattr(asc_client, "_AscSession", SlowSession)
+    monkeypatch.setattr(asc_client.atexit, "register", registered.append)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        sessions = list(pool.map(lambda _: asc_client.get_session(), range(8)))
+    assert len(created) == 1
+    assert all(session is created[0] for session in sessions)
+    assert len(registered) == 2
+
+
+@pytest.fixture
+def signer(monkeypatch, tmp_path):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path))
+    now = [1_000_000.0]
+    signed = []
+
+    def sign(key_id, issuer_id, private_key):
+        signed.append(now[0])
+        return f"token-{len(signed)}"
+
+    monkeypatch.setattr(asc_client.time, "time", lambda: now[0])
+    monkeypatch.setattr(asc_client, "get_jwt_token", sign)
+    return now, signed
+
+
+def test_token_is_reused_until_the_refresh_margin(signer):
+    now, signed = signer
+    auth = asc_client.AscAuth("KEY", "ISSUER", "PEM", use_cache=False)
+    assert auth.authorization() == "Bearer token-1"
+    now[0] += asc_client.TOKEN_LIFETIME - asc_client.TOKEN_REFRESH_MARGIN - 1
+    assert auth.authorization() == "Bearer token-1"
+    now[0] += 1
+    assert auth.authorization() == "Bearer token-2"
+    assert len(signed) == 2
+
+
+def test_cached_token_is_shared_only_with_the_same_key(signer):
+    now, signed = signer
+    assert asc_client.AscAuth("KEY", "ISSUER", "PEM", use_cache=True).authorization() == "Bearer token-1"
+    now[0] += 60
+    assert asc_client.AscAuth("KEY", "ISSUER", "PEM", use_cache=True).authorization() == "Bearer token-1"
+    assert asc_client.AscAuth("OTHER", "ISSUER", "PEM", use_cache=True).authorization() == "Bearer token-2"
+    assert len(signed) == 2
+
+
+def test_cached_token_near_expiry_is_not_reused(signer):
+    now, signed = signer
+    asc_client.AscAuth("KEY", "ISSUER", "PEM", use_cache=True).authorization()
+    now[0] += asc_client.TOKEN_LIFETIME - asc_client.TOKEN_REFRESH_MARGIN
+    assert asc_client.AscAuth("KEY", "ISSUER", "PEM", use_cache=True).authorization() == "Bearer token-2"
+
+
+def test_invalidate_forces_a_new_token(signer):
+    _, signed = signer
+    auth = asc_client.AscAuth("KEY", "ISSUER", "PEM", use_cache=True)
+    auth.authorization()
+    auth.invalidate()
+    assert auth.authorization() == "Bearer token-2"
+    assert asc_client.AscAuth("KEY", "ISSUER", "PEM", use_cache=True).authorization() == "Bearer token-2"
+
+
+def test_sparse_fields_become_fields_parameters():
+    assert asc_client.sparse_fields({"subscriptions": ["productId", "state"], "apps": ["bundleId"]}) == {
+        "fields[subscriptions]": "productId,state",
+        "fields[apps]": "bundleId",
+    }
+
+
+@pytest.mark.parametrize("url, expected", [
+    (f"{asc_client.BASE_URL}/apps", "apps"),
+    (f"{asc_client.BASE_URL}/apps/123/subscriptionGroups?limit=200", "apps/{id}/subscriptionGroups"),
+    (f"{asc_client.BASE_URL}/subscriptions/9/relationships/prices", "subscriptions/{id}/relationships/prices"),
+])
+def test_endpoint_template_hides_resource_ids(url, expected):
+    assert asc_client.endpoint_template(url) == expected
+
+
+def test_list_calls_request_only_the_fields_they_read(monkeypatch, capsys):
+    transport = FakeTransport([
+        FakeResponse(200, {"data": [{"id": "loc-1", "attributes": {"locale": "en-US"}}], "links": {}}),
+    ])
+    session = asc_client._AscSession(transport=transport, retry=RetryPolicy(max_attempts=1))
+    monkeypatch.setattr(asc_client, "_session", session)
+    monkeypatch.setattr(asc_client, "_payloads", {})
+    monkeypatch.setattr(asc_client, "_quota", {"limit": None, "remaining": None, "requests": 0})
+    monkeypatch.setenv("ASC_PAYLOAD_REPORT", "1")
+
+    assert [loc["id"] for loc in asc_iap_api.get_subscription_localizations({}, "sub-1")] == ["loc-1"]
+    params = transport.requests[0][2]["params"]
+    assert params["fields[subscriptionLocalizations]"] == ",".join(asc_iap_api.SUBSCRIPTION_LOCALIZATION_FIELDS)
+
+    asc_client.report_payloads()
+    assert "GET subscriptions/{id}/subscriptionLocalizations" in capsys.readouterr().err
@@ -0,0 +1,94 @@
+import asc_snapshot
+from asc_client import BASE_URL
+
+
+def _ref(kind, ident):
+    return {"type": kind, "id": ident}
+
+
+def _loc(kind, ident, locale):
+    return {**_ref(kind, ident), "attributes": {"locale": locale}}
+
+
+PAGES = {
+    f"{BASE_URL}/apps/app-1/subscriptionGroups": {
+        "data": [{
+            "id": "grp-1",
+            "relationships": {
+                "subscriptionGroupLocalizations": {"data": [_ref("subscriptionGroupLocalizations", "gl-1")]},
+            },
+        }],
+        "included": [_loc("subscriptionGroupLocalizations", "gl-1", "en-US")],
+    },
+    f"{BASE_URL}/subscriptionGroups/grp-1/subscriptions": {
+        "data": [
+            {
+                "id": "sub-1",
+                "relationships": {
+                    "subscriptionLocalizations": {"data": [_ref("subscriptionLocalizations", "sl-1")]},
+                    "subscriptionAvailability": {"data": None},
+                    "appStoreReviewScreenshot": {"data": _ref("subscriptionAppStoreReviewScreenshots", "shot-1")},
+                },
+            },
+            {
+                "id": "sub-2",
+                "relationships": {
+                    "subscriptionLocalizations": {
+                        "data": [_ref("subscriptionLocalizations", "sl-2")],
+                        "meta": {"paging": {"total": 60}},
+                    },
+                },
+            },
+        ],
+        "included": [
+            _loc("subscriptionLocalizations", "sl-1", "en-US"),
+            _loc("subscriptionLocalizations", "sl-2", "en-US"),
+            _ref("subscriptionAppStoreReviewScreenshots", "shot-1"),
+        ],
+    },
+}
+
+
+class _Pages:
+    def __init__(self, body):
+        self._body = body
+
+    def iter_pages(self):
+        yield self._body
+
+
+def test_snapshot_reads_included_resources_and_fetches_only_truncated_ones(monkeypatch, capsys):
+    listed, fetched = [], []
+
+    def paginate(headers, url, params, **kwargs):
+        listed.append(url)
+        return _Pages(PAGES[url])
+
+    monkeypatch.setattr(asc_snapshot, "paginate", paginate)
+
+    def fetch(kind):
+        def get(headers, ident):
+            fetched.append((kind, ident))
+            return [_loc("subscriptionLocalizations", f"{ident}-{n}", f"locale-{n}") for n in range(60)]
+        return get
+
+    monkeypatch.setattr(asc_snapshot, "get_subscription_localizations", fetch("localizations"))
+    for name in ("get_group_localizations", "get_subscription_availability", "get_review_screenshot"):
+        monkeypatch.setattr(asc_snapshot, name, fetch(name))
+
+    snapshot = asc_snapshot.load_snapshot({}, "app-1")
+
+    assert listed == list(PAGES)
+    assert [s["id"] for s in snapshot.subscriptions("grp-1")] == ["sub-1", "sub-2"]
+    assert list(snapshot.group_localizations({}, "grp-1")) == ["en-US"]
+    assert list(snapshot.subscription_localizations({}, "sub-1")) == ["en-US"]
+    assert snapshot.availability({}, "sub-1") is None
+    assert snapshot.review_screenshot({}, "sub-1")["id"] == "shot-1"
+    assert fetched == []
+
+    assert len(snapshot.subscription_localizations({}, "sub-2")) == 60
+    assert fetched == [("localizations", "sub-2")]
+    assert snapshot.subscription_localizations({}, "sub-new") == {}
+    assert snapshot.availability({}, "sub-new") is None
+    assert fetched == [("localizations", "sub-2")]
+    assert "1 group(s), 2 subscription(s)" in capsys.readouterr().out
@@ -0,0 +1,75 @@
+import pytest
+
+import asc_subscription_setup
+import store_http
+from fakes import FakeResponse, FakeTransport
+
+
+def _create_price(monkeypatch, responses):
+    session = store_http.StoreSession(
+        transport=FakeTransport(responses), retry=store_http.RetryPolicy(max_attempts=3, base_delay=0),
+    )
+    monkeypatch.setattr(asc_subscription_setup, "get_session", lambda: session)
+    return asc_subscription_setup.create_subscription_price({}, "sub", "pp_FRA", "FRA")
+
+
+def test_conflict_after_a_retried_price_post_means_it_exists(monkeypatch):
+    assert _create_price(monkeypatch, [FakeResponse(503), FakeResponse(409)]) == {"existing": True}
+
+
+def test_conflict_on_the_first_price_post_is_a_failure(monkeypatch):
+    assert _create_price(monkeypatch, [FakeResponse(409, {"errors": [{"detail": "conflict"}]})]) is None
+
+
+def test_empty_screenshot_is_rejected_before_reserving(monkeypatch, tmp_path):
+    screenshot = tmp_path / "shot.png"
+    screenshot.write_bytes(b"")
+    monkeypatch.setattr(asc_subscription_setup, "get_session", lambda: None)
+    assert asc_subscription_setup.upload_review_screenshot({}, "sub", str(screenshot)) is None
+
+
+def _points(*prices):
+    return [{"id": f"pp_{price}", "attributes": {"customerPrice": price}} for price in prices]
+
+
+def test_price_point_index_matches_exact_decimal_prices():
+    index = asc_subscription_setup.PricePointIndex(_points("0.99", "9.990", "69.99", "n/a"))
+    assert len(index) == 3
+    assert index.exact("9.99")["id"] == "pp_9.990"
+    assert index.exact(" 69.990 ")["id"] == "pp_69.99"
+    assert index.exact("9.98") is None
+    assert index.exact("abc") is None
+
+
+def test_price_point_index_suggests_the_nearest_tier():
+    index = asc_subscription_setup.PricePointIndex(_points("0.99", "1.99", "2.99"))
+    assert index.nearest("2.50")["id"] == "pp_2.99"
+    assert index.nearest("1.49")["id"] == "pp_0.99"
+    assert index.nearest("100")["id"] == "pp_2.99"
+    assert index.sample_prices(2) == ["0.99", "1.99"]
+    assert asc_subscription_setup.PricePointIndex([]).nearest("1") is None
+
+
+def test_screenshot_upload_commits_the_callers_digest(monkeypatch, tmp_path):
+    screenshot = tmp_path / "shot.png"
+    screenshot.write_bytes(b"x" * 10)
+    reservation = {"data": {"id": "shot", "attributes": {"uploadOperations": [
+        {"offset": 0, "length": 6, "url": "https://upload.test/0"},
+        {"offset": 6, "length": 4, "url": "https://upload.test/1"},
+    ]}}}
+    transport = FakeTransport([
+        FakeResponse(201, reservation),
+        FakeResponse(200),
+        FakeResponse(200),
+        FakeResponse(200, {"data": {"id": "shot"}}),
+    ])
+    session = store_http.StoreSession(transport=transport)
+    monkeypatch.setattr(asc_subscription_setup, "get_session", lambda: session)
+    monkeypatch.setattr(asc_subscription_setup, "file_digest", lambda path: pytest.fail("file hashed again"))
+
+    assert asc_subscription_setup.upload_review_screenshot({}, "sub", str(screenshot), "known-md5") == {"id": "shot"}
+    puts = sorted((url, kwargs["data"]) for method, url, kwargs in transport.requests if method == "PUT")
+    assert puts == [("https://upload.test/0", b"xxxxxx"), ("https://upload.test/1", b"xxxx")]
+    method, _, commit = transport.requests[-1]
+    assert method == "PATCH"
+    assert b"known-md5" in commit["data"]
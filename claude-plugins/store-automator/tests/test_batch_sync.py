@@ -0,0 +1,39 @@
+import io
+import sys
+import time
+
+import batch_sync
+import ci_state
+
+
+def _entry(app, tmp_path):
+    return {
+        "label": f"ios:{app}", "platform": "ios", "app": app, "iap_config": None,
+        "project_root": str(tmp_path / app), "create_app": {"app_name": app},
+    }
+
+
+def test_apps_run_concurrently_in_their_own_state_and_output(monkeypatch, tmp_path):
+    seen = {}
+
+    def ensure_app(headers, cfg):
+        time.sleep(0.02)
+        print(f"ensuring {cfg['bundle_id']}")
+        seen[cfg["bundle_id"]] = ci_state.state_dir()
+        if cfg["bundle_id"] == "com.b":
+            raise RuntimeError("boom")
+        return f"id-{cfg['bundle_id']}"
+
+    monkeypatch.setattr(batch_sync.create_app_record, "ensure_app", ensure_app)
+    out = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", batch_sync._PrefixedStream(out))
+    monkeypatch.setattr(sys, "stderr", batch_sync._PrefixedStream(io.StringIO()))
+
+    reports = batch_sync.run_all({"ios": {}}, [_entry("com.a", tmp_path), _entry("com.b", tmp_path)], jobs=2)
+
+    assert seen == {app: str(tmp_path / app / ".ci-state") for app in ("com.a", "com.b")}
+    assert [(r["app"], r["status"], r.get("app_id")) for r in reports] == [
+        ("ios:com.a", "ok", "id-com.a"), ("ios:com.b", "failed", None),
+    ]
+    assert reports[1]["error"] == "RuntimeError: boom"
+    assert sorted(out.getvalue().splitlines()) == ["[ios:com.a] ensuring com.a", "[ios:com.b] ensuring com.b"]
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import gplay_auth
+
+
+@pytest.fixture
+def exchanges(monkeypatch, tmp_path):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path))
+    now = [1_000_000.0]
+    issued = []
+
+    def exchange(provider):
+        issued.append(provider._sa["client_email"])
+        return f"token-{len(issued)}", now[0] + 3600
+
+    monkeypatch.setattr(gplay_auth.time, "time", lambda: now[0])
+    monkeypatch.setattr(gplay_auth.GoogleTokenProvider, "_exchange", exchange)
+    return now, issued
+
+
+def _service_account(tmp_path, email="ci@example.iam.gserviceaccount.com"):
+    path = tmp_path / f"{email}.json"
+    path.write_text(json.dumps({"client_email": email, "private_key_id": "k1", "private_key": "PEM"}))
+    return str(path)
+
+
+def test_token_is_reused_until_the_refresh_margin(exchanges, tmp_path):
+    now, issued = exchanges
+    provider = gplay_auth.GoogleTokenProvider(_service_account(tmp_path), use_cache=False)
+    assert provider.authorization() == "Bearer token-1"
+    now[0] += 3600 - gplay_auth.REFRESH_MARGIN - 1
+    assert provider.access_token() == "token-1"
+    now[0] += 1
+    assert provider.access_token() == "token-2"
+    assert len(issued) == 2
+
+
+def test_cached_token_is_shared_only_with_the_same_service_account(exchanges, tmp_path):
+    _, issued = exchanges
+    sa_path = _service_account(tmp_path)
+    assert gplay_auth.GoogleTokenProvider(sa_path, use_cache=True).access_token() == "token-1"
+    assert gplay_auth.GoogleTokenProvider(sa_path, use_cache=True).access_token() == "token-1"
+    other = gplay_auth.GoogleTokenProvider(_service_account(tmp_path, "other@example.com"), use_cache=True)
+    assert other.access_token() == "token-2"
+    assert len(issued) == 2
+
+
+def test_invalidate_drops_the_cached_token(exchanges, tmp_path):
+    sa_path = _service_account(tmp_path)
+    provider = gplay_auth.GoogleTokenProvider(sa_path, use_cache=True)
+    provider.access_token()
+    provider.invalidate()
+    assert gplay_auth.GoogleTokenProvider(sa_path, use_cache=True).access_token() == "token-2"
+
+
+def test_only_android_publisher_calls_are_authorized(tmp_path):
+    provider = gplay_auth.GoogleTokenProvider(_service_account(tmp_path), use_cache=False)
+    assert provider.applies_to("https://androidpublisher.googleapis.com/androidpublisher/v3/applications/x")
+    assert not provider.applies_to(gplay_auth.TOKEN_URL)
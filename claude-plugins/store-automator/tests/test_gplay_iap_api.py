@@ -0,0 +1,102 @@
+import pytest
+
+import gplay_iap_api
+import store_cache
+import store_http
+from fakes import FakeResponse, FakeTransport
+
+
+def _use_transport(monkeypatch, responses):
+    transport = FakeTransport(responses)
+    session = store_http.StoreSession(transport=transport, retry=store_http.RetryPolicy(max_attempts=1))
+    monkeypatch.setattr(gplay_iap_api, "get_session", lambda: session)
+    return transport
+
+
+def _offer(product_id):
+    return {"productId": product_id, "basePlanId": "monthly", "offerId": "trial", "phases": []}
+
+
+def test_offers_are_sent_in_one_batch(monkeypatch):
+    transport = _use_transport(monkeypatch, [FakeResponse(200)])
+    done = gplay_iap_api.batch_upsert_offers({}, "com.example", [_offer("a"), _offer("b")])
+    assert done == {("a", "monthly", "trial"), ("b", "monthly", "trial")}
+    assert len(transport.requests) == 1
+
+
+def test_failed_offer_batch_upserts_each_offer(monkeypatch):
+    transport = _use_transport(monkeypatch, [
+        FakeResponse(400, {"error": {"message": "bad offer"}}),
+        FakeResponse(200),
+        FakeResponse(400, {"error": {"message": "bad offer"}}),
+    ])
+    done = gplay_iap_api.batch_upsert_offers({}, "com.example", [_offer("a"), _offer("b")])
+    assert done == {("a", "monthly", "trial")}
+    fallback = transport.requests[1:]
+    assert [method for method, _, _ in fallback] == ["PATCH", "PATCH"]
+    assert fallback[0][1].endswith("/subscriptions/a/basePlans/monthly/offers/trial")
+    assert fallback[0][2]["params"]["allowMissing"] == "true"
+
+
+def test_failed_subscription_batch_creates_or_updates_each_item(monkeypatch):
+    transport = _use_transport(monkeypatch, [
+        FakeResponse(500, {"error": {"message": "backend error"}}),
+        FakeResponse(200, {"productId": "old"}),
+        FakeResponse(200, {"productId": "new"}),
+    ])
+    bodies = [{"productId": "old"}, {"productId": "new"}]
+    done = gplay_iap_api.batch_update_subscriptions({}, "com.example", bodies, existing_ids={"old"})
+    assert done == {"old", "new"}
+    assert [method for method, _, _ in transport.requests[1:]] == ["PATCH", "POST"]
+
+
+CONVERTED = {
+    "convertedRegionPrices": {
+        "FR": {"regionCode": "FR", "price": {"currencyCode": "EUR", "units": "9", "nanos": 490000000}},
+        "XX": {"regionCode": "XX"},
+    },
+    "convertedOtherRegionsPrice": {"usdPrice": {"currencyCode": "USD", "units": "9"}},
+}
+
+
+@pytest.fixture
+def region_price_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path))
+    monkeypatch.delenv("STORE_CACHE", raising=False)
+    monkeypatch.delenv("STORE_CACHE_REFRESH", raising=False)
+    monkeypatch.setattr(gplay_iap_api, "_converted_prices", {})
+    monkeypatch.setattr(store_cache, "_memory", {})
+    monkeypatch.setattr(store_cache, "_load_locks", {})
+    monkeypatch.setattr(store_cache, "_written_dirs", set())
+    monkeypatch.setattr(store_cache.atexit, "register", lambda func: None)
+
+
+def test_region_prices_are_converted_once_per_price(monkeypatch, region_price_cache):
+    transport = _use_transport(monkeypatch, [FakeResponse(200, CONVERTED)])
+    converted = gplay_iap_api.convert_region_prices({}, "com.example", "9.99")
+    assert converted == {
+        "regions": {"FR": {"currencyCode": "EUR", "units": "9", "nanos": 490000000}},
+        "other": {"usdPrice": {"currencyCode": "USD", "units": "9"}},
+    }
+    assert gplay_iap_api.convert_region_prices({}, "com.other", "9.990") == converted
+    assert len(transport.requests) == 1
+    assert transport.requests[0][1].endswith("/com.example/pricing:convertRegionPrices")
+
+
+def test_region_prices_are_reused_from_disk_by_later_runs(monkeypatch, region_price_cache):
+    _use_transport(monkeypatch, [FakeResponse(200, CONVERTED)])
+    converted = gplay_iap_api.convert_region_prices({}, "com.example", "9.99")
+    monkeypatch.setattr(gplay_iap_api, "_converted_prices", {})
+    monkeypatch.setattr(store_cache, "_memory", {})
+    transport = _use_transport(monkeypatch, [])
+    assert gplay_iap_api.convert_region_prices({}, "com.example", "9.99") == converted
+    assert transport.requests == []
+
+
+def test_failed_conversions_are_not_cached(monkeypatch, region_price_cache):
+    transport = _use_transport(monkeypatch, [
+        FakeResponse(400, {"error": {"message": "bad price"}}), FakeResponse(200, CONVERTED),
+    ])
+    assert gplay_iap_api.convert_region_prices({}, "com.example", "9.99") is None
+    assert gplay_iap_api.convert_region_prices({}, "com.example", "9.99")["regions"]
+    assert len(transport.requests) == 2
@@ -0,0 +1,58 @@
+import hashlib
+
+import pytest
+
+from iap_fingerprints import AssetIndex, FingerprintStore, file_digest
+
+
+@pytest.fixture(autouse=True)
+def state_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path))
+    monkeypatch.delenv("IAP_FULL_SYNC", raising=False)
+
+
+def test_recorded_fingerprints_survive_a_save_for_the_same_app():
+    store = FingerprintStore("fp.json", "app-1")
+    store.record("sub:pro", {"price": "9.99"})
+    store.save()
+    reloaded = FingerprintStore("fp.json", "app-1")
+    assert reloaded.unchanged("sub:pro", {"price": "9.99"})
+    assert not reloaded.unchanged("sub:pro", {"price": "4.99"})
+    assert reloaded.unchanged_count == 1
+
+
+def test_forgotten_entities_are_synced_again():
+    store = FingerprintStore("fp.json", "app-1")
+    store.record("sub:pro", {"price": "9.99"})
+    store.forget("sub:pro")
+    store.save()
+    assert not FingerprintStore("fp.json", "app-1").unchanged("sub:pro", {"price": "9.99"})
+
+
+def test_fingerprints_of_another_app_or_a_full_sync_are_ignored(monkeypatch):
+    store = FingerprintStore("fp.json", "app-1")
+    store.record("sub:pro", {"price": "9.99"})
+    store.save()
+    assert not FingerprintStore("fp.json", "app-2").unchanged("sub:pro", {"price": "9.99"})
+    monkeypatch.setenv("IAP_FULL_SYNC", "1")
+    assert not FingerprintStore("fp.json", "app-1").unchanged("sub:pro", {"price": "9.99"})
+
+
+def test_asset_index_matches_only_the_recorded_digest():
+    index = AssetIndex("assets.json")
+    index.record("sub-1", "abc", "shot-1")
+    index.save()
+    reloaded = AssetIndex("assets.json")
+    assert reloaded.matches("sub-1", "abc")
+    assert not reloaded.matches("sub-1", "def")
+    assert not reloaded.matches("sub-2", "abc")
+    assert not reloaded.matches("sub-1", None)
+    assert reloaded.asset_id("sub-1") == "shot-1"
+
+
+def test_file_digest_is_none_for_missing_files(tmp_path):
+    path = tmp_path / "shot.png"
+    path.write_bytes(b"png")
+    assert file_digest(str(path)) == hashlib.md5(b"png").hexdigest()
+    assert file_digest(str(tmp_path / "missing.png")) is None
+    assert file_digest(None) is None
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import ci_state
+import store_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.delenv("STORE_CACHE", raising=False)
+    monkeypatch.delenv("STORE_CACHE_REFRESH", raising=False)
+    monkeypatch.setattr(store_cache, "_memory", {})
+    monkeypatch.setattr(store_cache, "_load_locks", {})
+    monkeypatch.setattr(store_cache, "_written_dirs", set())
+    monkeypatch.setattr(store_cache.atexit, "register", lambda func: None)
+
+
+def _loader(calls, value, complete=True):
+    def load():
+        calls.append(value)
+        return value, complete
+    return load
+
+
+def test_complete_results_are_cached():
+    calls = []
+    assert store_cache.cached("territories", "/territories", None, 60, _loader(calls, ["USA"])) == ["USA"]
+    assert store_cache.cached("territories", "/territories", None, 60, _loader(calls, ["FRA"])) == ["USA"]
+    assert calls == [["USA"]]
+
+
+def test_incomplete_results_are_returned_but_not_cached():
+    calls = []
+    store_cache.cached("territories", "/territories", None, 60, _loader(calls, ["USA"], complete=False))
+    store_cache.cached("territories", "/territories", None, 60, _loader(calls, ["USA", "FRA"]))
+    assert calls == [["USA"], ["USA", "FRA"]]
+
+
+def test_expired_entries_are_reloaded(monkeypatch):
+    calls = []
+    now = [1000.0]
+    monkeypatch.setattr(store_cache.time, "time", lambda: now[0])
+    store_cache.cached("price_points", "/points", {"t": "USA"}, 60, _loader(calls, [1]))
+    now[0] += 61
+    assert store_cache.cached("price_points", "/points", {"t": "USA"}, 60, _loader(calls, [2])) == [2]
+    assert calls == [[1], [2]]
+
+
+def test_ttl_can_be_overridden_per_kind(monkeypatch):
+    monkeypatch.setenv("STORE_CACHE_TTL_TERRITORIES", "5")
+    assert store_cache.ttl_for("territories", 60) == 5
+    assert store_cache.ttl_for("price_points", 60) == 60
+
+
+def test_eviction_covers_every_project_written(monkeypatch, tmp_path):
+    monkeypatch.delenv("CI_STATE_DIR")
+    for app in ("a", "b"):
+        with ci_state.use_project_root(str(tmp_path / app)):
+            store_cache.put("territories", "old", "x" * 100)
+            store_cache.put("territories", "new", "y" * 100)
+            old = ci_state.state_path(store_cache._entry_name("territories", "old"))
+            os.utime(old, (1, 1))
+    assert store_cache.evict(max_bytes=150) == 2
+    for app in ("a", "b"):
+        assert os.listdir(tmp_path / app / ".ci-state" / "cache") == ["territories-new.json"]
@@ -0,0 +1,37 @@
+import ci_state
+import store_http
+from fakes import FakeResponse, FakeTransport
+
+
+def test_context_pool_runs_calls_in_the_submitters_context(tmp_path):
+    with store_http.ContextThreadPoolExecutor(max_workers=2) as pool:
+        with ci_state.use_project_root(str(tmp_path)):
+            submitted = pool.submit(ci_state.state_dir).result()
+            mapped = list(pool.map(lambda _: ci_state.state_dir(), range(3)))
+    assert submitted == str(tmp_path / ".ci-state")
+    assert mapped == [submitted] * 3
+
+
+def _session(responses):
+    transport = FakeTransport(responses)
+    return store_http.StoreSession(transport=transport, retry=store_http.RetryPolicy(base_delay=0)), transport
+
+
+def _large_body():
+    return {"data": {"attributes": {"description": "x" * (2 * store_http.GZIP_MIN_BYTES)}}}
+
+
+def test_validation_error_on_a_compressed_body_is_returned_as_is():
+    session, transport = _session([FakeResponse(400, {"errors": [{"detail": "name is too long"}]})])
+    resp = session.post("https://example.test/items", json=_large_body(), compress=True)
+    assert resp.status_code == 400
+    assert len(transport.requests) == 1
+    assert session.compress_requests
+
+
+def test_rejected_encoding_is_resent_uncompressed():
+    session, transport = _session([FakeResponse(415), FakeResponse(201)])
+    resp = session.post("https://example.test/items", json=_large_body(), compress=True)
+    assert resp.status_code == 201
+    assert [kwargs["headers"].get("Content-Encoding") for _, _, kwargs in transport.requests] == ["gzip", None]
+    assert not session.compress_requests
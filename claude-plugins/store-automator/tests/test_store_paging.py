@@ -0,0 +1,61 @@
+import pytest
+
+from fakes import FakeResponse, FakeTransport
+from store_paging import Paginator, google_next_page
+
+
+class _Session(FakeTransport):
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+def _page(ids, next_url=None):
+    return FakeResponse(200, {"data": [{"id": i} for i in ids], "links": {"next": next_url} if next_url else {}})
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_every_page_is_read_in_order(prefetch):
+    session = _Session([_page([1, 2], "https://api/p2"), _page([3], "https://api/p3"), _page([4])])
+    pager = Paginator(session, "https://api/p1", prefetch=prefetch)
+    assert [r["id"] for r in pager] == [1, 2, 3, 4]
+    assert [url for _, url, _ in session.requests] == ["https://api/p1", "https://api/p2", "https://api/p3"]
+    assert pager.complete and pager.pages == 3 and pager.failed is None
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_max_records_stops_before_fetching_further_pages(prefetch):
+    session = _Session([_page([1, 2], "https://api/p2"), _page([3, 4], "https://api/p3"), _page([5])])
+    pager = Paginator(session, "https://api/p1", max_records=3, prefetch=prefetch)
+    assert [r["id"] for r in pager] == [1, 2, 3]
+    assert len(session.requests) == 2
+    assert not pager.complete
+
+
+def test_failed_page_ends_the_iteration_and_is_kept():
+    error = FakeResponse(500, {"errors": [{"detail": "boom"}]})
+    session = _Session([_page([1], "https://api/p2"), error])
+    pager = Paginator(session, "https://api/p1", prefetch=False)
+    assert [r["id"] for r in pager] == [1]
+    assert pager.failed is error
+    assert not pager.complete
+
+
+def test_failed_page_is_raised_when_asked():
+    session = _Session([FakeResponse(404)])
+    with pytest.raises(RuntimeError, match="HTTP 404"):
+        Paginator(session, "https://api/p1", raise_errors=True).all()
+
+
+def test_google_pages_repeat_the_params_with_the_page_token():
+    session = _Session([
+        FakeResponse(200, {"products": [{"sku": "a"}], "nextPageToken": "t2"}),
+        FakeResponse(200, {"products": [{"sku": "b"}]}),
+    ])
+    pager = Paginator(
+        session, "https://play/products", {"pageSize": 1},
+        records_key="products", next_page=google_next_page, prefetch=False,
+    )
+    assert [r["sku"] for r in pager] == ["a", "b"]
+    assert [kwargs["params"] for _, _, kwargs in session.requests] == [
+        {"pageSize": 1}, {"pageSize": 1, "pageToken": "t2"},
+    ]
@@ -0,0 +1,75 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+
+import pytest
+
+import store_worker
+
+
+@pytest.fixture
+def worker_socket():
+    # Unix socket paths are limited to ~100 bytes, too short for pytest's tmp_path
+    with tempfile.TemporaryDirectory(prefix="sw-") as directory:
+        yield os.path.join(directory, "worker.sock")
+
+
+def _fake_worker(path, replies):
+    """Accept one job, send `replies` and hang up. Returns the thread and the received job."""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    received = []
+
+    def serve():
+        with server:
+            conn, _ = server.accept()
+            with conn:
+                received.append(json.loads(conn.makefile("rb").readline()))
+                for reply in replies:
+                    conn.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    return thread, received
+
+
+def _run(path, replies):
+    thread, received = _fake_worker(path, replies)
+    status = store_worker.run_client(path, "submit-for-review", ["--dry-run"])
+    thread.join()
+    return status, received
+
+
+def test_missing_worker_is_unavailable(worker_socket):
+    assert store_worker.run_client(worker_socket, "submit-for-review", []) == store_worker.EXIT_UNAVAILABLE
+
+
+def test_worker_hanging_up_before_accepting_is_unavailable(worker_socket, capsys):
+    status, received = _run(worker_socket, [])
+    assert status == store_worker.EXIT_UNAVAILABLE == 75
+    assert received[0]["job"] == "submit-for-review" and received[0]["args"] == ["--dry-run"]
+    assert "before accepting the job" in capsys.readouterr().err
+
+
+def test_busy_worker_is_unavailable(worker_socket):
+    status, _ = _run(worker_socket, [{"unavailable": "scripts changed"}])
+    assert status == store_worker.EXIT_UNAVAILABLE
+
+
+def test_worker_lost_after_accepting_is_not_retryable(worker_socket, capsys):
+    status, _ = _run(worker_socket, [{"accepted": True}, {"stream": "stdout", "data": "working\n"}])
+    assert status == store_worker.EXIT_WORKER_LOST == 70
+    out, err = capsys.readouterr()
+    assert out == "working\n"
+    assert "stopped before the job finished" in err
+
+
+def test_job_exit_status_is_relayed(worker_socket, capsys):
+    status, _ = _run(worker_socket, [
+        {"accepted": True}, {"stream": "stderr", "data": "warning\n"}, {"exit": 3},
+    ])
+    assert status == 3
+    assert capsys.readouterr().err == "warning\n"
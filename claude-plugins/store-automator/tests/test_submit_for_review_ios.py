@@ -0,0 +1,46 @@
+import pytest
+
+import submit_for_review_ios
+
+
+class _Receiver:
+    port = 0
+    received = 0
+
+    def __init__(self, host, port, secret):
+        pass
+
+    def next_event(self, timeout):
+        return None
+
+    def sleep(self, seconds):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_polling_after_the_webhook_gets_only_the_remaining_budget(monkeypatch):
+    ticks = [0.0, 1500.0]
+    budgets = []
+    monkeypatch.setenv("BUILD_WEBHOOK_PORT", "0")
+    monkeypatch.setenv("BUILD_WEBHOOK_TIMEOUT", "1500")
+    monkeypatch.setattr(submit_for_review_ios, "WebhookReceiver", _Receiver)
+    monkeypatch.setattr(submit_for_review_ios.time, "monotonic", lambda: ticks.pop(0) if len(ticks) > 1 else ticks[0])
+    monkeypatch.setattr(submit_for_review_ios, "wait_for_build_notification", lambda *args: None)
+    monkeypatch.setattr(
+        submit_for_review_ios, "poll_build_processing",
+        lambda *args, sleep, max_duration: budgets.append(max_duration) or {"id": "b"},
+    )
+
+    assert submit_for_review_ios.wait_for_build({}, "app", "1.0") == {"id": "b"}
+    assert budgets == [pytest.approx(submit_for_review_ios.MAX_POLL_DURATION - 1500)]
+
+
+def test_timeout_reports_the_time_actually_spent_polling(monkeypatch, tmp_path, capsys):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(submit_for_review_ios, "fetch_latest_build", lambda *args: None)
+    with pytest.raises(SystemExit):
+        submit_for_review_ios.poll_build_processing({}, "app", "1.0", sleep=lambda seconds: None, max_duration=0)
+    err = capsys.readouterr().err
+    assert "Timed out after 0s of polling" in err
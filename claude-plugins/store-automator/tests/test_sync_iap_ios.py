@@ -0,0 +1,254 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import sync_iap_ios
+from iap_fingerprints import AssetIndex, FingerprintStore, file_digest
+
+BASE_POINT = {"id": "pp_USA"}
+
+
+def _pricing(monkeypatch, equalized, posted):
+    def create_price(headers, sub_id, point_id, territory):
+        posted.append(territory)
+        return {"id": f"price-{territory}"}
+
+    monkeypatch.setattr(sync_iap_ios, "create_subscription_price", create_price)
+    monkeypatch.setattr(sync_iap_ios, "get_price_point_equalizations", lambda headers, point_id: equalized)
+    return sync_iap_ios._apply_equalized_prices({}, "sub", BASE_POINT, "USA", "9.99", "USD", {})
+
+
+def test_missing_equalizations_fail_the_pricing_step(monkeypatch):
+    posted = []
+    created, skipped, failed = _pricing(monkeypatch, [], posted)
+    assert posted == ["USA"]
+    assert (created, skipped, failed) == (1, 0, 1)
+
+
+def test_equalized_territories_are_priced(monkeypatch):
+    posted = []
+    equalized = [
+        {"id": f"pp_{t}", "relationships": {"territory": {"data": {"id": t}}}}
+        for t in ("USA", "FRA", "JPN")
+    ]
+    created, skipped, failed = _pricing(monkeypatch, equalized, posted)
+    assert sorted(posted) == ["FRA", "JPN", "USA"]
+    assert (created, skipped, failed) == (3, 1, 0)
+
+
+def test_prices_created_by_an_earlier_attempt_count_as_existing(monkeypatch):
+    equalized = [{"id": "pp_FRA", "relationships": {"territory": {"data": {"id": "FRA"}}}}]
+    monkeypatch.setattr(sync_iap_ios, "create_subscription_price", lambda *args: {"existing": True})
+    monkeypatch.setattr(sync_iap_ios, "get_price_point_equalizations", lambda headers, point_id: equalized)
+    created, skipped, failed = sync_iap_ios._apply_equalized_prices({}, "sub", BASE_POINT, "USA", "9.99", "USD", {})
+    assert (created, skipped, failed) == (0, 2, 0)
+
+
+def _equalized(territories):
+    return [{"id": f"pp_{t}", "relationships": {"territory": {"data": {"id": t}}}} for t in territories]
+
+
+def test_territory_prices_are_written_concurrently_and_failures_counted(monkeypatch):
+    territories = [f"T{n:02d}" for n in range(12)]
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def create_price(headers, sub_id, point_id, territory):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        return None if territory == "T05" else {"id": f"price-{territory}"}
+
+    monkeypatch.setattr(sync_iap_ios, "create_subscription_price", create_price)
+    monkeypatch.setattr(
+        sync_iap_ios, "get_price_point_equalizations", lambda headers, point_id: _equalized(territories),
+    )
+    priced = {"USA": "pp_USA", "T00": "pp_T00"}
+    created, skipped, failed = sync_iap_ios._apply_equalized_prices(
+        {}, "sub", BASE_POINT, "USA", "9.99", "USD", priced,
+    )
+    assert (created, skipped, failed) == (10, 2, 1)
+    assert 1 < in_flight[1] <= sync_iap_ios.PRICE_WORKERS
+
+
+class _Snapshot:
+    def __init__(self, localizations):
+        self._localizations = localizations
+
+    def subscription_localizations(self, headers, sub_id):
+        return self._localizations
+
+
+def _localization_writes(monkeypatch, calls, fail=()):
+    def fake(kind):
+        async def write(headers, target, *args):
+            calls.append((kind, target))
+            return target not in fail
+        return write
+
+    monkeypatch.setattr(sync_iap_ios.asc_async, "create_localization", fake("create"))
+    monkeypatch.setattr(sync_iap_ios.asc_async, "update_localization", fake("update"))
+
+
+def test_differs_treats_missing_and_empty_values_alike():
+    assert not sync_iap_ios._differs({"name": "Pro", "customAppName": None}, {"name": "Pro", "customAppName": ""})
+    assert sync_iap_ios._differs({"name": "Pro"}, {"name": "Pro+"})
+
+
+def test_only_changed_localizations_are_written(monkeypatch, tmp_path):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path))
+    calls = []
+    _localization_writes(monkeypatch, calls)
+    snapshot = _Snapshot({
+        "en-US": {"id": "loc-en", "attributes": {"name": "Pro", "description": "All features"}},
+        "de-DE": {"id": "loc-de", "attributes": {"name": "Pro", "description": "Alt"}},
+    })
+    localizations = {
+        "en-US": {"name": "Pro", "description": "All features"},
+        "de-DE": {"name": "Pro", "description": "Alle Funktionen"},
+        "fr-FR": {"name": "Pro", "description": "Toutes les fonctions"},
+    }
+    stats = sync_iap_ios.WriteStats()
+    token = sync_iap_ios._app_write_stats.set(stats)
+    try:
+        sent = asyncio.run(sync_iap_ios.set_subscription_localizations(
+            {}, "sub", "pro", localizations, snapshot, FingerprintStore("fp.json", "app"),
+        ))
+    finally:
+        sync_iap_ios._app_write_stats.reset(token)
+    assert sent == 2
+    assert sorted(calls) == [("create", "sub"), ("update", "loc-de")]
+    assert (stats.sent, stats.skipped) == (2, 1)
+
+
+def test_failed_localization_writes_are_not_fingerprinted(monkeypatch, tmp_path):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path))
+    calls = []
+    _localization_writes(monkeypatch, calls, fail={"loc-de"})
+    snapshot = _Snapshot({
+        "en-US": {"id": "loc-en", "attributes": {"name": "Old"}},
+        "de-DE": {"id": "loc-de", "attributes": {"name": "Alt"}},
+    })
+    localizations = {"en-US": {"name": "New"}, "de-DE": {"name": "Neu"}}
+    fingerprints = FingerprintStore("fp.json", "app")
+    asyncio.run(sync_iap_ios.set_subscription_localizations({}, "sub", "pro", localizations, snapshot, fingerprints))
+    assert fingerprints.unchanged("sub:pro:loc:en-US", localizations["en-US"])
+    assert not fingerprints.unchanged("sub:pro:loc:de-DE", localizations["de-DE"])
+
+    calls.clear()
+    asyncio.run(sync_iap_ios.set_subscription_localizations({}, "sub", "pro", localizations, snapshot, fingerprints))
+    assert calls == [("update", "loc-de")]
+
+
+SUBSCRIPTION = {"product_id": "pro", "price": "9.99"}
+
+
+class _SubscriptionSnapshot:
+    def subscriptions(self, group_id):
+        return []
+
+    def subscription(self, sub_id):
+        return {"id": sub_id, "attributes": {"state": "APPROVED"}}
+
+
+def _sync_subscription(monkeypatch, fingerprints, pricing_ok):
+    async def review_submission(headers, sub_id):
+        return {}
+
+    monkeypatch.setattr(sync_iap_ios, "find_or_create_subscription", lambda *args: "sub-1")
+    monkeypatch.setattr(sync_iap_ios, "_sync_availability", lambda *args: (1, True))
+    monkeypatch.setattr(sync_iap_ios, "_sync_pricing", lambda *args: (1, pricing_ok))
+    monkeypatch.setattr(sync_iap_ios, "_sync_review_screenshot", lambda *args: (0, True))
+    monkeypatch.setattr(sync_iap_ios, "_touch_subscription", lambda *args: None)
+    monkeypatch.setattr(sync_iap_ios.asc_async, "create_review_submission", review_submission)
+
+    async def run():
+        graph = sync_iap_ios.asc_async.TaskGraph()
+
+        async def group():
+            return "group-1"
+
+        group_node = graph.add("group", group)
+        sync_iap_ios.schedule_subscription(
+            graph, "pro", group_node, {}, SUBSCRIPTION, _SubscriptionSnapshot(), fingerprints, None, ".",
+        )
+        return await graph.run()
+
+    return asyncio.run(run())
+
+
+def test_subscription_setup_is_fingerprinted_only_when_every_step_succeeds(monkeypatch, tmp_path):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path))
+    fingerprints = FingerprintStore("fp.json", "app")
+    source = sync_iap_ios._subscription_fingerprint_source(SUBSCRIPTION, ".")
+
+    _sync_subscription(monkeypatch, fingerprints, pricing_ok=False)
+    assert not fingerprints.unchanged("sub:pro", source)
+
+    _sync_subscription(monkeypatch, fingerprints, pricing_ok=True)
+    assert fingerprints.unchanged("sub:pro", source)
+
+    fingerprints.record("sub:pro", {"price": "4.99"})
+    _sync_subscription(monkeypatch, fingerprints, pricing_ok=False)
+    assert not fingerprints.unchanged("sub:pro", source)
+    assert not fingerprints.unchanged("sub:pro", {"price": "4.99"})
+
+
+class _ScreenshotSnapshot:
+    def __init__(self, existing=None):
+        self.existing = existing
+        self.lookups = 0
+
+    def review_screenshot(self, headers, sub_id):
+        self.lookups += 1
+        return self.existing
+
+
+@pytest.fixture
+def screenshot(monkeypatch, tmp_path):
+    monkeypatch.setenv("CI_STATE_DIR", str(tmp_path))
+    monkeypatch.delenv("IAP_FULL_SYNC", raising=False)
+    (tmp_path / "shot.png").write_bytes(b"png")
+    return {"review_screenshot": "shot.png"}, str(tmp_path), file_digest(str(tmp_path / "shot.png"))
+
+
+def test_indexed_screenshot_is_not_looked_up_or_uploaded(monkeypatch, screenshot):
+    sub_config, root, md5 = screenshot
+    index = AssetIndex("assets.json")
+    index.record("sub-1", md5, "shot-1")
+    snapshot = _ScreenshotSnapshot()
+    monkeypatch.setattr(sync_iap_ios, "upload_review_screenshot", lambda *args: pytest.fail("uploaded"))
+    assert sync_iap_ios._sync_review_screenshot({}, "sub-1", sub_config, root, snapshot, index) == (0, True)
+    assert snapshot.lookups == 0
+
+
+def test_remote_screenshot_with_the_same_checksum_is_indexed(monkeypatch, screenshot):
+    sub_config, root, md5 = screenshot
+    index = AssetIndex("assets.json")
+    snapshot = _ScreenshotSnapshot({"id": "shot-1", "attributes": {"sourceFileChecksum": md5}})
+    monkeypatch.setattr(sync_iap_ios, "upload_review_screenshot", lambda *args: pytest.fail("uploaded"))
+    assert sync_iap_ios._sync_review_screenshot({}, "sub-1", sub_config, root, snapshot, index) == (0, True)
+    assert index.asset_id("sub-1") == "shot-1"
+
+
+def test_changed_screenshot_is_replaced_and_forgotten_when_the_upload_fails(monkeypatch, screenshot):
+    sub_config, root, md5 = screenshot
+    index = AssetIndex("assets.json")
+    index.record("sub-1", "old", "shot-1")
+    snapshot = _ScreenshotSnapshot({"id": "shot-1", "attributes": {"sourceFileChecksum": "old"}})
+    deleted = []
+
+    def delete(headers, shot_id):
+        deleted.append(shot_id)
+        return True
+
+    monkeypatch.setattr(sync_iap_ios, "delete_review_screenshot", delete)
+    monkeypatch.setattr(sync_iap_ios, "upload_review_screenshot", lambda *args: None)
+    assert sync_iap_ios._sync_review_screenshot({}, "sub-1", sub_config, root, snapshot, index) == (2, False)
+    assert deleted == ["shot-1"]
+    assert index.asset_id("sub-1") is None